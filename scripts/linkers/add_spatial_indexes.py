@@ -5,7 +5,7 @@ Add spatial indexes to the Neo4j database for optimal geographic query performan
 This script:
 1. Creates a point property from latitude/longitude coordinates
 2. Adds spatial indexes for fast distance queries
-3. Adds supporting indexes for country-based filtering
+3. Adds supporting indexes for country-based filtering and Wikidata ID lookups
 
 Run this BEFORE scaling to global coverage.
 """
@@ -71,7 +71,7 @@ class SpatialIndexer:
                 print("   Note: Point indexes require Neo4j 4.3+")
 
     def create_supporting_indexes(self):
-        """Create indexes to support country-based filtering."""
+        """Create indexes to support country-based filtering and Wikidata ID lookups."""
         print("\n2. Creating supporting indexes...")
 
         with self.driver.session() as session:
@@ -105,6 +105,16 @@ class SpatialIndexer:
             except Exception as e:
                 print(f"   ⚠ Error creating longitude index: {e}")
 
+            # Wikidata ID index (link writes and statistics look places up by it)
+            try:
+                session.run("""
+                    CREATE INDEX place_wikidataid_idx IF NOT EXISTS
+                    FOR (p:Place) ON (p.wikidataId)
+                """)
+                print("   ✓ Wikidata ID index created")
+            except Exception as e:
+                print(f"   ⚠ Error creating Wikidata ID index: {e}")
+
     def count_places_needing_migration(self):
         """Count how many places need location point added."""
         with self.driver.session() as session:
@@ -294,7 +304,7 @@ def main():
     print("="*60)
     print("\nThis will:")
     print("1. Create spatial point index on Place.location")
-    print("2. Create supporting indexes (country, lat, lon)")
+    print("2. Create supporting indexes (country, lat, lon, wikidataId)")
     print("3. Migrate lat/lon coordinates to point geometry")
     print("4. Verify spatial query performance")
 
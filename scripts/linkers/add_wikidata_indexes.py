@@ -7,13 +7,41 @@ Indexes needed:
 2. latitude - for spatial bounding box queries
 3. longitude - for spatial bounding box queries
 4. geonamesId - for direct ID matching
+
+Usage:
+    python3 add_wikidata_indexes.py              # create missing indexes
+    python3 add_wikidata_indexes.py --bulk-mode  # drop secondary indexes before a bulk load
+
+Bulk mode drops the secondary indexes (countryQid, latitude, longitude) so a
+large ingest does not pay index maintenance on every write. Re-run without
+--bulk-mode once the load finishes to rebuild them.
 """
 
-from neo4j import GraphDatabase
-import time
+from neo4j import GraphDatabase, READ_ACCESS
+import argparse
 import os
 
 
+# Properties reported by show_statistics
+STATISTICS_PROPERTIES = ['countryQid', 'latitude', 'longitude', 'geonamesId']
+
+# (property, description) for every index this script maintains
+WIKIDATA_INDEXES = [
+    ("countryQid", "Index on countryQid for country filtering"),
+    ("latitude", "Index on latitude for spatial bounding box"),
+    ("longitude", "Index on longitude for spatial bounding box"),
+    ("geonamesId", "Index on geonamesId for direct ID matching"),
+]
+
+# Lookup-key indexes that stay in place during bulk loads
+BULK_MODE_KEEP = {"geonamesId"}
+
+
+def index_name(prop):
+    """Name of the WikidataPlace index on the given property."""
+    return f"wikidata_{prop}_idx"
+
+
 class WikidataIndexer:
     def __init__(self, uri=None, user=None, password=None):
         # Use environment variables if not provided
@@ -22,47 +50,61 @@ class WikidataIndexer:
         password = password or os.getenv('NEO4J_PASSWORD')
         print(f"Connecting to {uri}...")
         self.driver = GraphDatabase.driver(uri, auth=(user, password))
+        self._indexes_verified = False
 
     def close(self):
         self.driver.close()
 
+    def get_existing_index_names(self, session):
+        """Return the names of all indexes currently defined in the database."""
+        result = session.run("SHOW INDEXES YIELD name")
+        return {record['name'] for record in result}
+
     def create_indexes(self):
-        """Create all necessary indexes for WikidataPlace."""
-        indexes = [
-            ("countryQid", "Index on countryQid for country filtering"),
-            ("latitude", "Index on latitude for spatial bounding box"),
-            ("longitude", "Index on longitude for spatial bounding box"),
-            ("geonamesId", "Index on geonamesId for direct ID matching"),
-        ]
+        """Create any missing indexes for WikidataPlace."""
+        if self._indexes_verified:
+            print("\n✓ WikidataPlace indexes already verified")
+            return
 
         print("\n" + "="*60)
         print("CREATING WIKIDATA INDEXES")
         print("="*60)
 
         with self.driver.session() as session:
-            for prop, description in indexes:
+            existing = self.get_existing_index_names(session)
+            missing = [(prop, description) for prop, description in WIKIDATA_INDEXES
+                       if index_name(prop) not in existing]
+
+            for prop, description in WIKIDATA_INDEXES:
+                if (prop, description) not in missing:
+                    print(f"  ✓ Index already exists: {index_name(prop)}")
+
+            for prop, description in missing:
                 print(f"\n{description}...")
 
                 try:
-                    # Create index
                     session.run(f"""
-                        CREATE INDEX wikidata_{prop}_idx IF NOT EXISTS
+                        CREATE INDEX {index_name(prop)} IF NOT EXISTS
                         FOR (wp:WikidataPlace)
                         ON (wp.{prop})
                     """)
-                    print(f"  ✓ Index created: wikidata_{prop}_idx")
+                    print(f"  ✓ Index created: {index_name(prop)}")
 
                 except Exception as e:
-                    if "already exists" in str(e).lower() or "equivalent index" in str(e).lower():
-                        print(f"  ✓ Index already exists: wikidata_{prop}_idx")
+                    if "equivalent index" in str(e).lower():
+                        print(f"  ✓ Equivalent index already exists for {prop}")
                     else:
                         print(f"  ✗ Error creating index: {e}")
 
-        print("\n" + "="*60)
-        print("Waiting for indexes to come online...")
-        print("="*60)
+            if missing:
+                print("\n" + "="*60)
+                print("Waiting for indexes to come online...")
+                print("="*60)
+
+                # Blocks until population finishes (or the timeout in seconds expires)
+                session.run("CALL db.awaitIndexes(300)").consume()
 
-        time.sleep(5)
+        self._indexes_verified = True
 
         # Show all WikidataPlace indexes
         with self.driver.session() as session:
@@ -75,44 +117,67 @@ class WikidataIndexer:
             for record in result:
                 print(f"  - {record['name']}: {record['labelsOrTypes']} ON {record['properties']}")
 
+    def drop_secondary_indexes(self):
+        """Drop indexes that are not needed while bulk loading."""
+        print("\n" + "="*60)
+        print("DROPPING SECONDARY WIKIDATA INDEXES (bulk mode)")
+        print("="*60)
+
+        with self.driver.session() as session:
+            existing = self.get_existing_index_names(session)
+
+            for prop, _ in WIKIDATA_INDEXES:
+                if prop in BULK_MODE_KEEP or index_name(prop) not in existing:
+                    continue
+
+                session.run(f"DROP INDEX {index_name(prop)} IF EXISTS").consume()
+                print(f"  ✓ Index dropped: {index_name(prop)}")
+
+        self._indexes_verified = False
+
     def show_statistics(self):
         """Show statistics for indexed properties."""
         print("\n" + "="*60)
         print("PROPERTY STATISTICS")
         print("="*60)
 
-        with self.driver.session() as session:
-            # Total nodes
-            result = session.run("MATCH (wp:WikidataPlace) RETURN count(wp) as total")
-            total = result.single()['total']
-            print(f"\nTotal WikidataPlace nodes: {total:,}")
-
-            # Properties with values
-            properties = ['countryQid', 'latitude', 'longitude', 'geonamesId']
-
-            for prop in properties:
-                result = session.run(f"""
-                    MATCH (wp:WikidataPlace)
-                    WHERE wp.{prop} IS NOT NULL
-                    RETURN count(wp) as count
-                """)
-                count = result.single()['count']
-                pct = (count / total * 100) if total > 0 else 0
-                print(f"  {prop}: {count:,} ({pct:.1f}%)")
-
-            # Already linked
-            result = session.run("""
-                MATCH (wp:WikidataPlace)
-                OPTIONAL MATCH (linked:WikidataPlace)-[:SAME_AS]->()
-                RETURN count(DISTINCT linked) as linked
-            """)
-            linked = result.single()['linked']
-            pct = (linked / total * 100) if total > 0 else 0
-            print(f"  Already linked (SAME_AS): {linked:,} ({pct:.1f}%)")
+        with self.driver.session(default_access_mode=READ_ACCESS) as session:
+            stats = session.execute_read(self._read_statistics)
+
+        total = stats['total']
+        print(f"\nTotal WikidataPlace nodes: {total:,}")
+
+        # Properties with values
+        for prop in STATISTICS_PROPERTIES:
+            count = stats[prop]
+            pct = (count / total * 100) if total > 0 else 0
+            print(f"  {prop}: {count:,} ({pct:.1f}%)")
+
+        # Already linked
+        linked = stats['linked']
+        pct = (linked / total * 100) if total > 0 else 0
+        print(f"  Already linked (SAME_AS): {linked:,} ({pct:.1f}%)")
+
+    @staticmethod
+    def _read_statistics(tx):
+        """Total nodes, property coverage and SAME_AS coverage in a single scan."""
+        counts = ', '.join(f"count(wp.{prop}) AS {prop}" for prop in STATISTICS_PROPERTIES)
+        result = tx.run(f"""
+            MATCH (wp:WikidataPlace)
+            RETURN count(wp) AS total, {counts},
+                   sum(CASE WHEN EXISTS {{ (wp)-[:SAME_AS]->() }} THEN 1 ELSE 0 END) AS linked
+        """)
+        return result.single()
 
 
 def main():
     """Main execution."""
+    parser = argparse.ArgumentParser(description='Manage WikidataPlace indexes')
+    parser.add_argument('--bulk-mode', action='store_true',
+                        help='Drop secondary indexes ahead of a bulk load; '
+                             're-run without this flag afterwards to rebuild them')
+    args = parser.parse_args()
+
     print("="*60)
     print("WikidataPlace Index Creator")
     print("="*60)
@@ -120,6 +185,12 @@ def main():
     indexer = WikidataIndexer()
 
     try:
+        if args.bulk_mode:
+            indexer.drop_secondary_indexes()
+            print("\n✓ Secondary indexes dropped. Run the bulk load, then re-run")
+            print("  this script without --bulk-mode to recreate them.")
+            return
+
         # Show current statistics
         indexer.show_statistics()
 
@@ -127,8 +198,6 @@ def main():
         indexer.create_indexes()
 
         print("\n✓ Index creation complete!")
-        print("\nNote: Large indexes may take several minutes to fully populate.")
-        print("Check SHOW INDEXES to verify they are ONLINE before running spatial linking.")
 
     except Exception as e:
         print(f"\n✗ Error: {e}")
@@ -12,94 +12,309 @@ This helps resolve cases like:
 - Maitland, NS (wrong coords in GeoNames, correct in Wikidata)
 - Administrative divisions that overlap with settlements
 - Name variants that don't match exactly
+
+Neighbours are found with an in-memory KD-tree. With --server-lookup they
+are found by proximity queries against the place_location POINT index on
+Place.location instead (run add_spatial_indexes.py first).
 """
 
+import argparse
+import math
 import os
-from typing import List, Dict, Tuple
+import re
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from functools import lru_cache
+from typing import List, Dict, FrozenSet, NamedTuple, Optional, Sequence, Tuple
+import numpy as np
+from scipy.spatial import cKDTree
 from neo4j import GraphDatabase
 from tqdm import tqdm
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Slightly under the true km per degree, so bounding boxes never undershoot
+KM_PER_DEGREE_LAT = 110.5
+
+
+def bounding_box(lat: float, lon: float, distance_km: float) -> Tuple[float, float, float, float]:
+    """
+    Return (min_lat, min_lon, max_lat, max_lon) enclosing a radius around a point.
+
+    Used as an index-backed point.withinBBox prefilter on Place.location;
+    exact distances are only computed for places inside the box.
+    """
+    dlat = distance_km / KM_PER_DEGREE_LAT
+    # Longitude degrees shrink towards the poles; clamp to keep the box finite
+    dlon = distance_km / (KM_PER_DEGREE_LAT * max(math.cos(math.radians(lat)), 0.01))
+    return lat - dlat, lon - dlon, lat + dlat, lon + dlon
+
+
+# Sphere radius Neo4j's point.distance uses for WGS-84 points, so local
+# distances match the ones computed in Cypher
+EARTH_RADIUS_KM = 6378.14
+
+
+def latlon_to_xyz(lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+    """Cartesian (x, y, z) km coordinates on the sphere; chord length orders like distance."""
+    lat = np.radians(lat)
+    lon = np.radians(lon)
+    cos_lat = np.cos(lat)
+    return EARTH_RADIUS_KM * np.column_stack((cos_lat * np.cos(lon),
+                                              cos_lat * np.sin(lon),
+                                              np.sin(lat)))
+
+
+@lru_cache(maxsize=65536)
+def _name_tokens(name: Optional[str]) -> Tuple[str, FrozenSet[str]]:
+    """Lowercased name and its word set; names recur across many candidate pairs."""
+    lowered = name.lower() if name else ''
+    return lowered, frozenset(lowered.split())
+
+
+def name_similarity(wd_name: Optional[str], gn_name: Optional[str]) -> float:
+    """Name similarity score 0.0-1.0: exact, containment, then word overlap."""
+    wd_name, wd_words = _name_tokens(wd_name)
+    gn_name, gn_words = _name_tokens(gn_name)
+
+    if wd_name == gn_name:
+        return 1.0
+    if wd_name in gn_name or gn_name in wd_name:
+        return 0.8
+
+    # Check word overlap
+    overlap = len(wd_words & gn_words)
+    if overlap > 0:
+        return 0.5 * (overlap / max(len(wd_words), len(gn_words)))
+    return 0.0
+
+
+# Wikidata instance-label keywords, checked in order; matched as substrings
+# so e.g. "regional county municipality" counts as administrative
+_WD_PRIORITY_PATTERNS = [
+    (re.compile('county|township|municipality|division'), 85),  # Administrative divisions
+    (re.compile('city|town|village|settlement'), 70),  # Settlements
+    (re.compile('neighbourhood|district'), 40),  # Sub-areas
+]
+
+# GeoNames feature-code priorities: ADM* and PPLA* by prefix, the rest exact
+_FC_PREFIX_PRIORITY = {
+    'ADM': 85,  # Administrative
+    'PPLA': 80,  # Admin seat
+}
+_FC_PRIORITY = {
+    'PPL': 70,  # Populated place
+    'AREA': 75,  # Area
+    'PPLX': 40,  # Section (lower priority)
+}
+
+
+@lru_cache(maxsize=1024)
+def _wd_priority(instance_type: str) -> int:
+    """Priority for a Wikidata instance label; there are few distinct labels."""
+    instance_type = instance_type.lower()
+    for pattern, priority in _WD_PRIORITY_PATTERNS:
+        if pattern.search(instance_type):
+            return priority
+    return 50  # Default
+
+
+@lru_cache(maxsize=256)
+def _gn_priority(feature_code: str) -> int:
+    """Priority for a GeoNames feature code; there are few distinct codes."""
+    feature_code = feature_code.upper()
+    return (_FC_PREFIX_PRIORITY.get(feature_code[:3])
+            or _FC_PREFIX_PRIORITY.get(feature_code[:4])
+            or _FC_PRIORITY.get(feature_code, 50))
+
+
+def _lookup_row(wikidata_id: str, lat: float, lon: float, distance_km: float) -> Dict:
+    """Query parameters for one Wikidata place in find_nearby_geonames_batch."""
+    min_lat, min_lon, max_lat, max_lon = bounding_box(lat, lon, distance_km)
+    return {
+        'wikidataId': wikidata_id,
+        'lat': lat,
+        'lon': lon,
+        'minLat': min_lat,
+        'minLon': min_lon,
+        'maxLat': max_lat,
+        'maxLon': max_lon,
+    }
+
+
+class WikidataPlaces(NamedTuple):
+    """Wikidata-only places in columnar form; index i is the same place in every field."""
+    wikidata_ids: List[str]
+    names: List[Optional[str]]
+    types: List[Optional[str]]
+    lat: np.ndarray
+    lon: np.ndarray
+
 
 class GeographicLinker:
     """Link places using geographic proximity."""
 
     def __init__(self, uri: str, user: str, password: str):
         self.driver = GraphDatabase.driver(uri, auth=(user, password))
+        # One session for the linker's lifetime, used only from the main
+        # thread; find_nearby_geonames_batch runs on worker threads and opens
+        # its own session per call
+        self._session = self.driver.session()
+        self.geonames_places: List[Dict] = []
+        self.geonames_xyz: Optional[np.ndarray] = None
+        self.geonames_tree: Optional[cKDTree] = None
 
     def close(self):
+        self._session.close()
         self.driver.close()
 
-    def get_wikidata_only_places(self) -> List[Dict]:
+    def get_wikidata_only_places(self) -> WikidataPlaces:
         """
         Get Wikidata places that aren't linked to GeoNames.
 
-        These are the 17K+ places we need to link geographically.
+        These are the 17K+ places we need to link geographically. They are
+        returned as columns (coordinates as float arrays) rather than a dict
+        per place.
         """
-        with self.driver.session() as session:
-            result = session.run("""
-                MATCH (p:Place)
-                WHERE p.wikidataId IS NOT NULL
-                  AND p.geonameId IS NULL
-                  AND p.latitude IS NOT NULL
-                  AND p.longitude IS NOT NULL
-                  AND p.countryCode = 'CA'
-                RETURN p.wikidataId AS wikidataId,
-                       p.name AS name,
-                       p.latitude AS lat,
-                       p.longitude AS lon,
-                       p.instanceOfLabel AS type
-            """)
-
-            places = [dict(record) for record in result]
-
-        print(f"Found {len(places):,} Wikidata-only places with coordinates")
+        result = self._session.run("""
+            MATCH (p:Place)
+            WHERE p.wikidataId IS NOT NULL
+              AND p.geonameId IS NULL
+              AND p.latitude IS NOT NULL
+              AND p.longitude IS NOT NULL
+              AND p.countryCode = 'CA'
+            RETURN p.wikidataId AS wikidataId,
+                   p.name AS name,
+                   p.latitude AS lat,
+                   p.longitude AS lon,
+                   p.instanceOfLabel AS type
+        """)
+
+        rows = result.values('wikidataId', 'name', 'type', 'lat', 'lon')
+
+        ids, names, types, lats, lons = zip(*rows) if rows else ((),) * 5
+        places = WikidataPlaces(
+            wikidata_ids=list(ids),
+            names=list(names),
+            types=list(types),
+            lat=np.array(lats, dtype=float),
+            lon=np.array(lons, dtype=float),
+        )
+
+        print(f"Found {len(places.wikidata_ids):,} Wikidata-only places with coordinates")
         return places
 
-    def find_nearby_geonames_places(self, lat: float, lon: float,
-                                    max_distance_km: float = 10.0) -> List[Dict]:
+    def find_nearby_geonames_batch(self, wikidata_ids: Sequence[str], lat: np.ndarray,
+                                   lon: np.ndarray,
+                                   max_distance_km: float = 10.0) -> Dict[str, List[Dict]]:
         """
-        Find GeoNames places within distance threshold.
+        Find GeoNames places near each of a batch of Wikidata places.
 
-        Args:
-            lat, lon: Coordinates to search around
-            max_distance_km: Maximum distance in kilometers
+        One query covers the whole batch: the places are unwound server-side
+        and each gets its 10 nearest matches from a subquery. Runs in its own
+        session so several batches can be queried from worker threads.
 
         Returns:
-            List of nearby places with distances
+            Dict of wikidataId -> nearby places with distances
         """
         with self.driver.session() as session:
             result = session.run("""
-                MATCH (p:Place)
-                WHERE p.geonameId IS NOT NULL
-                  AND p.latitude IS NOT NULL
-                  AND p.longitude IS NOT NULL
-                  AND p.countryCode = 'CA'
-                WITH p,
-                     point.distance(
-                         point({latitude: p.latitude, longitude: p.longitude}),
-                         point({latitude: $lat, longitude: $lon})
-                     ) / 1000.0 AS distance_km
-                WHERE distance_km <= $maxDistance
-                RETURN p.geonameId AS geonameId,
-                       p.name AS name,
-                       p.latitude AS lat,
-                       p.longitude AS lon,
-                       p.featureClass AS featureClass,
-                       p.featureCode AS featureCode,
-                       p.population AS population,
-                       distance_km
-                ORDER BY distance_km ASC
-                LIMIT 10
+                UNWIND $places AS wd
+                CALL {
+                    WITH wd
+                    MATCH (p:Place)
+                    WHERE point.withinBBox(p.location,
+                                           point({latitude: wd.minLat, longitude: wd.minLon}),
+                                           point({latitude: wd.maxLat, longitude: wd.maxLon}))
+                      AND p.geonameId IS NOT NULL
+                      AND p.countryCode = 'CA'
+                    WITH p,
+                         point.distance(p.location, point({latitude: wd.lat, longitude: wd.lon})) / 1000.0 AS distance_km
+                    WHERE distance_km <= $maxDistance
+                    RETURN p, distance_km
+                    ORDER BY distance_km ASC
+                    LIMIT 10
+                }
+                RETURN wd.wikidataId AS wikidataId,
+                       collect({
+                           geonameId: p.geonameId,
+                           name: p.name,
+                           lat: p.latitude,
+                           lon: p.longitude,
+                           featureClass: p.featureClass,
+                           featureCode: p.featureCode,
+                           population: p.population,
+                           distance_km: distance_km
+                       }) AS nearby
             """,
-                lat=lat,
-                lon=lon,
+                places=[_lookup_row(wikidata_id, float(y), float(x), max_distance_km)
+                        for wikidata_id, y, x in zip(wikidata_ids, lat, lon)],
                 maxDistance=max_distance_km
             )
 
-            return [dict(record) for record in result]
+            return {record['wikidataId']: record['nearby'] for record in result}
+
+    def load_geonames_index(self):
+        """
+        Load Canadian GeoNames places once and index their coordinates in a KD-tree.
+
+        The Canadian set fits comfortably in memory, so proximity lookups can
+        then run locally with find_nearby_local instead of one query per chunk.
+        """
+        result = self._session.run("""
+            MATCH (p:Place)
+            WHERE p.geonameId IS NOT NULL
+              AND p.latitude IS NOT NULL
+              AND p.longitude IS NOT NULL
+              AND p.countryCode = 'CA'
+            RETURN p.geonameId AS geonameId,
+                   p.name AS name,
+                   p.latitude AS lat,
+                   p.longitude AS lon,
+                   p.featureClass AS featureClass,
+                   p.featureCode AS featureCode,
+                   p.population AS population
+        """)
+        self.geonames_places = [dict(record) for record in result]
+
+        count = len(self.geonames_places)
+        lat = np.fromiter((p['lat'] for p in self.geonames_places), dtype=float, count=count)
+        lon = np.fromiter((p['lon'] for p in self.geonames_places), dtype=float, count=count)
+        self.geonames_xyz = latlon_to_xyz(lat, lon)
+        self.geonames_tree = cKDTree(self.geonames_xyz)
+
+        print(f"Indexed {count:,} GeoNames places for local proximity lookups")
+
+    def find_nearby_local(self, wikidata_ids: Sequence[str], lat: np.ndarray, lon: np.ndarray,
+                          max_distance_km: float = 10.0, limit: int = 10) -> Dict[str, List[Dict]]:
+        """
+        Same result as find_nearby_geonames_batch, answered from the KD-tree.
+
+        Requires load_geonames_index() to have been called.
+        """
+        wd_xyz = latlon_to_xyz(lat, lon)
+
+        # Search radius as a straight-line chord through the sphere
+        diameter = 2 * EARTH_RADIUS_KM
+        chord = diameter * math.sin(max_distance_km / diameter)
+        neighbours = self.geonames_tree.query_ball_point(wd_xyz, r=chord)
+
+        nearby = {}
+        for wikidata_id, xyz, indices in zip(wikidata_ids, wd_xyz, neighbours):
+            if not indices:
+                continue
+            indices = np.asarray(indices)
+            chords = np.linalg.norm(self.geonames_xyz[indices] - xyz, axis=1)
+            distances = diameter * np.arcsin(np.minimum(chords / diameter, 1.0))
+
+            nearest = np.argsort(distances)[:limit]
+            nearby[wikidata_id] = [
+                dict(self.geonames_places[indices[k]], distance_km=float(distances[k]))
+                for k in nearest
+            ]
+
+        return nearby
 
     def get_entity_priority(self, place: Dict, is_wikidata: bool = False) -> int:
         """
@@ -109,176 +324,188 @@ class GeographicLinker:
         Avoids linking to POIs/buildings when we want settlements.
         """
         if is_wikidata:
-            instance_type = (place.get('type') or '').lower()
-            # Administrative divisions
-            if any(x in instance_type for x in ['county', 'township', 'municipality', 'division']):
-                return 85
-            # Settlements
-            if any(x in instance_type for x in ['city', 'town', 'village', 'settlement']):
-                return 70
-            # Sub-areas
-            if 'neighbourhood' in instance_type or 'district' in instance_type:
-                return 40
-            return 50  # Default
-        else:
-            # GeoNames feature codes
-            feature_code = (place.get('featureCode') or '').upper()
-            if feature_code.startswith('ADM'):  # Administrative
-                return 85
-            elif feature_code.startswith('PPLA'):  # Admin seat
-                return 80
-            elif feature_code == 'PPL':  # Populated place
-                return 70
-            elif feature_code == 'AREA':  # Area
-                return 75
-            elif feature_code == 'PPLX':  # Section (lower priority)
-                return 40
-            return 50
-
-    def calculate_confidence(self, wikidata_place: Dict, geonames_place: Dict,
-                            distance_km: float) -> float:
+            return _wd_priority(place.get('type') or '')
+        return _gn_priority(place.get('featureCode') or '')
+
+    def score_candidates(self, distance: np.ndarray, name_score: np.ndarray,
+                         wd_priority: np.ndarray,
+                         gn_priority: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
         """
-        Calculate confidence score for a geographic match.
+        Score candidate (Wikidata, GeoNames) pairs in one vectorized pass.
 
-        Factors (tuned for precision-first linking):
+        Factors (tuned for precision-first linking), over per-pair arrays:
         - Distance (30% weight) - closer = higher confidence
         - Name similarity (50% weight) - CRITICAL for avoiding false SAME_AS links
         - Entity type compatibility (20% weight) - settlement vs POI priority
 
         Returns:
-            Confidence score 0.0-1.0
+            (confidence, located_in) arrays, where located_in marks
+            POI -> settlement/admin containment links
         """
-        # Distance component (exponential decay)
-        if distance_km <= 0.1:
-            distance_score = 1.0
-        elif distance_km <= 1.0:
-            distance_score = 0.9
-        elif distance_km <= 5.0:
-            distance_score = 0.7
-        elif distance_km <= 10.0:
-            distance_score = 0.5
-        else:
-            distance_score = 0.3
-
-        # Name similarity component
-        wd_name = wikidata_place['name'].lower() if wikidata_place.get('name') else ''
-        gn_name = geonames_place['name'].lower() if geonames_place.get('name') else ''
-
-        if wd_name == gn_name:
-            name_score = 1.0
-        elif wd_name in gn_name or gn_name in wd_name:
-            name_score = 0.8
-        else:
-            # Check word overlap
-            wd_words = set(wd_name.split())
-            gn_words = set(gn_name.split())
-            overlap = len(wd_words & gn_words)
-            if overlap > 0:
-                name_score = 0.5 * (overlap / max(len(wd_words), len(gn_words)))
-            else:
-                name_score = 0.0
-
-        # Entity type compatibility (normalized to 0-1)
-        wd_priority = self.get_entity_priority(wikidata_place, is_wikidata=True)
-        gn_priority = self.get_entity_priority(geonames_place, is_wikidata=False)
-
-        # Average of both priorities, normalized
-        type_score = ((wd_priority + gn_priority) / 2) / 100.0
+        distance_score = np.select(
+            [distance <= 0.1, distance <= 1.0, distance <= 5.0, distance <= 10.0],
+            [1.0, 0.9, 0.7, 0.5],
+            default=0.3
+        )
 
-        # Bonus if both are high-priority (settlements/admin divisions)
-        if wd_priority >= 70 and gn_priority >= 70:
-            type_score = min(type_score * 1.2, 1.0)
+        # Average of both priorities, normalized; bonus if both are
+        # high-priority (settlements/admin divisions)
+        type_score = (wd_priority + gn_priority) / 200.0
+        both_high = (wd_priority >= 70) & (gn_priority >= 70)
+        type_score = np.where(both_high, np.minimum(type_score * 1.2, 1.0), type_score)
 
-        # Weighted combination - NAME is now 50% to prevent false SAME_AS links
         # Perfect coords + no name match → max 0.70 (NEAR only, not SAME_AS)
-        confidence = (distance_score * 0.30) + (name_score * 0.50) + (type_score * 0.20)
+        confidence = np.minimum(
+            (distance_score * 0.30) + (name_score * 0.50) + (type_score * 0.20), 1.0
+        )
+        located_in = (wd_priority < 60) & (gn_priority >= 60) & (distance <= 5.0)
 
-        return min(confidence, 1.0)
+        return confidence, located_in
 
     def create_geographic_links(self, distance_threshold: float = 10.0,
                                min_confidence: float = 0.5,
-                               batch_size: int = 100):
+                               batch_size: int = 100,
+                               lookup_batch_size: int = 1000,
+                               use_local_index: bool = True,
+                               lookup_workers: int = 4,
+                               same_as_threshold: float = 0.85):
         """
         Create NEAR relationships between Wikidata and GeoNames places.
 
+        Very high confidence NEAR matches (see _create_links_batch) also get a
+        SAME_AS relationship in the same write.
+
         Args:
             distance_threshold: Maximum distance to consider (km)
             min_confidence: Minimum confidence score to create link
             batch_size: Number of places to process before committing
+            lookup_batch_size: Wikidata places looked up together
+            use_local_index: Find neighbours with an in-memory KD-tree rather
+                than proximity queries against Neo4j
+            lookup_workers: Proximity queries kept in flight against Neo4j
+                (when not using the local index)
+            same_as_threshold: Minimum confidence for a SAME_AS link
         """
         print(f"\nCreating geographic links...")
         print(f"  Distance threshold: {distance_threshold} km")
         print(f"  Minimum confidence: {min_confidence}")
+        print(f"  SAME_AS confidence: {same_as_threshold}")
+
+        places = self.get_wikidata_only_places()
+        total = len(places.wikidata_ids)
+
+        # Wikidata priorities depend only on the instance label, of which
+        # there are few distinct values
+        type_priority = {t: self.get_entity_priority({'type': t}, is_wikidata=True)
+                         for t in set(places.types)}
 
-        wikidata_places = self.get_wikidata_only_places()
+        if use_local_index:
+            self.load_geonames_index()
+            find_nearby = self.find_nearby_local
+        else:
+            find_nearby = self.find_nearby_geonames_batch
 
         links_created = 0
+        same_as_created = 0
         links_batch = []
 
-        for wd_place in tqdm(wikidata_places, desc="Linking by geography"):
-            # Find nearby GeoNames places
-            nearby = self.find_nearby_geonames_places(
-                wd_place['lat'],
-                wd_place['lon'],
-                distance_threshold
-            )
+        starts = range(0, total, lookup_batch_size)
 
-            if not nearby:
-                continue
+        def lookup(start: int) -> Dict[str, List[Dict]]:
+            # Find nearby GeoNames places for the whole chunk at once
+            stop = start + lookup_batch_size
+            return find_nearby(places.wikidata_ids[start:stop], places.lat[start:stop],
+                               places.lon[start:stop], distance_threshold)
 
-            # Find best match(es)
-            for gn_place in nearby:
-                confidence = self.calculate_confidence(
-                    wd_place,
-                    gn_place,
-                    gn_place['distance_km']
+        with ExitStack() as stack:
+            progress = stack.enter_context(
+                tqdm(total=total, desc="Linking by geography", mininterval=0.5))
+            if use_local_index:
+                lookups = map(lookup, starts)
+            else:
+                # Neo4j lookups are latency-bound, so later chunks are queried
+                # while earlier ones are scored and written
+                executor = stack.enter_context(ThreadPoolExecutor(max_workers=lookup_workers))
+                lookups = executor.map(lookup, starts)
+
+            for start, nearby_by_place in zip(starts, lookups):
+                ids = places.wikidata_ids[start:start + lookup_batch_size]
+                progress.update(len(ids))
+
+                # Flatten to one entry per candidate pair
+                wd_index = []
+                candidates = []
+                for i, wikidata_id in enumerate(ids, start):
+                    for gn_place in nearby_by_place.get(wikidata_id, ()):
+                        wd_index.append(i)
+                        candidates.append(gn_place)
+                if not candidates:
+                    continue
+
+                count = len(candidates)
+                confidence, located_in = self.score_candidates(
+                    distance=np.fromiter((gn['distance_km'] for gn in candidates),
+                                         dtype=float, count=count),
+                    name_score=np.fromiter((name_similarity(places.names[i], gn.get('name'))
+                                            for i, gn in zip(wd_index, candidates)),
+                                           dtype=float, count=count),
+                    wd_priority=np.fromiter((type_priority[places.types[i]] for i in wd_index),
+                                            dtype=float, count=count),
+                    gn_priority=np.fromiter((self.get_entity_priority(gn, is_wikidata=False)
+                                             for gn in candidates),
+                                            dtype=float, count=count),
                 )
 
-                if confidence >= min_confidence:
-                    # Determine relationship type based on entity hierarchy
-                    wd_priority = self.get_entity_priority(wd_place, is_wikidata=True)
-                    gn_priority = self.get_entity_priority(gn_place, is_wikidata=False)
-
-                    # LOCATED_IN: POI/building contained in settlement/admin division
-                    if (wd_priority < 60 and gn_priority >= 60 and
-                        gn_place['distance_km'] <= 5.0):
-                        rel_type = 'LOCATED_IN'
-                    else:
-                        rel_type = 'NEAR'  # Default spatial proximity
-
+                # Keep the pairs that clear the threshold
+                for j in np.flatnonzero(confidence >= min_confidence):
+                    gn_place = candidates[j]
                     links_batch.append({
-                        'wikidataId': wd_place['wikidataId'],
+                        'wikidataId': places.wikidata_ids[wd_index[j]],
                         'geonameId': gn_place['geonameId'],
                         'distance_km': round(gn_place['distance_km'], 3),
-                        'confidence': round(confidence, 3),
+                        'confidence': round(float(confidence[j]), 3),
                         'matchMethod': 'geographic_proximity',
-                        'relType': rel_type
+                        # LOCATED_IN: POI/building contained in settlement/admin division
+                        'relType': 'LOCATED_IN' if located_in[j] else 'NEAR'
                     })
 
-            # Commit batch
-            if len(links_batch) >= batch_size:
-                self._create_links_batch(links_batch)
-                links_created += len(links_batch)
-                links_batch = []
+                # Commit full batches
+                while len(links_batch) >= batch_size:
+                    same_as_created += self._create_links_batch(links_batch[:batch_size],
+                                                                same_as_threshold)
+                    links_created += batch_size
+                    links_batch = links_batch[batch_size:]
 
         # Create remaining links
         if links_batch:
-            self._create_links_batch(links_batch)
+            same_as_created += self._create_links_batch(links_batch, same_as_threshold)
             links_created += len(links_batch)
 
         print(f"\n✓ Created {links_created:,} geographic links")
-        print(f"  Average: {links_created / len(wikidata_places):.2f} links per Wikidata place")
+        print(f"  Average: {links_created / total:.2f} links per Wikidata place")
+        print(f"✓ Created {same_as_created:,} SAME_AS relationships")
 
-    def _create_links_batch(self, links: List[Dict]):
-        """Create a batch of geographic relationships (NEAR or LOCATED_IN)."""
-        with self.driver.session() as session:
-            # Separate links by type
-            near_links = [l for l in links if l['relType'] == 'NEAR']
-            located_in_links = [l for l in links if l['relType'] == 'LOCATED_IN']
+    def _create_links_batch(self, links: List[Dict], same_as_threshold: float = 0.85) -> int:
+        """
+        Create a batch of geographic relationships (NEAR or LOCATED_IN).
+
+        NEAR links that are almost certainly the same entity also get SAME_AS:
+        - Very close distance (<= 1km)
+        - High confidence score (>= same_as_threshold), which requires a
+          same or very similar name and compatible types
 
+        Returns the number of SAME_AS links written.
+        """
+        # Separate links by type
+        near_links = [l for l in links if l['relType'] == 'NEAR']
+        located_in_links = [l for l in links if l['relType'] == 'LOCATED_IN']
+        same_as_links = [l for l in near_links
+                         if l['confidence'] >= same_as_threshold and l['distance_km'] <= 1.0]
+
+        def write_links(tx):
             # Create NEAR relationships
             if near_links:
-                session.run("""
+                tx.run("""
                     UNWIND $links AS link
                     MATCH (wd:Place {wikidataId: link.wikidataId})
                     MATCH (gn:Place {geonameId: link.geonameId})
@@ -291,7 +518,7 @@ class GeographicLinker:
 
             # Create LOCATED_IN relationships
             if located_in_links:
-                session.run("""
+                tx.run("""
                     UNWIND $links AS link
                     MATCH (wd:Place {wikidataId: link.wikidataId})
                     MATCH (gn:Place {geonameId: link.geonameId})
@@ -302,32 +529,21 @@ class GeographicLinker:
                         r.linkedDate = datetime()
                 """, links=located_in_links)
 
-    def create_high_confidence_same_as_links(self, confidence_threshold: float = 0.85):
-        """
-        Create SAME_AS relationships for very high confidence geographic matches.
+            # Create SAME_AS for high confidence matches
+            if same_as_links:
+                tx.run("""
+                    UNWIND $links AS link
+                    MATCH (wd:Place {wikidataId: link.wikidataId})
+                    MATCH (gn:Place {geonameId: link.geonameId})
+                    MERGE (wd)-[s:SAME_AS]->(gn)
+                    SET s.confidence = link.confidence,
+                        s.distance_km = link.distance_km,
+                        s.evidence = 'geographic_proximity_high_confidence'
+                """, links=same_as_links)
 
-        These are places that are almost certainly the same entity:
-        - Very close distance (< 1km)
-        - Same or very similar name
-        - Compatible types
-        - High confidence score (> 0.85)
-        """
-        print(f"\nCreating SAME_AS links for high confidence matches (>{confidence_threshold})...")
-
-        with self.driver.session() as session:
-            result = session.run("""
-                MATCH (wd:Place)-[r:NEAR]->(gn:Place)
-                WHERE r.confidence >= $threshold
-                  AND r.distance_km <= 1.0
-                MERGE (wd)-[s:SAME_AS]->(gn)
-                SET s.confidence = r.confidence,
-                    s.distance_km = r.distance_km,
-                    s.evidence = 'geographic_proximity_high_confidence'
-                RETURN count(s) AS count
-            """, threshold=confidence_threshold)
-
-            count = result.single()['count']
-            print(f"✓ Created {count:,} SAME_AS relationships")
+        # All relationship types commit together
+        self._session.execute_write(write_links)
+        return len(same_as_links)
 
     def print_statistics(self):
         """Print linking statistics."""
@@ -335,92 +551,100 @@ class GeographicLinker:
         print("GEOGRAPHIC LINKING STATISTICS")
         print("="*60)
 
-        with self.driver.session() as session:
-            # Total Wikidata places
-            result = session.run("""
-                MATCH (p:Place)
-                WHERE p.wikidataId IS NOT NULL AND p.geonameId IS NULL
-                RETURN count(p) AS count
-            """)
-            wikidata_only = result.single()['count']
-
-            # Places with any geographic links
-            result = session.run("""
-                MATCH (wd:Place {geonameId: NULL})
-                WHERE wd.wikidataId IS NOT NULL
-                  AND (EXISTS((wd)-[:NEAR]->()) OR EXISTS((wd)-[:LOCATED_IN]->()))
-                RETURN count(DISTINCT wd) AS count
-            """)
-            linked = result.single()['count']
-
-            # NEAR relationships
-            result = session.run("""
-                MATCH ()-[r:NEAR]->()
-                RETURN count(r) AS count
-            """)
-            near_count = result.single()['count']
-
-            # LOCATED_IN relationships
-            result = session.run("""
-                MATCH ()-[r:LOCATED_IN]->()
-                RETURN count(r) AS count
-            """)
-            located_in_count = result.single()['count']
-
-            # SAME_AS relationships
-            result = session.run("""
-                MATCH ()-[r:SAME_AS]->()
-                RETURN count(r) AS count
-            """)
-            same_as = result.single()['count']
-
-            # Average confidence
-            result = session.run("""
-                MATCH ()-[r:NEAR]->()
-                RETURN avg(r.confidence) AS avg_confidence,
-                       avg(r.distance_km) AS avg_distance
-            """)
-            stats = result.single()
-            avg_conf = stats['avg_confidence']
-            avg_dist = stats['avg_distance']
-
-            print(f"\nWikidata-only places: {wikidata_only:,}")
-            print(f"  Linked geographically: {linked:,} ({(linked/wikidata_only)*100:.1f}%)")
-            print(f"  Unlinked: {wikidata_only - linked:,}")
-
-            print(f"\nRelationships:")
-            print(f"  NEAR links (spatial proximity): {near_count:,}")
-            print(f"  LOCATED_IN links (containment): {located_in_count:,}")
-            print(f"  SAME_AS links (identity): {same_as:,}")
-            print(f"  Total: {near_count + located_in_count + same_as:,}")
-
-            if avg_conf:
-                print(f"\nAverage NEAR link:")
-                print(f"  Confidence: {avg_conf:.3f}")
-                print(f"  Distance: {avg_dist:.2f} km")
-
-            # Top linked places
-            result = session.run("""
-                MATCH (wd:Place)-[r:NEAR]->(gn:Place)
-                WHERE r.confidence > 0.8
-                RETURN wd.name AS wikidata_name,
-                       gn.name AS geonames_name,
-                       r.distance_km AS distance,
-                       r.confidence AS confidence
-                ORDER BY r.confidence DESC
-                LIMIT 10
-            """)
-
-            print(f"\nTop 10 High-Confidence Matches:")
-            for record in result:
-                print(f"  {record['wikidata_name']} → {record['geonames_name']}")
-                print(f"    Distance: {record['distance']:.2f} km, Confidence: {record['confidence']:.3f}")
+        session = self._session
+        # Total Wikidata places
+        result = session.run("""
+            MATCH (p:Place)
+            WHERE p.wikidataId IS NOT NULL AND p.geonameId IS NULL
+            RETURN count(p) AS count
+        """)
+        wikidata_only = result.single()['count']
+
+        # Places with any geographic links
+        result = session.run("""
+            MATCH (wd:Place)
+            WHERE wd.wikidataId IS NOT NULL AND wd.geonameId IS NULL
+              AND (EXISTS((wd)-[:NEAR]->()) OR EXISTS((wd)-[:LOCATED_IN]->()))
+            RETURN count(DISTINCT wd) AS count
+        """)
+        linked = result.single()['count']
+
+        # NEAR relationships
+        result = session.run("""
+            MATCH ()-[r:NEAR]->()
+            RETURN count(r) AS count
+        """)
+        near_count = result.single()['count']
+
+        # LOCATED_IN relationships
+        result = session.run("""
+            MATCH ()-[r:LOCATED_IN]->()
+            RETURN count(r) AS count
+        """)
+        located_in_count = result.single()['count']
+
+        # SAME_AS relationships
+        result = session.run("""
+            MATCH ()-[r:SAME_AS]->()
+            RETURN count(r) AS count
+        """)
+        same_as = result.single()['count']
+
+        # Average confidence
+        result = session.run("""
+            MATCH ()-[r:NEAR]->()
+            RETURN avg(r.confidence) AS avg_confidence,
+                   avg(r.distance_km) AS avg_distance
+        """)
+        stats = result.single()
+        avg_conf = stats['avg_confidence']
+        avg_dist = stats['avg_distance']
+
+        print(f"\nWikidata-only places: {wikidata_only:,}")
+        print(f"  Linked geographically: {linked:,} ({(linked/wikidata_only)*100:.1f}%)")
+        print(f"  Unlinked: {wikidata_only - linked:,}")
+
+        print(f"\nRelationships:")
+        print(f"  NEAR links (spatial proximity): {near_count:,}")
+        print(f"  LOCATED_IN links (containment): {located_in_count:,}")
+        print(f"  SAME_AS links (identity): {same_as:,}")
+        print(f"  Total: {near_count + located_in_count + same_as:,}")
+
+        if avg_conf:
+            print(f"\nAverage NEAR link:")
+            print(f"  Confidence: {avg_conf:.3f}")
+            print(f"  Distance: {avg_dist:.2f} km")
+
+        # Top linked places
+        result = session.run("""
+            MATCH (wd:Place)-[r:NEAR]->(gn:Place)
+            WHERE r.confidence > 0.8
+            RETURN wd.name AS wikidata_name,
+                   gn.name AS geonames_name,
+                   r.distance_km AS distance,
+                   r.confidence AS confidence
+            ORDER BY r.confidence DESC
+            LIMIT 10
+        """)
+
+        print(f"\nTop 10 High-Confidence Matches:")
+        for record in result:
+            print(f"  {record['wikidata_name']} → {record['geonames_name']}")
+            print(f"    Distance: {record['distance']:.2f} km, Confidence: {record['confidence']:.3f}")
 
         print("="*60)
 
 
 def main():
     """Main execution."""
+    parser = argparse.ArgumentParser(description="Link Wikidata-only places to GeoNames by proximity")
+    parser.add_argument(
+        '--server-lookup',
+        action='store_true',
+        help='Find neighbours with proximity queries against Neo4j instead of an in-memory KD-tree'
+    )
+    args = parser.parse_args()
+
     NEO4J_URI = os.getenv('NEO4J_URI', 'bolt://localhost:7687')
     NEO4J_USER = os.getenv('NEO4J_USER', 'neo4j')
     NEO4J_PASSWORD = os.getenv('NEO4J_PASSWORD', 'password')
@@ -441,12 +665,11 @@ def main():
         linker.create_geographic_links(
             distance_threshold=10.0,
             min_confidence=0.5,
-            batch_size=100
+            batch_size=100,
+            use_local_index=not args.server_lookup,
+            same_as_threshold=0.85
         )
 
-        # Create SAME_AS for high confidence matches
-        linker.create_high_confidence_same_as_links(confidence_threshold=0.85)
-
         # Print statistics
         linker.print_statistics()
 
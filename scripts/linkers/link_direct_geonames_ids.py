@@ -3,9 +3,15 @@
 Create SAME_AS links between WikidataPlace and Place via direct geonamesId matching.
 
 Fix: Converts WikidataPlace.geonamesId (STRING) to Place.geonameId (INTEGER).
+
+By default the ids are joined in pandas and the matched pairs written by
+element id; --server-side does the join in Neo4j with APOC instead.
 """
 
+import argparse
 from neo4j import GraphDatabase
+import pandas as pd
+from tqdm import tqdm
 import time
 import os
 
@@ -22,6 +28,25 @@ class DirectIDLinker:
     def close(self):
         self.driver.close()
 
+    def create_indexes(self):
+        """Ensure the id lookups on both sides of the join are index-backed."""
+        with self.driver.session() as session:
+            for cypher in [
+                "CREATE CONSTRAINT place_geonameid IF NOT EXISTS FOR (p:Place) REQUIRE p.geonameId IS UNIQUE",
+                "CREATE INDEX wikidata_gnid IF NOT EXISTS FOR (wp:WikidataPlace) ON (wp.geonamesId)",
+            ]:
+                try:
+                    session.run(cypher).consume()
+                    print(f"✓ {cypher.split()[2]}")
+                except Exception as e:
+                    # Equivalent constraint under another name, or duplicate geonameIds
+                    print(f"⚠ {cypher.split()[2]}: {e}")
+
+            try:
+                session.run("CALL db.awaitIndexes(300)").consume()
+            except Exception as e:
+                print(f"⚠ Waiting for indexes: {e}")
+
     def count_linkable(self):
         """Count WikidataPlace nodes with geonamesId property."""
         with self.driver.session() as session:
@@ -33,12 +58,15 @@ class DirectIDLinker:
             """)
             return result.single()['total']
 
-    def link_by_direct_id_match(self, batch_size=50000):
+    def link_by_direct_id_match(self, batch_size=10000, concurrency=8):
         """
         Create SAME_AS relationships via geonamesId match.
 
         Uses toInteger() to convert WikidataPlace.geonamesId (string)
-        to match Place.geonameId (integer).
+        to match Place.geonameId (integer). The conversion happens once per
+        WikidataPlace, so each match is a seek on the Place.geonameId constraint.
+        WikidataPlaces sharing a geonamesId are grouped into one row, so no
+        Place is written by two parallel batches.
         """
         print("\n" + "="*60)
         print("DIRECT GEONAMES ID LINKING")
@@ -57,25 +85,31 @@ class DirectIDLinker:
         start_time = time.time()
 
         with self.driver.session() as session:
-            result = session.run(f"""
-                CALL {{
-                    MATCH (wp:WikidataPlace)
-                    WHERE wp.geonamesId IS NOT NULL
-                      AND NOT EXISTS((wp)-[:SAME_AS]->())
-                    WITH wp LIMIT {batch_size}
-                    MATCH (p:Place)
-                    WHERE p.geonameId = toInteger(wp.geonamesId)
-                    MERGE (wp)-[r:SAME_AS]->(p)
-                    SET r.evidence = 'geonames_id_match',
-                        r.confidence = 1.0,
-                        r.distance_km = 0.0,
-                        r.linkedDate = datetime()
-                    RETURN count(r) as batch_count
-                }} IN TRANSACTIONS OF {batch_size} ROWS
-                RETURN sum(batch_count) as total_count
-            """)
-
-            count = result.single()['total_count']
+            result = session.run("""
+                CALL apoc.periodic.iterate(
+                    'MATCH (wp:WikidataPlace)
+                     WHERE wp.geonamesId IS NOT NULL
+                       AND NOT EXISTS((wp)-[:SAME_AS]->())
+                     WITH toInteger(wp.geonamesId) AS gid, collect(wp) AS wps
+                     WHERE gid IS NOT NULL
+                     RETURN gid, wps',
+                    'MATCH (p:Place {geonameId: gid})
+                     UNWIND wps AS wp
+                     MERGE (wp)-[r:SAME_AS]->(p)
+                     SET r.evidence = "geonames_id_match",
+                         r.confidence = 1.0,
+                         r.distance_km = 0.0,
+                         r.linkedDate = datetime()',
+                    {batchSize: $batchSize, parallel: true, concurrency: $concurrency, retries: 3}
+                )
+                YIELD failedOperations, errorMessages, updateStatistics
+                RETURN failedOperations, errorMessages, updateStatistics
+            """, batchSize=batch_size, concurrency=concurrency)
+            summary = result.single()
+
+        if summary['failedOperations']:
+            print(f"  ✗ {summary['failedOperations']:,} geonamesIds failed: {summary['errorMessages']}")
+        count = summary['updateStatistics'].get('relationshipsCreated', 0)
 
         elapsed = time.time() - start_time
 
@@ -85,6 +119,72 @@ class DirectIDLinker:
 
         return count
 
+    def link_by_client_join(self, batch_size=50000):
+        """
+        Create SAME_AS relationships by joining the id columns in pandas.
+
+        The unlinked Wikidata ids and the Places carrying them are fetched
+        once and hash-joined locally; the matched pairs are written by
+        element id, so the writes skip label and property lookups.
+        """
+        print("\n" + "="*60)
+        print("DIRECT GEONAMES ID LINKING (client-side join)")
+        print("="*60)
+
+        start_time = time.time()
+
+        with self.driver.session() as session:
+            wikidata = session.run("""
+                MATCH (wp:WikidataPlace)
+                WHERE wp.geonamesId IS NOT NULL
+                  AND NOT EXISTS((wp)-[:SAME_AS]->())
+                RETURN elementId(wp) AS w, toInteger(wp.geonamesId) AS geonameId
+            """).to_df()
+            print(f"\nWikidataPlace nodes with geonamesId: {len(wikidata):,}")
+
+            if wikidata.empty:
+                print("All nodes already linked!")
+                return 0
+
+            # Unparseable geonamesId values come back as null
+            wikidata = wikidata.dropna(subset=['geonameId'])
+            wikidata['geonameId'] = wikidata['geonameId'].astype('int64')
+
+            # Only the Places those ids can match, not every Place in the graph
+            result = session.run("""
+                MATCH (p:Place)
+                WHERE p.geonameId IN $ids
+                RETURN elementId(p) AS p, p.geonameId AS geonameId
+            """, ids=wikidata['geonameId'].unique().tolist())
+            places = pd.DataFrame(result.values(), columns=['p', 'geonameId'])
+            print(f"Matching Place nodes: {len(places):,}")
+            pairs = wikidata.merge(places, on='geonameId', how='inner')[['w', 'p']]
+            print(f"Matched pairs: {len(pairs):,}\n")
+
+            count = 0
+            with tqdm(total=len(pairs), desc="Creating SAME_AS links") as pbar:
+                for start in range(0, len(pairs), batch_size):
+                    batch = pairs.iloc[start:start + batch_size].to_dict('records')
+                    result = session.run("""
+                        UNWIND $pairs AS x
+                        MATCH (wp) WHERE elementId(wp) = x.w
+                        MATCH (p) WHERE elementId(p) = x.p
+                        MERGE (wp)-[r:SAME_AS]->(p)
+                        SET r.evidence = 'geonames_id_match',
+                            r.confidence = 1.0,
+                            r.distance_km = 0.0,
+                            r.linkedDate = datetime()
+                    """, pairs=batch)
+                    count += result.consume().counters.relationships_created
+                    pbar.update(len(batch))
+
+        elapsed = time.time() - start_time
+
+        print(f"\n✓ Created {count:,} SAME_AS relationships")
+        print(f"  Time: {elapsed:.1f} seconds ({count/elapsed:.0f} links/sec)")
+
+        return count
+
     def print_statistics(self):
         """Print linking statistics."""
         print("\n" + "="*60)
@@ -132,6 +232,14 @@ class DirectIDLinker:
 
 def main():
     """Main execution."""
+    parser = argparse.ArgumentParser(description="Link WikidataPlace to Place by GeoNames ID")
+    parser.add_argument(
+        '--server-side',
+        action='store_true',
+        help='Join inside Neo4j with apoc.periodic.iterate instead of in pandas'
+    )
+    args = parser.parse_args()
+
     print("="*60)
     print("Direct GeoNames ID Linker")
     print("="*60)
@@ -140,7 +248,11 @@ def main():
 
     try:
         # Create direct ID links
-        linker.link_by_direct_id_match()
+        linker.create_indexes()
+        if args.server_side:
+            linker.link_by_direct_id_match()
+        else:
+            linker.link_by_client_join()
 
         # Print statistics
         linker.print_statistics()
@@ -4,11 +4,17 @@ GeoNames Data Loader for Neo4j LOD Knowledge Graph
 
 Loads GeoNames data (cities500.txt and CA.txt) into Neo4j with proper schema,
 indexes, and relationships for NER reconciliation.
+
+For an initial load into an empty database, --export-csv writes the places
+for `neo4j-admin database import` instead, which is much faster than loading
+over Bolt; rerun with --skip-places afterwards for the schema and admin divisions.
 """
 
 import os
 import csv
-from typing import Dict, List, Optional
+import argparse
+import subprocess
+from typing import BinaryIO, Dict, List, Optional, Set, Tuple
 from datetime import datetime
 from neo4j import GraphDatabase
 import pandas as pd
@@ -27,12 +33,27 @@ GEONAMES_FIELDS = [
 ]
 
 
+def split_alternate_names(value: str) -> List[str]:
+    """Split GeoNames' comma-separated alternatenames field into a list."""
+    if not value:
+        return []
+    return [n.strip() for n in value.split(',') if n.strip()]
+
+
 class GeoNamesLoader:
     """Load GeoNames data into Neo4j for NER reconciliation."""
 
-    def __init__(self, uri: str, user: str, password: str):
+    def __init__(self, uri: str, user: str, password: str, initial_load: bool = False):
         self.driver = GraphDatabase.driver(uri, auth=(user, password))
         self.batch_size = int(os.getenv('BATCH_SIZE', 10000))
+        # Parallel apoc.periodic.iterate workers when merging staged places
+        self.concurrency = int(os.getenv('LOAD_CONCURRENCY', 8))
+        # Batches per transaction when writing places
+        self.commit_every = int(os.getenv('COMMIT_EVERY', 10))
+        # Into an empty database places are CREATEd directly, skipping the
+        # staging merge; ids already loaded in this run are skipped
+        self.initial_load = initial_load
+        self._loaded_ids = set()
 
     def close(self):
         self.driver.close()
@@ -56,6 +77,8 @@ class GeoNamesLoader:
                 "CREATE INDEX place_country IF NOT EXISTS FOR (p:Place) ON (p.countryCode)",
                 "CREATE INDEX place_featureclass IF NOT EXISTS FOR (p:Place) ON (p.featureClass)",
                 "CREATE INDEX place_population IF NOT EXISTS FOR (p:Place) ON (p.population)",
+                "CREATE INDEX place_admin1 IF NOT EXISTS FOR (p:Place) ON (p.countryCode, p.admin1Code)",
+                "CREATE INDEX place_admin2 IF NOT EXISTS FOR (p:Place) ON (p.countryCode, p.admin2Code)",
                 "CREATE TEXT INDEX place_name_text IF NOT EXISTS FOR (p:Place) ON (p.name)",
                 "CREATE TEXT INDEX place_alternatenames_text IF NOT EXISTS FOR (p:Place) ON (p.alternateNames)",
             ]
@@ -78,122 +101,285 @@ class GeoNamesLoader:
             session.run("MATCH (n) DETACH DELETE n")
             print("✓ Database cleared")
 
-    def parse_geonames_row(self, row: Dict) -> Dict:
-        """Parse a GeoNames row into Neo4j-friendly format."""
-        # Parse alternate names into list
-        alt_names = []
-        if row.get('alternatenames'):
-            alt_names = [n.strip() for n in row['alternatenames'].split(',') if n.strip()]
-
-        # Convert numeric fields
-        try:
-            population = int(row.get('population', 0) or 0)
-        except ValueError:
-            population = 0
-
-        try:
-            elevation = int(row.get('elevation', 0) or 0)
-        except ValueError:
-            elevation = 0
-
-        try:
-            latitude = float(row['latitude'])
-            longitude = float(row['longitude'])
-        except (ValueError, KeyError):
-            latitude = None
-            longitude = None
-
-        return {
-            'geonameId': int(row['geonameid']),
-            'name': row['name'],
-            'asciiName': row['asciiname'],
-            'alternateNames': alt_names,
-            'latitude': latitude,
-            'longitude': longitude,
-            'featureClass': row['feature_class'],
-            'featureCode': row['feature_code'],
-            'countryCode': row['country_code'],
-            'admin1Code': row.get('admin1_code', ''),
-            'admin2Code': row.get('admin2_code', ''),
-            'admin3Code': row.get('admin3_code', ''),
-            'admin4Code': row.get('admin4_code', ''),
-            'population': population,
-            'elevation': elevation,
-            'timezone': row.get('timezone', ''),
-            'modifiedDate': row.get('modification_date', ''),
+    def parse_geonames_frame(self, frame: pd.DataFrame) -> List[Dict]:
+        """Parse a chunk of GeoNames rows into Neo4j-friendly records."""
+        # Rows without a usable geonameid can't be merged; report and drop them
+        geoname_ids = pd.to_numeric(frame['geonameid'], errors='coerce')
+        invalid = geoname_ids.isna()
+        if invalid.any():
+            for value in frame.loc[invalid, 'geonameid']:
+                print(f"Error parsing row {value}: invalid geonameid")
+            frame = frame[~invalid]
+            geoname_ids = geoname_ids[~invalid]
+
+        # Numeric fields are converted column-wise; blanks and junk become 0/None
+        population = pd.to_numeric(frame['population'], errors='coerce').fillna(0)
+        elevation = pd.to_numeric(frame['elevation'], errors='coerce').fillna(0)
+        latitude = pd.to_numeric(frame['latitude'], errors='coerce')
+        longitude = pd.to_numeric(frame['longitude'], errors='coerce')
+        has_coords = latitude.notna() & longitude.notna()
+
+        places = pd.DataFrame({
+            'geonameId': geoname_ids.astype('int64'),
+            'name': frame['name'],
+            'asciiName': frame['asciiname'],
+            'alternateNames': frame['alternatenames'].map(split_alternate_names),
+            'latitude': latitude.astype(object).where(has_coords, None),
+            'longitude': longitude.astype(object).where(has_coords, None),
+            'featureClass': frame['feature_class'],
+            'featureCode': frame['feature_code'],
+            'countryCode': frame['country_code'],
+            'admin1Code': frame['admin1_code'],
+            'admin2Code': frame['admin2_code'],
+            'admin3Code': frame['admin3_code'],
+            'admin4Code': frame['admin4_code'],
+            'population': population.astype('int64'),
+            'elevation': elevation.astype('int64'),
+            'timezone': frame['timezone'],
+            'modifiedDate': frame['modification_date'],
             'wikidataId': None,  # To be populated later
             'wikipediaUrl': None
-        }
+        })
+        return places.to_dict('records')
+
+    def load_places_batch(self, tx, places: List[Dict]) -> int:
+        """
+        Write a batch of places in transaction `tx`; returns the number written.
+
+        Normally they are staged for merge_staged_places. With initial_load
+        they become Place nodes straight away, with no per-row index seek;
+        the geonameId constraint still rejects anything already present.
+        """
+        if self.initial_load:
+            places = [place for place in places if place['geonameId'] not in self._loaded_ids]
+            self._loaded_ids.update(place['geonameId'] for place in places)
+            query = """
+                UNWIND $places AS place
+                CREATE (p:Place)
+                SET p = place
+            """
+        else:
+            query = """
+                UNWIND $places AS place
+                CREATE (s:PlaceStaging)
+                SET s = place
+            """
 
-    def load_places_batch(self, places: List[Dict]):
-        """Load a batch of places into Neo4j."""
+        tx.run(query, places=places).consume()
+        return len(places)
+
+    def create_countries(self, codes: Set[str]):
+        """Create Country nodes for the given codes."""
         with self.driver.session() as session:
             session.run("""
-                UNWIND $places AS place
-                MERGE (p:Place {geonameId: place.geonameId})
-                SET p.name = place.name,
-                    p.asciiName = place.asciiName,
-                    p.alternateNames = place.alternateNames,
-                    p.latitude = place.latitude,
-                    p.longitude = place.longitude,
-                    p.featureClass = place.featureClass,
-                    p.featureCode = place.featureCode,
-                    p.countryCode = place.countryCode,
-                    p.admin1Code = place.admin1Code,
-                    p.admin2Code = place.admin2Code,
-                    p.admin3Code = place.admin3Code,
-                    p.admin4Code = place.admin4Code,
-                    p.population = place.population,
-                    p.elevation = place.elevation,
-                    p.timezone = place.timezone,
-                    p.modifiedDate = place.modifiedDate,
-                    p.wikidataId = place.wikidataId,
-                    p.wikipediaUrl = place.wikipediaUrl
-
-                // Create or link to country
-                MERGE (c:Country {code: place.countryCode})
-                MERGE (p)-[:LOCATED_IN_COUNTRY]->(c)
-            """, places=places)
+                UNWIND $codes AS code
+                MERGE (:Country {code: code})
+            """, codes=sorted(codes))
+
+    def merge_staged_places(self) -> int:
+        """
+        Merge staged places into Place nodes.
+
+        apoc.periodic.iterate runs the merge in parallel batches; geonameId is
+        unique, so batches never touch the same Place. Country links are left
+        to create_country_relationships. Returns places merged.
+        """
+        with self.driver.session() as session:
+            # Country nodes up front, so the merge batches never write them
+            session.run("""
+                MATCH (s:PlaceStaging)
+                WITH DISTINCT s.countryCode AS code
+                WHERE code IS NOT NULL
+                MERGE (:Country {code: code})
+            """)
+
+            result = session.run("""
+                CALL apoc.periodic.iterate(
+                    'MATCH (s:PlaceStaging) RETURN s',
+                    'MERGE (p:Place {geonameId: s.geonameId})
+                     SET p += properties(s)
+                     DELETE s',
+                    {batchSize: $batchSize, parallel: true, concurrency: $concurrency, retries: 3}
+                )
+                YIELD batches, committedOperations, failedOperations, errorMessages
+                RETURN batches, committedOperations, failedOperations, errorMessages
+            """, batchSize=self.batch_size, concurrency=self.concurrency)
+            summary = result.single()
+
+        if summary['failedOperations']:
+            print(f"  ✗ {summary['failedOperations']:,} places failed to merge: {summary['errorMessages']}")
+        return summary['committedOperations']
+
+    def create_country_relationships(self):
+        """Link places that have no country yet to their Country node."""
+        print("\nCreating Place -> Country relationships...")
+
+        with self.driver.session() as session:
+            # Country.code is unique, so the per-place lookup is an index
+            # seek. Batches run serially: every one attaches relationships to
+            # the same few Country nodes, and parallel batches would contend
+            # for their locks.
+            result = session.run("""
+                CALL apoc.periodic.iterate(
+                    'MATCH (p:Place)
+                     WHERE p.countryCode IS NOT NULL
+                       AND NOT EXISTS((p)-[:LOCATED_IN_COUNTRY]->())
+                     RETURN p',
+                    'MATCH (c:Country {code: p.countryCode})
+                     MERGE (p)-[:LOCATED_IN_COUNTRY]->(c)',
+                    {batchSize: $batchSize, parallel: false}
+                )
+                YIELD failedOperations, errorMessages, updateStatistics
+                RETURN failedOperations, errorMessages, updateStatistics
+            """, batchSize=self.batch_size)
+            summary = result.single()
+
+        if summary['failedOperations']:
+            print(f"  ✗ {summary['failedOperations']:,} places failed: {summary['errorMessages']}")
+        links = summary['updateStatistics'].get('relationshipsCreated', 0)
+        print(f"✓ Created {links:,} LOCATED_IN_COUNTRY relationships")
+
+    def read_geonames_chunks(self, f: BinaryIO):
+        """Iterate over an open GeoNames file in DataFrames of batch_size rows."""
+        # Every column is read as text and converted per chunk in
+        # parse_geonames_frame. GeoNames does not quote fields.
+        return pd.read_csv(f, sep='\t', header=None, names=GEONAMES_FIELDS,
+                           dtype=str, keep_default_na=False, na_filter=False,
+                           quoting=csv.QUOTE_NONE, encoding='utf-8',
+                           chunksize=self.batch_size)
 
     def load_geonames_file(self, filepath: str, description: str = ""):
         """Load a GeoNames file into Neo4j."""
         print(f"\nLoading {description or filepath}...")
 
-        # Count total lines for progress bar
-        with open(filepath, 'r', encoding='utf-8') as f:
-            total_lines = sum(1 for _ in f)
-
-        batch = []
         loaded_count = 0
-
-        with open(filepath, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f, fieldnames=GEONAMES_FIELDS, delimiter='\t')
-
-            with tqdm(total=total_lines, desc=description) as pbar:
-                for row in reader:
-                    try:
-                        place = self.parse_geonames_row(row)
-                        batch.append(place)
-
-                        if len(batch) >= self.batch_size:
-                            self.load_places_batch(batch)
-                            loaded_count += len(batch)
-                            batch = []
-
-                        pbar.update(1)
-
-                    except Exception as e:
-                        print(f"Error parsing row {row.get('geonameid')}: {e}")
-                        continue
-
-                # Load remaining batch
-                if batch:
-                    self.load_places_batch(batch)
-                    loaded_count += len(batch)
+        country_codes = set()
+
+        # Progress is measured in bytes read, so no counting pass is needed.
+        # One session serves the whole file, and each transaction carries
+        # commit_every batches to cut down on commits.
+        with open(filepath, 'rb') as f, \
+                tqdm(total=os.path.getsize(filepath), desc=description,
+                     unit='B', unit_scale=True) as pbar, \
+                self.driver.session() as session:
+            tx = session.begin_transaction()
+            try:
+                for i, frame in enumerate(self.read_geonames_chunks(f), 1):
+                    places = self.parse_geonames_frame(frame)
+                    if places:
+                        loaded_count += self.load_places_batch(tx, places)
+                        if self.initial_load:
+                            country_codes.update(frame['country_code'])
+                    if i % self.commit_every == 0:
+                        tx.commit()
+                        tx = session.begin_transaction()
+                    pbar.update(f.tell() - pbar.n)
+                tx.commit()
+            finally:
+                tx.close()
+
+        if self.initial_load:
+            self.create_countries(country_codes)
+        else:
+            print("Merging staged places...")
+            loaded_count = self.merge_staged_places()
 
         print(f"✓ Loaded {loaded_count:,} places from {description}")
         return loaded_count
 
+    def export_admin_csv(self, files: List[Tuple[str, str]], outdir: str) -> int:
+        """
+        Write GeoNames files as CSV for an offline `neo4j-admin database import`.
+
+        Args:
+            files: (filepath, description) pairs, in the order they would be loaded
+            outdir: Directory for places_nodes.csv, countries.csv and located_in_country.csv
+
+        Returns:
+            Number of places written
+        """
+        print(f"\nExporting GeoNames CSV for neo4j-admin import to {outdir}...")
+        os.makedirs(outdir, exist_ok=True)
+
+        place_columns = [
+            ('geonameId', 'geonameId:ID(Place)'), ('name', 'name'),
+            ('asciiName', 'asciiName'), ('alternateNames', 'alternateNames:string[]'),
+            ('latitude', 'latitude:double'), ('longitude', 'longitude:double'),
+            ('featureClass', 'featureClass'), ('featureCode', 'featureCode'),
+            ('countryCode', 'countryCode'), ('admin1Code', 'admin1Code'),
+            ('admin2Code', 'admin2Code'), ('admin3Code', 'admin3Code'),
+            ('admin4Code', 'admin4Code'), ('population', 'population:long'),
+            ('elevation', 'elevation:long'), ('timezone', 'timezone'),
+            ('modifiedDate', 'modifiedDate'),
+        ]
+
+        seen = set()
+        country_ids: Dict[str, int] = {}
+        written = 0
+
+        with open(os.path.join(outdir, 'places_nodes.csv'), 'w', newline='',
+                  encoding='utf-8', buffering=1 << 20) as places_file, \
+                open(os.path.join(outdir, 'located_in_country.csv'), 'w', newline='',
+                     encoding='utf-8', buffering=1 << 20) as rels_file:
+            places_out = csv.writer(places_file, delimiter='\t')
+            rels_out = csv.writer(rels_file, delimiter='\t')
+            places_out.writerow([header for _, header in place_columns] + [':LABEL'])
+            rels_out.writerow([':START_ID(Place)', ':END_ID(Country)', ':TYPE'])
+
+            # The online load MERGEs, so a place in several files keeps the
+            # values from the last one; exporting in reverse and keeping the
+            # first occurrence gives the same result
+            for filepath, description in reversed(files):
+                with open(filepath, 'rb') as f, \
+                        tqdm(total=os.path.getsize(filepath), desc=description,
+                             unit='B', unit_scale=True) as pbar:
+                    for frame in self.read_geonames_chunks(f):
+                        for place in self.parse_geonames_frame(frame):
+                            geoname_id = place['geonameId']
+                            if geoname_id in seen:
+                                continue
+                            seen.add(geoname_id)
+
+                            place['alternateNames'] = '|'.join(place['alternateNames'])
+                            places_out.writerow([place[key] for key, _ in place_columns] + ['Place'])
+
+                            code = place['countryCode']
+                            country_id = country_ids.setdefault(code, len(country_ids))
+                            rels_out.writerow([geoname_id, country_id, 'LOCATED_IN_COUNTRY'])
+                            written += 1
+                        pbar.update(f.tell() - pbar.n)
+
+        # Country nodes get integer IDs in their own group so --id-type=integer
+        # keeps geonameId a long property
+        with open(os.path.join(outdir, 'countries.csv'), 'w', newline='',
+                  encoding='utf-8') as f:
+            out = csv.writer(f, delimiter='\t')
+            out.writerow([':ID(Country)', 'code', ':LABEL'])
+            for code, country_id in country_ids.items():
+                out.writerow([country_id, code, 'Country'])
+
+        print(f"✓ Exported {written:,} places in {len(country_ids):,} countries")
+        return written
+
+    @staticmethod
+    def admin_import_command(outdir: str, database: str = 'neo4j') -> List[str]:
+        """
+        neo4j-admin command that bulk-loads the CSV from export_admin_csv.
+
+        The import writes store files directly, so it needs a stopped server
+        and an empty (or overwritten) database.
+        """
+        return [
+            'neo4j-admin', 'database', 'import', 'full', database,
+            f"--nodes={os.path.join(outdir, 'places_nodes.csv')}",
+            f"--nodes={os.path.join(outdir, 'countries.csv')}",
+            f"--relationships={os.path.join(outdir, 'located_in_country.csv')}",
+            '--delimiter=TAB',
+            '--array-delimiter=|',
+            '--id-type=integer',
+            '--skip-duplicate-nodes=true',
+        ]
+
     def create_admin_divisions(self):
         """Create AdminDivision nodes from Place data."""
         print("\nCreating administrative division nodes...")
@@ -226,27 +412,27 @@ class GeoNamesLoader:
         print("\nCreating administrative relationships...")
 
         with self.driver.session() as session:
-            # Link places to admin1
-            result = session.run("""
-                MATCH (p:Place)
-                WHERE p.admin1Code <> ''
-                MATCH (a:AdminDivision {code: p.admin1Code, countryCode: p.countryCode, level: 1})
-                MERGE (p)-[:LOCATED_IN_ADMIN1]->(a)
-                RETURN count(p) AS count
-            """)
-            admin1_links = result.single()['count']
-            print(f"✓ Created {admin1_links:,} LOCATED_IN_ADMIN1 relationships")
-
-            # Link places to admin2
-            result = session.run("""
-                MATCH (p:Place)
-                WHERE p.admin2Code <> ''
-                MATCH (a:AdminDivision {code: p.admin2Code, countryCode: p.countryCode, level: 2})
-                MERGE (p)-[:LOCATED_IN_ADMIN2]->(a)
-                RETURN count(p) AS count
-            """)
-            admin2_links = result.single()['count']
-            print(f"✓ Created {admin2_links:,} LOCATED_IN_ADMIN2 relationships")
+            # Driven from the few thousand admin divisions, each seeking its
+            # places through the place_admin1/place_admin2 composite indexes
+            # instead of scanning every Place
+            for level in (1, 2):
+                result = session.run(f"""
+                    CALL apoc.periodic.iterate(
+                        'MATCH (a:AdminDivision {{level: {level}}}) RETURN a',
+                        'MATCH (p:Place {{countryCode: a.countryCode, admin{level}Code: a.code}})
+                         MERGE (p)-[:LOCATED_IN_ADMIN{level}]->(a)',
+                        {{batchSize: 1000, parallel: true, concurrency: $concurrency, retries: 3}}
+                    )
+                    YIELD committedOperations, failedOperations, errorMessages, updateStatistics
+                    RETURN committedOperations, failedOperations, errorMessages, updateStatistics
+                """, concurrency=self.concurrency)
+                summary = result.single()
+
+                if summary['failedOperations']:
+                    print(f"  ✗ {summary['failedOperations']:,} admin{level} divisions failed: "
+                          f"{summary['errorMessages']}")
+                links = summary['updateStatistics'].get('relationshipsCreated', 0)
+                print(f"✓ Created {links:,} LOCATED_IN_ADMIN{level} relationships")
 
     def print_statistics(self):
         """Print database statistics."""
@@ -312,6 +498,29 @@ class GeoNamesLoader:
 
 def main():
     """Main execution function."""
+    parser = argparse.ArgumentParser(description="Load GeoNames data into Neo4j")
+    parser.add_argument(
+        '--export-csv',
+        metavar='DIR',
+        help='Write neo4j-admin import CSV to DIR instead of loading over Bolt'
+    )
+    parser.add_argument(
+        '--run-import',
+        action='store_true',
+        help='With --export-csv, also run neo4j-admin database import (server must be stopped)'
+    )
+    parser.add_argument(
+        '--initial-load',
+        action='store_true',
+        help='Database has no places yet: CREATE them directly instead of merging'
+    )
+    parser.add_argument(
+        '--skip-places',
+        action='store_true',
+        help='Skip loading places (e.g. after a neo4j-admin import); only build schema and admin divisions'
+    )
+    args = parser.parse_args()
+
     # Configuration
     NEO4J_URI = os.getenv('NEO4J_URI', 'bolt://localhost:7687')
     NEO4J_USER = os.getenv('NEO4J_USER', 'neo4j')
@@ -321,33 +530,53 @@ def main():
     CITIES500_FILE = os.path.join(DATA_DIR, 'cities500.txt')
     CA_FILE = os.path.join(DATA_DIR, 'CA', 'CA.txt')
 
+    files = [
+        (CITIES500_FILE, "Global cities (pop > 500)"),  # Global coverage
+        (CA_FILE, "Canadian geographic features"),  # Canadian data (comprehensive)
+    ]
+    for filepath, _ in files:
+        if not os.path.exists(filepath):
+            print(f"⚠ File not found: {filepath}")
+    files = [(filepath, description) for filepath, description in files
+             if os.path.exists(filepath)]
+
     print("="*60)
     print("GeoNames LOD Knowledge Graph Loader")
     print("="*60)
 
     # Initialize loader
-    loader = GeoNamesLoader(NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD)
+    loader = GeoNamesLoader(NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD,
+                            initial_load=args.initial_load)
 
     try:
+        if args.export_csv:
+            loader.export_admin_csv(files, args.export_csv)
+            command = loader.admin_import_command(args.export_csv)
+            if args.run_import:
+                print(f"\nRunning: {' '.join(command)}")
+                subprocess.run(command, check=True)
+                print("✓ Bulk import complete")
+            else:
+                print("\nTo bulk-load, stop Neo4j and run:")
+                print(f"  {' '.join(command)}")
+            print("Then start Neo4j and rerun with --skip-places to build the schema and admin divisions")
+            return
+
         # Setup schema
         loader.setup_schema()
 
         # Optional: Clear existing data (COMMENTED OUT FOR SAFETY)
         # loader.clear_database(confirm=True)
 
-        # Load cities500 (global coverage)
-        if os.path.exists(CITIES500_FILE):
-            loader.load_geonames_file(CITIES500_FILE, "Global cities (pop > 500)")
-        else:
-            print(f"⚠ File not found: {CITIES500_FILE}")
-
-        # Load Canadian data (comprehensive)
-        if os.path.exists(CA_FILE):
-            loader.load_geonames_file(CA_FILE, "Canadian geographic features")
-        else:
-            print(f"⚠ File not found: {CA_FILE}")
+        if not args.skip_places:
+            # A place in several files keeps the values from the last one.
+            # Merging does that naturally; an initial load keeps the first
+            # occurrence, so it reads the files in reverse.
+            for filepath, description in (reversed(files) if args.initial_load else files):
+                loader.load_geonames_file(filepath, description)
 
-        # Create admin divisions and relationships
+        # Country links once for all files, then admin divisions
+        loader.create_country_relationships()
         loader.create_admin_divisions()
         loader.create_admin_relationships()
 
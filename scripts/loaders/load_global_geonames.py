@@ -60,62 +60,41 @@ class GlobalGeoNamesLoader:
     def close(self):
         self.driver.close()
 
-    def parse_geonames_row(self, row: Dict, include_codes: Optional[Set[str]] = None) -> Optional[Dict]:
-        """Parse a GeoNames row into Neo4j-friendly format."""
+    def parse_geonames_row(self, row: List[str], include_codes: Optional[Set[str]] = None) -> Optional[Dict]:
+        """Parse a GeoNames row (fields in GEONAMES_FIELDS order) into Neo4j-friendly format."""
         try:
-            # Parse alternate names into list
-            alt_names = []
-            if row.get('alternatenames'):
-                alt_names = [n.strip() for n in row['alternatenames'].split(',') if n.strip()]
-
-            # Convert numeric fields
-            try:
-                population = int(row.get('population', 0) or 0)
-            except ValueError:
-                population = 0
-
-            try:
-                elevation = int(row.get('elevation', 0) or 0)
-            except ValueError:
-                elevation = 0
-
-            try:
-                latitude = float(row['latitude'])
-                longitude = float(row['longitude'])
-            except (ValueError, KeyError):
-                latitude = None
-                longitude = None
+            (geonameid, name, asciiname, alternatenames, latitude, longitude,
+             feature_class, feature_code, country_code, _cc2, admin1_code,
+             admin2_code, admin3_code, admin4_code, population, elevation,
+             _dem, timezone, modification_date) = row
 
             # Skip records without coordinates (useless for NER reconciliation)
-            if latitude is None or longitude is None:
+            if not latitude or not longitude:
                 return None
 
-            feature_class = row['feature_class']
-            feature_code = row['feature_code']
-            full_code = f"{feature_class}.{feature_code}"
-
             return {
-                'geonameId': int(row['geonameid']),
-                'name': row['name'],
-                'asciiName': row['asciiname'],
-                'alternateNames': alt_names,
-                'latitude': latitude,
-                'longitude': longitude,
+                'geonameId': int(geonameid),
+                'name': name,
+                'asciiName': asciiname,
+                'alternateNames': [n.strip() for n in alternatenames.split(',') if n.strip()] if alternatenames else [],
+                'latitude': float(latitude),
+                'longitude': float(longitude),
                 'featureClass': feature_class,
                 'featureCode': feature_code,
-                'fullFeatureCode': full_code,
-                'countryCode': row['country_code'],
-                'admin1Code': row.get('admin1_code', ''),
-                'admin2Code': row.get('admin2_code', ''),
-                'admin3Code': row.get('admin3_code', ''),
-                'admin4Code': row.get('admin4_code', ''),
-                'population': population,
-                'elevation': elevation,
-                'timezone': row.get('timezone', ''),
-                'modifiedDate': row.get('modification_date', ''),
+                'fullFeatureCode': f"{feature_class}.{feature_code}",
+                'countryCode': country_code,
+                'admin1Code': admin1_code,
+                'admin2Code': admin2_code,
+                'admin3Code': admin3_code,
+                'admin4Code': admin4_code,
+                # GeoNames writes these as plain integers or leaves them empty
+                'population': int(population) if population else 0,
+                'elevation': int(elevation) if elevation else 0,
+                'timezone': timezone,
+                'modifiedDate': modification_date,
             }
         except Exception as e:
-            print(f"Error parsing geonameId {row.get('geonameid')}: {e}")
+            print(f"Error parsing geonameId {row[0] if row else None}: {e}")
             return None
 
     def load_places_batch(self, places: List[Dict]):
@@ -207,7 +186,8 @@ class GlobalGeoNamesLoader:
         current_line = 0
 
         with open(filepath, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f, fieldnames=GEONAMES_FIELDS, delimiter='\t')
+            # Rows are lists in GEONAMES_FIELDS order; GeoNames does not quote fields
+            reader = csv.reader(f, delimiter='\t', quoting=csv.QUOTE_NONE)
 
             with tqdm(total=total_lines, desc="Loading places", unit=" records") as pbar:
                 for row in reader:
@@ -218,7 +198,7 @@ class GlobalGeoNamesLoader:
                         pbar.update(1)
                         continue
 
-                    country_code = row.get('country_code', '')
+                    country_code = row[8] if len(row) > 8 else ''
 
                     # Apply exclusion filter
                     if exclude_countries and country_code in exclude_countries:
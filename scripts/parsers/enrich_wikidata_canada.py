@@ -13,31 +13,161 @@ Strategy:
 """
 
 import os
+import re
 import time
 import json
-from typing import Dict, List, Optional, Set
-from neo4j import GraphDatabase
+import hashlib
+import argparse
+import socket
+import threading
+from urllib.error import HTTPError, URLError
+from datetime import date, datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional, Set, Tuple
+from neo4j import GraphDatabase, READ_ACCESS
 from SPARQLWrapper import SPARQLWrapper, JSON as SPARQL_JSON
+from SPARQLWrapper.SPARQLExceptions import EndPointInternalError
 import requests
 from tqdm import tqdm
 from dotenv import load_dotenv
 
 load_dotenv()
 
+WIKIDATA_SPARQL_ENDPOINT = "https://query.wikidata.org/sparql"
+
+# Batch lookup by GeoNames ID. Only the VALUES block changes between batches,
+# so the query text is split once around it instead of re-formatted per batch.
+GEONAMES_BATCH_QUERY = """
+SELECT ?place ?placeLabel ?coords ?population
+       ?geonamesId ?inception ?dissolved ?wikipedia ?description
+       (GROUP_CONCAT(DISTINCT ?altLabel; separator="|") AS ?altLabels)
+WHERE {
+  VALUES ?geonamesId { $VALUES }
+  ?place wdt:P1566 ?geonamesId .
+
+  OPTIONAL { ?place wdt:P625 ?coords . }
+  OPTIONAL { ?place wdt:P1082 ?population . }
+  OPTIONAL { ?place wdt:P571 ?inception . }
+  OPTIONAL { ?place wdt:P576 ?dissolved . }
+  OPTIONAL {
+    ?wikipedia schema:about ?place .
+    ?wikipedia schema:inLanguage "en" .
+    FILTER (STRSTARTS(STR(?wikipedia), "https://en.wikipedia.org/"))
+  }
+  OPTIONAL { ?place schema:description ?description . FILTER(LANG(?description) = "en") }
+  OPTIONAL { ?place skos:altLabel ?altLabel . FILTER(LANG(?altLabel) IN ("en", "fr", "")) }
+
+  SERVICE wikibase:label {
+    bd:serviceParam wikibase:language "en,fr" .
+  }
+}
+GROUP BY ?place ?placeLabel ?coords ?population ?geonamesId
+         ?inception ?dissolved ?wikipedia ?description
+"""
+GEONAMES_BATCH_QUERY_HEAD, GEONAMES_BATCH_QUERY_TAIL = GEONAMES_BATCH_QUERY.split('$VALUES')
+
+# WKT literal from P625: "Point(longitude latitude)"
+_COORD_RE = re.compile(r'Point\(([-+0-9.eE]+) ([-+0-9.eE]+)\)')
+_EMPTY = {}
+
+
+def _to_int(value: Optional[str]) -> Optional[int]:
+    """Parse a SPARQL numeric literal (e.g. "1234" or "1.2E4") to int."""
+    if not value:
+        return None
+    try:
+        return int(float(value))
+    except ValueError:
+        return None
+
+
+def _to_date(value: Optional[str]) -> Optional[date]:
+    """Parse a SPARQL xsd:dateTime (e.g. "1834-03-06T00:00:00Z") to a date."""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).date()
+    except ValueError:
+        # BCE years and other values Python's date cannot represent
+        return None
+
+
+RETRYABLE_HTTP_STATUSES = {429, 502, 503, 504}
+
+
+def query_with_backoff(sparql: SPARQLWrapper, max_attempts: int = 5,
+                       max_wait: float = 60.0) -> Dict:
+    """
+    Run the query set on `sparql` and return the converted JSON, retrying
+    transient failures with exponential backoff (2s, 4s, 8s, ... capped at
+    `max_wait`). HTTP 429 responses honour the Retry-After header.
+    """
+    for attempt in range(1, max_attempts + 1):
+        try:
+            return sparql.query().convert()
+
+        except HTTPError as e:
+            if e.code not in RETRYABLE_HTTP_STATUSES or attempt == max_attempts:
+                raise
+            retry_after = e.headers.get('Retry-After') if e.headers else None
+            wait = float(retry_after) if retry_after and retry_after.isdigit() \
+                else min(2 ** attempt, max_wait)
+            error = f"HTTP {e.code}"
+
+        except (EndPointInternalError, URLError, socket.timeout) as e:
+            if attempt == max_attempts:
+                raise
+            wait = min(2 ** attempt, max_wait)
+            error = type(e).__name__
+
+        print(f"  ⚠ SPARQL {error}, retrying in {wait:.0f}s "
+              f"(attempt {attempt}/{max_attempts})")
+        time.sleep(wait)
+
+
+class RateLimiter:
+    """Thread-safe gate that spaces calls to at most `rate` per second."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate
+        self.lock = threading.Lock()
+        self.next_slot = time.monotonic()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(self.next_slot, now)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
 
 class CanadaWikidataEnricher:
     """Comprehensive Wikidata enrichment for Canadian locations."""
 
     def __init__(self, uri: str, user: str, password: str):
         self.driver = GraphDatabase.driver(uri, auth=(user, password))
-        self.sparql = SPARQLWrapper("https://query.wikidata.org/sparql")
-        self.sparql.setReturnFormat(SPARQL_JSON)
-        self.sparql.setTimeout(300)  # 5 minute timeout for large queries
-        self.request_delay = 1.0  # Be nice to Wikidata
+        self.sparql = self._new_sparql_client()
+        self.max_workers = 4  # Wikidata allows a handful of parallel queries
+        self.rate_limiter = RateLimiter(5.0)  # Be nice to Wikidata (~5 req/s total)
+        self._local = threading.local()
 
     def close(self):
         self.driver.close()
 
+    @staticmethod
+    def _new_sparql_client() -> SPARQLWrapper:
+        sparql = SPARQLWrapper(WIKIDATA_SPARQL_ENDPOINT)
+        sparql.setReturnFormat(SPARQL_JSON)
+        sparql.setTimeout(300)  # 5 minute timeout for large queries
+        return sparql
+
+    def _thread_sparql(self) -> SPARQLWrapper:
+        """SPARQLWrapper is not thread-safe; give each worker its own."""
+        if not hasattr(self._local, 'sparql'):
+            self._local.sparql = self._new_sparql_client()
+        return self._local.sparql
+
     def fetch_all_canadian_places_from_wikidata(self) -> List[Dict]:
         """
         Fetch ALL Canadian geographic places from Wikidata.
@@ -50,8 +180,9 @@ class CanadaWikidataEnricher:
         # P17 = country, Q16 = Canada
         # P625 = coordinate location
         query = """
-        SELECT DISTINCT ?place ?placeLabel ?placeAltLabel ?coords ?population
+        SELECT ?place ?placeLabel ?coords ?population
                ?geonamesId ?inception ?dissolved ?wikipedia ?description
+               (GROUP_CONCAT(DISTINCT ?altLabel; separator="|") AS ?altLabels)
         WHERE {
           # Must be located in Canada
           ?place wdt:P17 wd:Q16 .
@@ -92,17 +223,22 @@ class CanadaWikidataEnricher:
           OPTIONAL {
             ?wikipedia schema:about ?place .
             ?wikipedia schema:inLanguage "en" .
-            FILTER (SUBSTR(str(?wikipedia), 1, 25) = "https://en.wikipedia.org/")
+            FILTER (STRSTARTS(STR(?wikipedia), "https://en.wikipedia.org/"))
           }
 
           # Get description
           OPTIONAL { ?place schema:description ?description . FILTER(LANG(?description) = "en") }
 
+          # Get alternate names (aggregated below, one row per place)
+          OPTIONAL { ?place skos:altLabel ?altLabel . FILTER(LANG(?altLabel) IN ("en", "fr", "")) }
+
           # Get labels
           SERVICE wikibase:label {
             bd:serviceParam wikibase:language "en,fr" .
           }
         }
+        GROUP BY ?place ?placeLabel ?coords ?population ?geonamesId
+                 ?inception ?dissolved ?wikipedia ?description
         """
 
         print("Querying Wikidata for ALL Canadian places (this may take several minutes)...")
@@ -111,64 +247,61 @@ class CanadaWikidataEnricher:
         self.sparql.setQuery(query)
 
         try:
-            results = self.sparql.query().convert()
+            # One retry only: a timeout here is expected and has a fallback
+            results = query_with_backoff(self.sparql, max_attempts=2)
             bindings = results.get('results', {}).get('bindings', [])
 
             print(f"✓ Retrieved {len(bindings):,} Canadian places from Wikidata")
 
             # Parse results
-            places = []
-            for b in bindings:
-                place_data = self._parse_wikidata_binding(b)
-                if place_data:
-                    places.append(place_data)
-
-            return places
+            return self._parse_wikidata_bindings(bindings)
 
         except Exception as e:
             print(f"✗ Error querying Wikidata: {e}")
             print("Falling back to batch fetching by GeoNames IDs...")
             return self._fetch_by_geonames_ids()
 
-    def _parse_wikidata_binding(self, binding: Dict) -> Optional[Dict]:
+    def _parse_wikidata_bindings(self, bindings: List[Dict]) -> List[Dict]:
+        """Parse SPARQL result bindings, dropping any that are not Q-items."""
+        parse = self._parse_wikidata_binding
+        return [place for place in map(parse, bindings) if place]
+
+    @staticmethod
+    def _parse_wikidata_binding(binding: Dict) -> Optional[Dict]:
         """Parse a Wikidata SPARQL result binding into structured data."""
 
+        get = binding.get
+
         try:
             # Extract Q-number from URI
-            place_uri = binding.get('place', {}).get('value', '')
-            qid = place_uri.split('/')[-1] if place_uri else None
+            qid = get('place', _EMPTY).get('value', '').rpartition('/')[2]
 
-            if not qid or not qid.startswith('Q'):
+            if not qid.startswith('Q'):
                 return None
 
             # Parse coordinates
-            coords_str = binding.get('coords', {}).get('value', '')
             lat, lon = None, None
-            if coords_str:
-                # Format: "Point(longitude latitude)"
-                try:
-                    coords_parts = coords_str.replace('Point(', '').replace(')', '').split()
-                    lon = float(coords_parts[0])
-                    lat = float(coords_parts[1])
-                except:
-                    pass
+            coords = _COORD_RE.match(get('coords', _EMPTY).get('value', ''))
+            if coords:
+                lon = float(coords.group(1))
+                lat = float(coords.group(2))
 
-            # Parse alternate labels (comes as single string, space-separated)
-            alt_labels = binding.get('placeAltLabel', {}).get('value', '')
-            alt_names = [a.strip() for a in alt_labels.split(',') if a.strip()] if alt_labels else []
+            # Parse alternate labels (GROUP_CONCAT, pipe-separated)
+            alt_labels = get('altLabels', _EMPTY).get('value', '')
+            alt_names = list(dict.fromkeys(a for a in map(str.strip, alt_labels.split('|')) if a)) if alt_labels else []
 
             return {
                 'qid': qid,
-                'name': binding.get('placeLabel', {}).get('value'),
+                'name': get('placeLabel', _EMPTY).get('value'),
                 'alternateNames': alt_names,
-                'description': binding.get('description', {}).get('value'),
+                'description': get('description', _EMPTY).get('value'),
                 'latitude': lat,
                 'longitude': lon,
-                'population': binding.get('population', {}).get('value'),
-                'geonamesId': binding.get('geonamesId', {}).get('value'),
-                'inceptionDate': binding.get('inception', {}).get('value'),
-                'dissolvedDate': binding.get('dissolved', {}).get('value'),
-                'wikipediaUrl': binding.get('wikipedia', {}).get('value')
+                'population': _to_int(get('population', _EMPTY).get('value')),
+                'geonamesId': get('geonamesId', _EMPTY).get('value'),
+                'inceptionDate': _to_date(get('inception', _EMPTY).get('value')),
+                'dissolvedDate': _to_date(get('dissolved', _EMPTY).get('value')),
+                'wikipediaUrl': get('wikipedia', _EMPTY).get('value')
             }
 
         except Exception as e:
@@ -186,95 +319,125 @@ class CanadaWikidataEnricher:
         # Get all Canadian GeoNames IDs from our database
         with self.driver.session() as session:
             result = session.run("""
-                MATCH (p:Place)
-                WHERE p.countryCode = 'CA'
+                MATCH (p:CanadianPlace)
                 RETURN p.geonameId AS geonameId
             """)
             geonames_ids = [record['geonameId'] for record in result]
 
         print(f"Found {len(geonames_ids):,} Canadian places in Neo4j")
 
-        # Query Wikidata in batches
+        # Build one query per batch up front
         batch_size = 1000
-        all_places = []
+        queries = []
 
-        for i in tqdm(range(0, len(geonames_ids), batch_size), desc="Fetching Wikidata batches"):
+        for i in range(0, len(geonames_ids), batch_size):
             batch_ids = geonames_ids[i:i+batch_size]
 
             # Create VALUES clause for batch
-            values_clause = ' '.join([f'"{gid}"' for gid in batch_ids])
-
-            query = f"""
-            SELECT DISTINCT ?place ?placeLabel ?placeAltLabel ?coords ?population
-                   ?geonamesId ?inception ?dissolved ?wikipedia ?description
-            WHERE {{
-              VALUES ?geonamesId {{ {values_clause} }}
-              ?place wdt:P1566 ?geonamesId .
-
-              OPTIONAL {{ ?place wdt:P625 ?coords . }}
-              OPTIONAL {{ ?place wdt:P1082 ?population . }}
-              OPTIONAL {{ ?place wdt:P571 ?inception . }}
-              OPTIONAL {{ ?place wdt:P576 ?dissolved . }}
-              OPTIONAL {{
-                ?wikipedia schema:about ?place .
-                ?wikipedia schema:inLanguage "en" .
-                FILTER (SUBSTR(str(?wikipedia), 1, 25) = "https://en.wikipedia.org/")
-              }}
-              OPTIONAL {{ ?place schema:description ?description . FILTER(LANG(?description) = "en") }}
-
-              SERVICE wikibase:label {{
-                bd:serviceParam wikibase:language "en,fr" .
-              }}
-            }}
-            """
-
-            self.sparql.setQuery(query)
+            values_clause = ' '.join(f'"{gid}"' for gid in batch_ids)
 
-            try:
-                results = self.sparql.query().convert()
-                bindings = results.get('results', {}).get('bindings', [])
+            query = GEONAMES_BATCH_QUERY_HEAD + values_clause + GEONAMES_BATCH_QUERY_TAIL
+            queries.append((i, query))
 
-                for b in bindings:
-                    place_data = self._parse_wikidata_binding(b)
-                    if place_data:
-                        all_places.append(place_data)
+        all_places = []
+        lock = threading.Lock()
 
-                time.sleep(self.request_delay)  # Be nice to Wikidata
+        def fetch_batch(query: str):
+            self.rate_limiter.wait()
+            sparql = self._thread_sparql()
+            sparql.setQuery(query)
+            results = query_with_backoff(sparql)
+            bindings = results.get('results', {}).get('bindings', [])
 
-            except Exception as e:
-                print(f"Error fetching batch {i}: {e}")
-                continue
+            places = self._parse_wikidata_bindings(bindings)
+
+            with lock:
+                all_places.extend(places)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(fetch_batch, query): i for i, query in queries}
+
+            for future in tqdm(as_completed(futures), total=len(futures),
+                               desc="Fetching Wikidata batches"):
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"Error fetching batch {futures[future]}: {e}")
 
         print(f"✓ Retrieved {len(all_places):,} places from Wikidata")
         return all_places
 
-    def get_additional_alternate_names(self, qid: str) -> List[str]:
+    def ensure_indexes(self):
         """
-        Fetch comprehensive alternate names for a Wikidata entity.
-        Includes historical names, alternate spellings, names in different languages.
+        Make sure the identity keys used by the MATCH/MERGE writes are indexed.
+
+        Without them every row of a batch becomes a full Place scan.
         """
+        print("Checking Place identity indexes...")
 
-        query = f"""
-        SELECT ?altLabel ?language WHERE {{
-          wd:{qid} skos:altLabel ?altLabel .
-          BIND(LANG(?altLabel) AS ?language)
-          FILTER(?language IN ("en", "fr", ""))
-        }}
+        with self.driver.session() as session:
+            # wikidataId only gets a plain index: one Wikidata item can carry
+            # several GeoNames IDs, so the same QID lands on several places
+            for cypher in [
+                "CREATE CONSTRAINT place_geonameid IF NOT EXISTS FOR (p:Place) REQUIRE p.geonameId IS UNIQUE",
+                "CREATE INDEX place_wikidataid_idx IF NOT EXISTS FOR (p:Place) ON (p.wikidataId)",
+            ]:
+                try:
+                    session.run(cypher).consume()
+                    print(f"✓ {cypher.split()[2]}")
+                except Exception as e:
+                    # Equivalent constraint or index under another name
+                    print(f"⚠ {cypher.split()[2]}: {e}")
+
+    def ensure_canadian_place_label(self):
         """
+        Tag Canadian places with the :CanadianPlace label.
 
-        self.sparql.setQuery(query)
+        Queries below match on the label instead of filtering every Place
+        on countryCode. Only untagged nodes are touched, so re-runs are cheap.
+        """
+        with self.driver.session() as session:
+            summary = session.run("""
+                MATCH (p:Place {countryCode: 'CA'})
+                WHERE NOT p:CanadianPlace
+                CALL { WITH p SET p:CanadianPlace } IN TRANSACTIONS OF 10000 ROWS
+            """).consume()
+
+        labels_added = summary.counters.labels_added
+        if labels_added:
+            print(f"✓ Labelled {labels_added:,} places as :CanadianPlace")
+
+    def get_enriched_place_hashes(self) -> Dict[int, Optional[str]]:
+        """Return {geonameId: wikidataHash} for Canadian places that already have a wikidataId."""
+        with self.driver.session() as session:
+            result = session.run("""
+                MATCH (p:CanadianPlace)
+                WHERE p.wikidataId IS NOT NULL
+                  AND p.geonameId IS NOT NULL
+                RETURN p.geonameId AS geonameId, p.wikidataHash AS wikidataHash
+            """)
+            return {record['geonameId']: record['wikidataHash'] for record in result}
 
-        try:
-            results = self.sparql.query().convert()
-            bindings = results.get('results', {}).get('bindings', [])
-            return list(set([b['altLabel']['value'] for b in bindings if 'altLabel' in b]))
-        except:
-            return []
+    @staticmethod
+    def _props_hash(props: Dict) -> str:
+        """Stable digest of a property map (Python's hash() is salted per process)."""
+        payload = json.dumps(props, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.md5(payload.encode('utf-8')).hexdigest()
 
-    def match_and_update_by_geonames_id(self, wikidata_places: List[Dict]) -> int:
-        """Match Wikidata entries to Neo4j places by GeoNames ID and update."""
+    def match_and_update_by_geonames_id(self, wikidata_places: List[Dict],
+                                        batch_size: int = 1000,
+                                        enriched: Optional[Dict[int, Optional[str]]] = None) -> int:
+        """
+        Match Wikidata entries to Neo4j places by GeoNames ID and update.
 
-        matched = 0
+        Places listed in `enriched` are skipped when their stored
+        wikidataHash matches the incoming properties.
+        """
+
+        enriched = enriched or {}
+        by_geonames_id: Dict[int, Tuple[Tuple[str, str], Dict]] = {}
+        rows = []
+        unchanged = 0
 
         for wd_place in tqdm(wikidata_places, desc="Matching by GeoNames ID"):
             geonames_id = wd_place.get('geonamesId')
@@ -287,52 +450,88 @@ class CanadaWikidataEnricher:
             except:
                 continue
 
-            # Get additional alternate names
-            if wd_place.get('qid'):
-                additional_names = self.get_additional_alternate_names(wd_place['qid'])
-                all_alt_names = list(set(wd_place.get('alternateNames', []) + additional_names))
-            else:
-                all_alt_names = wd_place.get('alternateNames', [])
-
-            # Update Neo4j
-            with self.driver.session() as session:
-                result = session.run("""
-                    MATCH (p:Place {geonameId: $geonameId})
-                    SET p.wikidataId = $qid,
-                        p.wikipediaUrl = $wikipediaUrl,
-                        p.wikidataDescription = $description,
-                        p.wikidataPopulation = $population,
-                        p.inceptionDate = $inceptionDate,
-                        p.dissolvedDate = $dissolvedDate,
-                        p.wikidataAlternateNames = $altNames,
-                        p.wikidataLatitude = $lat,
-                        p.wikidataLongitude = $lon
-                    RETURN count(p) AS updated
-                """,
-                    geonameId=geonames_id_int,
-                    qid=wd_place.get('qid'),
-                    wikipediaUrl=wd_place.get('wikipediaUrl'),
-                    description=wd_place.get('description'),
-                    population=wd_place.get('population'),
-                    inceptionDate=wd_place.get('inceptionDate'),
-                    dissolvedDate=wd_place.get('dissolvedDate'),
-                    altNames=all_alt_names,
-                    lat=wd_place.get('latitude'),
-                    lon=wd_place.get('longitude')
-                )
-
-                if result.single()['updated'] > 0:
-                    matched += 1
-
-        return matched
-
-    def create_wikidata_only_places(self, wikidata_places: List[Dict]) -> int:
+            all_alt_names = wd_place.get('alternateNames', [])
+
+            props = {
+                'wikidataId': wd_place.get('qid'),
+                'wikipediaUrl': wd_place.get('wikipediaUrl'),
+                'wikidataDescription': wd_place.get('description'),
+                'wikidataPopulation': wd_place.get('population'),
+                'inceptionDate': wd_place.get('inceptionDate'),
+                'dissolvedDate': wd_place.get('dissolvedDate'),
+                'wikidataAlternateNames': all_alt_names,
+                'wikidataLatitude': wd_place.get('latitude'),
+                'wikidataLongitude': wd_place.get('longitude')
+            }
+            # Multi-valued facets and Wikidata items sharing a GeoNames ID
+            # give several rows per place. Keep the one with the lowest
+            # (QID, hash) so the same row, and so the same stored hash, wins
+            # on every run whatever order the rows arrive in.
+            props_hash = self._props_hash(props)
+            key = (props['wikidataId'] or '', props_hash)
+            current = by_geonames_id.get(geonames_id_int)
+            if current is None or key < current[0]:
+                by_geonames_id[geonames_id_int] = (key, props)
+
+        for geonames_id_int, ((_, props_hash), props) in by_geonames_id.items():
+
+            # Already enriched: skip unless the Wikidata record changed. Places
+            # enriched before hashes were stored have none and are rewritten
+            # once, which backfills the hash.
+            if geonames_id_int in enriched and enriched[geonames_id_int] == props_hash:
+                unchanged += 1
+                continue
+
+            props['wikidataHash'] = props_hash
+            rows.append({'geonameId': geonames_id_int, 'props': props})
+
+        if unchanged:
+            print(f"  Skipping {unchanged:,} places already enriched and unchanged")
+
+        if not rows:
+            return 0
+
+        # Server-side batching; rows were collapsed to one per geonameId, so
+        # each touches a distinct node and batches can commit in parallel.
+        print(f"  Updating {len(rows):,} places via apoc.periodic.iterate...")
+        with self.driver.session() as session:
+            return self._periodic_iterate(session, """
+                MATCH (p:Place {geonameId: row.geonameId})
+                SET p += row.props
+            """, rows, batch_size, parallel=True)
+
+    @staticmethod
+    def _periodic_iterate(session, action: str, rows: List[Dict], batch_size: int,
+                          parallel: bool) -> int:
+        """
+        Apply `action` (which sees each element as `row`) to every row with
+        apoc.periodic.iterate and return the number of rows committed.
+        """
+        result = session.run("""
+            CALL apoc.periodic.iterate(
+                'UNWIND $rows AS row RETURN row',
+                $action,
+                {batchSize: $batchSize, parallel: $parallel, concurrency: 4,
+                 retries: 3, params: {rows: $rows}}
+            )
+            YIELD batches, committedOperations, failedOperations, errorMessages
+            RETURN batches, committedOperations, failedOperations, errorMessages
+        """, action=action, rows=rows, batchSize=batch_size, parallel=parallel)
+        summary = result.single()
+
+        if summary['failedOperations']:
+            print(f"  ✗ {summary['failedOperations']:,} rows failed: {summary['errorMessages']}")
+
+        return summary['committedOperations']
+
+    def create_wikidata_only_places(self, wikidata_places: List[Dict],
+                                    batch_size: int = 1000) -> int:
         """
         Create Place nodes for Wikidata entries that don't have GeoNames matches.
         These might be historical places, neighbourhoods, etc. not in GeoNames.
         """
 
-        created = 0
+        rows = []
 
         for wd_place in tqdm(wikidata_places, desc="Creating Wikidata-only places"):
             # Skip if already matched via GeoNames ID
@@ -343,58 +542,70 @@ class CanadaWikidataEnricher:
             if not (wd_place.get('latitude') and wd_place.get('longitude') and wd_place.get('name')):
                 continue
 
-            # Get additional alternate names
-            if wd_place.get('qid'):
-                additional_names = self.get_additional_alternate_names(wd_place['qid'])
-                all_alt_names = list(set(wd_place.get('alternateNames', []) + additional_names))
-            else:
-                all_alt_names = wd_place.get('alternateNames', [])
-
-            with self.driver.session() as session:
-                session.run("""
-                    MERGE (p:Place {wikidataId: $qid})
-                    ON CREATE SET
-                        p.name = $name,
-                        p.countryCode = 'CA',
-                        p.latitude = $lat,
-                        p.longitude = $lon,
-                        p.source = 'wikidata',
-                        p.featureClass = 'P',
-                        p.featureCode = 'PPL'
-                    SET p.wikipediaUrl = $wikipediaUrl,
-                        p.wikidataDescription = $description,
-                        p.wikidataPopulation = $population,
-                        p.inceptionDate = $inceptionDate,
-                        p.dissolvedDate = $dissolvedDate,
-                        p.alternateNames = $altNames,
-                        p.wikidataAlternateNames = $altNames
-
-                    MERGE (c:Country {code: 'CA'})
-                    MERGE (p)-[:LOCATED_IN_COUNTRY]->(c)
-                """,
-                    qid=wd_place['qid'],
-                    name=wd_place['name'],
-                    lat=wd_place['latitude'],
-                    lon=wd_place['longitude'],
-                    wikipediaUrl=wd_place.get('wikipediaUrl'),
-                    description=wd_place.get('description'),
-                    population=wd_place.get('population'),
-                    inceptionDate=wd_place.get('inceptionDate'),
-                    dissolvedDate=wd_place.get('dissolvedDate'),
-                    altNames=all_alt_names
-                )
-
-                created += 1
-
-        return created
-
-    def enrich_all_canadian_places(self):
-        """Main enrichment process for all Canadian places."""
+            all_alt_names = wd_place.get('alternateNames', [])
+
+            rows.append({
+                'qid': wd_place['qid'],
+                'name': wd_place['name'],
+                'lat': wd_place['latitude'],
+                'lon': wd_place['longitude'],
+                'wikipediaUrl': wd_place.get('wikipediaUrl'),
+                'description': wd_place.get('description'),
+                'population': wd_place.get('population'),
+                'inceptionDate': wd_place.get('inceptionDate'),
+                'dissolvedDate': wd_place.get('dissolvedDate'),
+                'altNames': all_alt_names
+            })
+
+        if not rows:
+            return 0
+
+        # Every row MERGEs onto the single Canada node, so run batches serially
+        print(f"  Writing {len(rows):,} Wikidata-only places via apoc.periodic.iterate...")
+        with self.driver.session() as session:
+            return self._periodic_iterate(session, """
+                MERGE (p:Place {wikidataId: row.qid})
+                ON CREATE SET
+                    p:CanadianPlace,
+                    p.name = row.name,
+                    p.countryCode = 'CA',
+                    p.latitude = row.lat,
+                    p.longitude = row.lon,
+                    p.source = 'wikidata',
+                    p.featureClass = 'P',
+                    p.featureCode = 'PPL'
+                SET p.wikipediaUrl = row.wikipediaUrl,
+                    p.wikidataDescription = row.description,
+                    p.wikidataPopulation = row.population,
+                    p.inceptionDate = row.inceptionDate,
+                    p.dissolvedDate = row.dissolvedDate,
+                    p.wikidataAlternateNames = row.altNames
+
+                WITH p
+                MERGE (c:Country {code: 'CA'})
+                MERGE (p)-[:LOCATED_IN_COUNTRY]->(c)
+            """, rows, batch_size, parallel=False)
+
+    def enrich_all_canadian_places(self, force: bool = False):
+        """
+        Main enrichment process for all Canadian places.
+
+        Args:
+            force: Rewrite places that already have a wikidataId
+        """
 
         print("\n" + "="*60)
         print("Comprehensive Canadian Wikidata Enrichment")
         print("="*60)
 
+        self.ensure_indexes()
+        self.ensure_canadian_place_label()
+
+        # Places enriched by a previous run (skipped unless forced)
+        enriched = {} if force else self.get_enriched_place_hashes()
+        if enriched:
+            print(f"Found {len(enriched):,} places already enriched (use --force to rewrite)")
+
         # Fetch all Canadian places from Wikidata
         wikidata_places = self.fetch_all_canadian_places_from_wikidata()
 
@@ -405,8 +616,8 @@ class CanadaWikidataEnricher:
         print(f"\nProcessing {len(wikidata_places):,} Wikidata entries...")
 
         # Match and update existing GeoNames places
-        matched = self.match_and_update_by_geonames_id(wikidata_places)
-        print(f"✓ Matched and updated {matched:,} existing places")
+        matched = self.match_and_update_by_geonames_id(wikidata_places, enriched=enriched)
+        print(f"✓ Applied Wikidata properties for {matched:,} GeoNames IDs")
 
         # Create new places for Wikidata-only entries
         created = self.create_wikidata_only_places(wikidata_places)
@@ -414,6 +625,19 @@ class CanadaWikidataEnricher:
 
         print("\n✓ Canadian Wikidata enrichment complete!")
 
+    @staticmethod
+    def _read_enrichment_statistics(tx):
+        """One scan: count(prop) skips nulls, CASE handles value predicates."""
+        result = tx.run("""
+            MATCH (p:CanadianPlace)
+            RETURN count(p) AS total,
+                   count(p.wikidataId) AS with_wikidata,
+                   count(p.wikipediaUrl) AS with_wikipedia,
+                   count(p.dissolvedDate) AS historical,
+                   sum(CASE WHEN p.source = 'wikidata' THEN 1 ELSE 0 END) AS wikidata_only
+        """)
+        return result.single()
+
     def print_enrichment_statistics(self):
         """Print comprehensive enrichment statistics."""
 
@@ -421,46 +645,13 @@ class CanadaWikidataEnricher:
         print("CANADIAN WIKIDATA ENRICHMENT STATISTICS")
         print("="*60)
 
-        with self.driver.session() as session:
-            # Total Canadian places
-            result = session.run("""
-                MATCH (p:Place)
-                WHERE p.countryCode = 'CA'
-                RETURN count(p) AS total
-            """)
-            total = result.single()['total']
-
-            # Places with Wikidata
-            result = session.run("""
-                MATCH (p:Place)
-                WHERE p.countryCode = 'CA' AND p.wikidataId IS NOT NULL
-                RETURN count(p) AS count
-            """)
-            with_wikidata = result.single()['count']
-
-            # Places with Wikipedia
-            result = session.run("""
-                MATCH (p:Place)
-                WHERE p.countryCode = 'CA' AND p.wikipediaUrl IS NOT NULL
-                RETURN count(p) AS count
-            """)
-            with_wikipedia = result.single()['count']
-
-            # Historical places (dissolved)
-            result = session.run("""
-                MATCH (p:Place)
-                WHERE p.countryCode = 'CA' AND p.dissolvedDate IS NOT NULL
-                RETURN count(p) AS count
-            """)
-            historical = result.single()['count']
-
-            # Wikidata-only places
-            result = session.run("""
-                MATCH (p:Place)
-                WHERE p.countryCode = 'CA' AND p.source = 'wikidata'
-                RETURN count(p) AS count
-            """)
-            wikidata_only = result.single()['count']
+        with self.driver.session(default_access_mode=READ_ACCESS) as session:
+            stats = session.execute_read(self._read_enrichment_statistics)
+            total = stats['total']
+            with_wikidata = stats['with_wikidata']
+            with_wikipedia = stats['with_wikipedia']
+            historical = stats['historical']
+            wikidata_only = stats['wikidata_only']
 
             print(f"\nTotal Canadian Places: {total:,}")
             print(f"  With Wikidata: {with_wikidata:,} ({(with_wikidata/total)*100:.1f}%)")
@@ -474,6 +665,13 @@ class CanadaWikidataEnricher:
 def main():
     """Main execution function."""
 
+    parser = argparse.ArgumentParser(
+        description='Enrich Canadian places in Neo4j with Wikidata metadata'
+    )
+    parser.add_argument('--force', action='store_true',
+                        help='Rewrite places that already have a wikidataId')
+    args = parser.parse_args()
+
     NEO4J_URI = os.getenv('NEO4J_URI', 'bolt://localhost:7687')
     NEO4J_USER = os.getenv('NEO4J_USER', 'neo4j')
     NEO4J_PASSWORD = os.getenv('NEO4J_PASSWORD', 'password')
@@ -486,7 +684,7 @@ def main():
 
     try:
         # Enrich all Canadian places
-        enricher.enrich_all_canadian_places()
+        enricher.enrich_all_canadian_places(force=args.force)
 
         # Print statistics
         enricher.print_enrichment_statistics()
@@ -13,174 +13,299 @@ These are stable across time periods and crucial for historical NER:
 These provide context like "Westmeath Township" which has been stable since 1830s.
 """
 
-import json
+import argparse
+import bz2
 import gzip
+import hashlib
 import time
 import os
-from typing import List, Dict, Set
-from SPARQLWrapper import SPARQLWrapper, JSON as SPARQL_JSON
+import re
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, Set, Tuple
+import ijson
+import orjson
+import requests
 from tqdm import tqdm
 
+SPARQL_ENDPOINT = "https://query.wikidata.org/sparql"
+
+# WKT literal as returned for P625, e.g. "Point(-75.69 45.42)" (lon lat)
+_COORD_RE = re.compile(r'Point\(([-+0-9.eE]+) ([-+0-9.eE]+)\)')
+
+# Output keys copied verbatim from SPARQL variables
+_FIELDS = (
+    ('name', 'placeLabel'),
+    ('population', 'population'),
+    ('geonamesId', 'geonamesId'),
+    ('wikipediaUrl', 'wikipedia'),
+    ('description', 'description'),
+    ('instanceOfLabel', 'instanceOfLabel'),
+)
+
+# Administrative division types (instance of, P31) and their English labels.
+# Queried one type at a time; the labels also stand in for ?instanceOfLabel
+# when reading a local dump.
+ADMIN_INSTANCE_TYPES = {
+    'Q13410428': 'county of Canada',
+    'Q3558970': 'township',
+    'Q96759164': 'geographic township of Ontario',
+    'Q2989457': 'census division of Canada',
+    'Q3957508': 'rural municipality of Canada',
+    'Q3573124': 'regional district municipality of British Columbia',
+    'Q15640612': 'special area',
+    'Q15979307': 'former administrative territorial entity',
+    'Q15310171': 'former municipality',
+    'Q1907114': 'metropolitan municipality',
+    'Q15617994': 'district municipality of British Columbia',
+    'Q2598575': 'regional county municipality',
+    'Q3327873': 'municipal district of Alberta',
+    'Q21452648': 'regional municipality of Ontario',
+    'Q3551781': 'town municipality',
+    'Q3551776': 'township municipality',
+    'Q3551774': 'parish municipality',
+    'Q3551779': 'village municipality',
+    'Q3551773': 'canton municipality',
+}
+
+# Provinces whose P131 (located in) children are also queried
+CANADIAN_PROVINCES = (
+    ('Q1904', 'Ontario'),
+    ('Q176', 'Quebec'),
+    ('Q1952', 'Nova Scotia'),
+    ('Q1965', 'New Brunswick'),
+    ('Q1948', 'Manitoba'),
+    ('Q1974', 'British Columbia'),
+    ('Q1979', 'Prince Edward Island'),
+    ('Q1989', 'Saskatchewan'),
+    ('Q1951', 'Alberta'),
+    ('Q2003', 'Newfoundland and Labrador'),
+)
+
+RETRYABLE_HTTP_STATUSES = {429, 502, 503, 504}
+
+
+def fetch_bindings_with_backoff(session: requests.Session, query: str, timeout: float,
+                                max_attempts: int = 5, max_wait: float = 60.0) -> List[Dict]:
+    """
+    POST a SPARQL query and return its result bindings, retrying transient
+    failures with exponential backoff (2s, 4s, 8s, ... capped at `max_wait`).
+    HTTP 429 responses honour the Retry-After header.
+    """
+    for attempt in range(1, max_attempts + 1):
+        try:
+            with session.post(SPARQL_ENDPOINT, data={'query': query},
+                              timeout=timeout, stream=True) as response:
+                if (response.status_code not in RETRYABLE_HTTP_STATUSES
+                        or attempt == max_attempts):
+                    response.raise_for_status()
+                    # Decode bindings straight off the (gzip) stream
+                    response.raw.decode_content = True
+                    return list(ijson.items(response.raw, 'results.bindings.item'))
+
+                retry_after = response.headers.get('Retry-After')
+                wait = float(retry_after) if retry_after and retry_after.isdigit() \
+                    else min(2 ** attempt, max_wait)
+                error = f"HTTP {response.status_code}"
+
+        except (requests.ConnectionError, requests.Timeout,
+                requests.exceptions.ChunkedEncodingError, ijson.IncompleteJSONError) as e:
+            if attempt == max_attempts:
+                raise
+            wait = min(2 ** attempt, max_wait)
+            error = type(e).__name__
+
+        print(f"  ⚠ SPARQL {error}, retrying in {wait:.0f}s "
+              f"(attempt {attempt}/{max_attempts})")
+        time.sleep(wait)
+
+
+def _parse_binding(binding: Dict) -> Optional[Dict]:
+    """Parse SPARQL binding (module level so worker processes can pickle it)."""
+    try:
+        # Flatten {'var': {'type': ..., 'value': ...}} to {'var': value} once
+        values = {key: term['value'] for key, term in binding.items()}
+        get = values.get
+
+        place: str = get('place', '')
+        coords_str: Optional[str] = get('coords')
+        inception: Optional[str] = get('inception')
+        dissolved: Optional[str] = get('dissolved')
+        instance_of: Optional[str] = get('instanceOf')
+
+        lat, lon = None, None
+        coords = _COORD_RE.match(coords_str) if coords_str else None
+        if coords:
+            try:
+                lon, lat = map(float, coords.groups())
+            except ValueError:
+                lat, lon = None, None
+
+        parsed = {out: get(var) for out, var in _FIELDS}
+        parsed['qid'] = place.rpartition('/')[2]
+        parsed['latitude'] = lat
+        parsed['longitude'] = lon
+        parsed['inceptionDate'] = inception.partition('T')[0] if inception else None
+        parsed['dissolvedDate'] = dissolved.partition('T')[0] if dissolved else None
+        parsed['instanceOfQid'] = instance_of.rpartition('/')[2] if instance_of else None
+        return parsed
+    except Exception as e:
+        return None
+
+
+def _parse_bindings(bindings: List[Dict]) -> List[Dict]:
+    """Parse bindings, dropping any that fail."""
+    return [p for p in map(_parse_binding, bindings) if p]
+
+
+def _claim_values(claims: Dict, pid: str) -> List:
+    """Datavalue values of a property's claims in a Wikidata JSON entity."""
+    values = []
+    for claim in claims.get(pid, ()):
+        mainsnak = claim.get('mainsnak', {})
+        if mainsnak.get('snaktype') == 'value':
+            values.append(mainsnak['datavalue']['value'])
+    return values
+
+
+def _parse_dump_entity(entity: Dict) -> Optional[Dict]:
+    """
+    Parse a Wikidata JSON dump entity into the same shape as _parse_binding,
+    or return None if it is not a Canadian administrative division.
+    """
+    claims = entity.get('claims', {})
+
+    if not any(v.get('id') == 'Q16' for v in _claim_values(claims, 'P17')):
+        return None
+
+    instance_of = next((v['id'] for v in _claim_values(claims, 'P31')
+                        if v.get('id') in ADMIN_INSTANCE_TYPES), None)
+    if not instance_of:
+        return None
+
+    labels = entity.get('labels', {})
+    label = labels.get('en') or labels.get('fr')
+
+    lat, lon = None, None
+    coords = _claim_values(claims, 'P625')
+    if coords:
+        lat, lon = coords[0].get('latitude'), coords[0].get('longitude')
+
+    population = _claim_values(claims, 'P1082')
+    geonames = _claim_values(claims, 'P1566')
+    inception = _claim_values(claims, 'P571')
+    dissolved = _claim_values(claims, 'P576')
+
+    enwiki = entity.get('sitelinks', {}).get('enwiki', {}).get('title')
+    description = entity.get('descriptions', {}).get('en', {}).get('value')
+
+    return {
+        'qid': entity['id'],
+        'name': label['value'] if label else entity['id'],
+        'latitude': lat,
+        'longitude': lon,
+        'population': population[0]['amount'].lstrip('+') if population else None,
+        'geonamesId': geonames[0] if geonames else None,
+        'inceptionDate': inception[0]['time'].lstrip('+').partition('T')[0] if inception else None,
+        'dissolvedDate': dissolved[0]['time'].lstrip('+').partition('T')[0] if dissolved else None,
+        'wikipediaUrl': f"https://en.wikipedia.org/wiki/{enwiki.replace(' ', '_')}" if enwiki else None,
+        'description': description,
+        'instanceOfLabel': ADMIN_INSTANCE_TYPES[instance_of],
+        'instanceOfQid': instance_of,
+    }
+
 
 class AdminDivisionFetcher:
     """Fetch administrative divisions from Wikidata."""
 
     def __init__(self):
-        self.sparql = SPARQLWrapper("https://query.wikidata.org/sparql")
-        self.sparql.setReturnFormat(SPARQL_JSON)
-        self.sparql.setTimeout(300)
         self.user_agent = "CanadianHistoricalResearch/1.0"
-        self.sparql.addCustomHttpHeader("User-Agent", self.user_agent)
+        self.max_workers = 3  # Stay within Wikidata's concurrent query limit
+        self.timeout = 300
+        self.cache_dir = '.cache'
+        self.cache_ttl = 7 * 86400  # Seconds before a cached response is refetched
         self.all_qids: Set[str] = set()
 
-    def _parse_binding(self, binding: Dict) -> Dict:
-        """Parse SPARQL binding."""
-        try:
-            place_uri = binding.get('place', {}).get('value', '')
-            qid = place_uri.split('/')[-1]
-
-            coords_str = binding.get('coords', {}).get('value', '')
-            lat, lon = None, None
-            if coords_str:
-                try:
-                    parts = coords_str.replace('Point(', '').replace(')', '').split()
-                    lon = float(parts[0])
-                    lat = float(parts[1])
-                except:
-                    pass
-
-            return {
-                'qid': qid,
-                'name': binding.get('placeLabel', {}).get('value'),
-                'latitude': lat,
-                'longitude': lon,
-                'population': binding.get('population', {}).get('value'),
-                'geonamesId': binding.get('geonamesId', {}).get('value'),
-                'inceptionDate': binding.get('inception', {}).get('value', '').split('T')[0] if binding.get('inception') else None,
-                'dissolvedDate': binding.get('dissolved', {}).get('value', '').split('T')[0] if binding.get('dissolved') else None,
-                'wikipediaUrl': binding.get('wikipedia', {}).get('value'),
-                'description': binding.get('description', {}).get('value'),
-                'instanceOfLabel': binding.get('instanceOfLabel', {}).get('value'),
-                'instanceOfQid': binding.get('instanceOf', {}).get('value', '').split('/')[-1] if binding.get('instanceOf') else None
-            }
-        except Exception as e:
-            return None
-
-    def fetch_canadian_admin_divisions(self) -> List[Dict]:
+        # One keep-alive connection pool shared by all queries; urllib3
+        # decompresses gzip responses transparently
+        self.session = requests.Session()
+        self.session.mount('https://', requests.adapters.HTTPAdapter(pool_maxsize=self.max_workers))
+        self.session.headers.update({
+            'User-Agent': self.user_agent,
+            'Accept': 'application/sparql-results+json',
+            'Accept-Encoding': 'gzip',
+        })
+
+    def _cached_bindings(self, query: str) -> List[Dict]:
         """
-        Fetch all Canadian administrative divisions.
+        Return the raw bindings for a query, using an on-disk cache.
 
-        This includes counties, townships, rural municipalities, regional districts,
-        census divisions, and former administrative units.
+        Responses are stored as gzipped JSON under cache_dir, keyed by a
+        hash of the query text, and reused until cache_ttl has passed.
         """
-
-        query = """
-        SELECT DISTINCT ?place ?placeLabel ?coords ?population ?geonamesId
-               ?inception ?dissolved ?wikipedia ?description ?instanceOf ?instanceOfLabel
-        WHERE {
-          # Must be in Canada
-          ?place wdt:P17 wd:Q16 .
-
-          # Must be an administrative division type
-          ?place wdt:P31 ?instanceOf .
-          VALUES ?instanceOf {
-            wd:Q13410428   # county of Canada
-            wd:Q3558970    # township
-            wd:Q96759164   # geographic township of Ontario
-            wd:Q2989457    # census division of Canada
-            wd:Q3957508    # rural municipality of Canada
-            wd:Q3573124    # regional district municipality of British Columbia
-            wd:Q15640612   # special area
-            wd:Q15979307   # former administrative territorial entity
-            wd:Q15310171   # former municipality
-            wd:Q1907114    # metropolitan municipality
-            wd:Q15617994   # district municipality of British Columbia
-            wd:Q2598575    # regional county municipality
-            wd:Q3327873    # municipal district of Alberta
-            wd:Q21452648   # regional municipality of Ontario
-            wd:Q3551781    # town municipality
-            wd:Q3551776    # township municipality
-            wd:Q3551774    # parish municipality
-            wd:Q3551779    # village municipality
-            wd:Q3551773    # canton municipality
-          }
-
-          OPTIONAL { ?place wdt:P625 ?coords . }
-          OPTIONAL { ?place wdt:P1082 ?population . }
-          OPTIONAL { ?place wdt:P1566 ?geonamesId . }
-          OPTIONAL { ?place wdt:P571 ?inception . }
-          OPTIONAL { ?place wdt:P576 ?dissolved . }
-          OPTIONAL {
-            ?wikipedia schema:about ?place .
-            ?wikipedia schema:inLanguage "en" .
-            FILTER (SUBSTR(str(?wikipedia), 1, 25) = "https://en.wikipedia.org/")
-          }
-          OPTIONAL { ?place schema:description ?description . FILTER(LANG(?description) = "en") }
-
-          SERVICE wikibase:label {
-            bd:serviceParam wikibase:language "en,fr" .
-          }
-        }
+        key = hashlib.blake2b(query.encode('utf-8'), digest_size=16).hexdigest()
+        cache_path = os.path.join(self.cache_dir, f"{key}.json.gz")
+
+        if (os.path.exists(cache_path)
+                and os.path.getmtime(cache_path) > time.time() - self.cache_ttl):
+            with gzip.open(cache_path, 'rb') as f:
+                return orjson.loads(f.read())
+
+        bindings = fetch_bindings_with_backoff(self.session, query, self.timeout)
+
+        # Write to a temp file and rename so readers never see a partial cache
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with gzip.open(tmp_path, 'wb', compresslevel=1) as f:
+            f.write(orjson.dumps(bindings))
+        os.replace(tmp_path, cache_path)
+
+        return bindings
+
+    def _fetch_places(self, query: str) -> List[Dict]:
+        """Run a query (or reuse its cached response) and parse its bindings (no de-duplication)."""
+        return _parse_bindings(self._cached_bindings(query))
+
+    def _keep_new(self, places: List[Dict]) -> List[Dict]:
+        """Drop places already seen by an earlier query."""
+        # Size the output up front and trim once, rather than growing it
+        seen = self.all_qids
+        new_places = [None] * len(places)
+        out = 0
+        for place in places:
+            qid = place['qid']
+            if qid not in seen:
+                seen.add(qid)
+                new_places[out] = place
+                out += 1
+        del new_places[out:]
+        return new_places
+
+    def _all_provinces_query(self, province_qids: List[str], instance_qid: str) -> str:
         """
+        Query for admin divisions of one type in Canada or in any of the provinces.
 
-        print("Querying Canadian administrative divisions...")
-        self.sparql.setQuery(query)
-
-        try:
-            results = self.sparql.query().convert()
-            bindings = results.get('results', {}).get('bindings', [])
-
-            places = []
-            for b in bindings:
-                place = self._parse_binding(b)
-                if place and place['qid'] not in self.all_qids:
-                    places.append(place)
-                    self.all_qids.add(place['qid'])
-
-            print(f"  Found {len(places):,} administrative divisions")
-            return places
-
-        except Exception as e:
-            print(f"  Error: {e}")
-            return []
-
-    def fetch_by_province(self, province_qid: str, province_name: str) -> List[Dict]:
+        The P131 branch catches divisions not linked to Canada directly.
         """
-        Fetch administrative divisions by province.
 
-        Some divisions might not be properly linked to Canada but are linked to provinces.
-        """
+        provinces = ' '.join(f'wd:{qid}' for qid in province_qids)
 
-        query = f"""
+        return f"""
         SELECT DISTINCT ?place ?placeLabel ?coords ?population ?geonamesId
                ?inception ?dissolved ?wikipedia ?description ?instanceOf ?instanceOfLabel
         WHERE {{
-          # Located in specific province
-          ?place wdt:P131 wd:{province_qid} .
+          {{
+            # Must be in Canada
+            ?place wdt:P17 wd:Q16 .
+          }} UNION {{
+            # Or located in a province
+            VALUES ?province {{ {provinces} }}
+            ?place wdt:P131 ?province .
+          }}
 
           # Must be an administrative division type
           ?place wdt:P31 ?instanceOf .
-          VALUES ?instanceOf {{
-            wd:Q13410428   # county of Canada
-            wd:Q3558970    # township
-            wd:Q96759164   # geographic township of Ontario
-            wd:Q2989457    # census division of Canada
-            wd:Q3957508    # rural municipality of Canada
-            wd:Q3573124    # regional district municipality of British Columbia
-            wd:Q15640612   # special area
-            wd:Q15979307   # former administrative territorial entity
-            wd:Q15310171   # former municipality
-            wd:Q1907114    # metropolitan municipality
-            wd:Q15617994   # district municipality of British Columbia
-            wd:Q2598575    # regional county municipality
-            wd:Q3327873    # municipal district of Alberta
-            wd:Q21452648   # regional municipality of Ontario
-            wd:Q3551781    # town municipality
-            wd:Q3551776    # township municipality
-            wd:Q3551774    # parish municipality
-            wd:Q3551779    # village municipality
-            wd:Q3551773    # canton municipality
-          }}
+          VALUES ?instanceOf {{ wd:{instance_qid} }}
 
           OPTIONAL {{ ?place wdt:P625 ?coords . }}
           OPTIONAL {{ ?place wdt:P1082 ?population . }}
@@ -190,7 +315,7 @@ class AdminDivisionFetcher:
           OPTIONAL {{
             ?wikipedia schema:about ?place .
             ?wikipedia schema:inLanguage "en" .
-            FILTER (SUBSTR(str(?wikipedia), 1, 25) = "https://en.wikipedia.org/")
+            FILTER (STRSTARTS(STR(?wikipedia), "https://en.wikipedia.org/"))
           }}
           OPTIONAL {{ ?place schema:description ?description . FILTER(LANG(?description) = "en") }}
 
@@ -200,70 +325,106 @@ class AdminDivisionFetcher:
         }}
         """
 
-        print(f"\nQuerying {province_name}...")
-        self.sparql.setQuery(query)
+    def fetch_all_provinces(self) -> List[Dict]:
+        """
+        Fetch Canada-wide and per-province admin divisions.
 
-        try:
-            results = self.sparql.query().convert()
-            bindings = results.get('results', {}).get('bindings', [])
+        One query per division type keeps each request well inside the
+        endpoint timeout, and a failed type does not lose the others.
+        """
 
-            places = []
-            for b in bindings:
-                place = self._parse_binding(b)
-                if place and place['qid'] not in self.all_qids:
-                    places.append(place)
-                    self.all_qids.add(place['qid'])
+        province_qids = [qid for qid, _ in CANADIAN_PROVINCES]
+
+        print(f"Querying Canada and {len(province_qids)} provinces, "
+              f"{len(ADMIN_INSTANCE_TYPES)} division types...")
+        return self._run_queries([
+            (label, self._all_provinces_query(province_qids, qid))
+            for qid, label in ADMIN_INSTANCE_TYPES.items()
+        ])
+
+    def _run_queries(self, queries: List[Tuple[str, str]]) -> List[Dict]:
+        """
+        Run (description, query) pairs concurrently and return the new places.
 
-            print(f"  Found {len(places):,} new divisions in {province_name}")
-            return places
+        Results are de-duplicated on the main thread in submission order, so
+        the output does not depend on which query finishes first.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [(description, executor.submit(self._fetch_places, query))
+                       for description, query in queries]
+
+            all_places = []
+            for description, future in futures:
+                try:
+                    places = self._keep_new(future.result())
+                    print(f"  {description}: {len(places):,} new divisions")
+                    all_places.extend(places)
+                except Exception as e:
+                    print(f"  Error querying {description}: {e}")
 
-        except Exception as e:
-            print(f"  Error querying {province_name}: {e}")
-            return []
+        return all_places
 
     def fetch_comprehensive(self) -> List[Dict]:
-        """Fetch using multiple strategies."""
-
-        all_divisions = []
-
-        # Strategy 1: All Canadian admin divisions
-        divisions = self.fetch_canadian_admin_divisions()
-        all_divisions.extend(divisions)
-        time.sleep(2)
-
-        # Strategy 2: By province (catches divisions not directly linked to Canada)
-        provinces = [
-            ('Q1904', 'Ontario'),
-            ('Q176', 'Quebec'),
-            ('Q1951', 'Nova Scotia'),
-            ('Q1965', 'New Brunswick'),
-            ('Q1140', 'Manitoba'),
-            ('Q1948', 'British Columbia'),
-            ('Q1979', 'Prince Edward Island'),
-            ('Q1989', 'Saskatchewan'),
-            ('Q1951', 'Alberta'),
-            ('Q2007', 'Newfoundland and Labrador'),
-        ]
-
-        for qid, name in provinces:
-            province_divisions = self.fetch_by_province(qid, name)
-            all_divisions.extend(province_divisions)
-            time.sleep(2)
-
-        return all_divisions
+        """Fetch divisions linked to Canada or to a province (one query per type)."""
+
+        return self.fetch_all_provinces()
+
+    def fetch_from_dump(self, dump_path: str) -> List[Dict]:
+        """
+        Scan a local Wikidata JSON dump (.json.gz or .json.bz2) for Canadian
+        administrative divisions instead of querying the SPARQL endpoint.
+
+        The JSON dump holds every claim of an entity on one line, so a single
+        pass is enough. Lines that do not mention Q16 are skipped before
+        being decoded.
+        """
+
+        opener = bz2.open if dump_path.endswith('.bz2') else gzip.open
+
+        print(f"Scanning Wikidata dump {dump_path} for administrative divisions...")
+
+        places = []
+        parse_errors = 0
+        with opener(dump_path, 'rb') as f:
+            for line in tqdm(f, desc="Scanning dump", unit=" entities"):
+                # Cheap pre-filter: every match has a P17 claim pointing at Q16
+                if b'"Q16"' not in line:
+                    continue
+
+                line = line.rstrip().rstrip(b',')
+                try:
+                    place = _parse_dump_entity(orjson.loads(line))
+                except (orjson.JSONDecodeError, KeyError, AttributeError):
+                    parse_errors += 1
+                    continue
+
+                if place:
+                    places.append(place)
+
+        if parse_errors:
+            print(f"  ⚠ Skipped {parse_errors:,} unparseable entities")
+
+        places = self._keep_new(places)
+        print(f"  Found {len(places):,} administrative divisions")
+        return places
 
     def merge_with_existing(self, new_divisions: List[Dict],
                            existing_file: str) -> List[Dict]:
-        """Merge administrative divisions with existing places cache."""
+        """
+        Merge administrative divisions with existing places cache.
+
+        The existing places are loaded in full because the merged list is
+        written back out as the new cache.
+        """
 
         # Load existing
         if os.path.exists(existing_file):
-            with open(existing_file, 'r', encoding='utf-8') as f:
-                existing_data = json.load(f)
+            with open(existing_file, 'rb') as f:
+                existing_data = orjson.loads(f.read())
             existing_places = existing_data.get('places', [])
         elif os.path.exists(existing_file + '.gz'):
-            with gzip.open(existing_file + '.gz', 'rt', encoding='utf-8') as f:
-                existing_data = json.load(f)
+            with gzip.open(existing_file + '.gz', 'rb') as f:
+                existing_data = orjson.loads(f.read())
             existing_places = existing_data.get('places', [])
         else:
             existing_places = []
@@ -271,13 +432,10 @@ class AdminDivisionFetcher:
         # Create Q-ID index
         existing_qids = {p['qid'] for p in existing_places}
 
-        # Add only new ones
-        added = 0
-        for division in new_divisions:
-            if division['qid'] not in existing_qids:
-                existing_places.append(division)
-                existing_qids.add(division['qid'])
-                added += 1
+        # Add only new ones (new_divisions is already unique via all_qids)
+        new_places = [d for d in new_divisions if d['qid'] not in existing_qids]
+        existing_places.extend(new_places)
+        added = len(new_places)
 
         print(f"\nAdded {added:,} new administrative divisions")
         print(f"Total places: {len(existing_places):,}")
@@ -296,11 +454,19 @@ class AdminDivisionFetcher:
             'places': places
         }
 
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(cache_data, f, indent=2, ensure_ascii=False)
+        # Serialize once, write the same bytes to both files
+        payload = orjson.dumps(cache_data)
+
+        # Write to temp files and rename, so a crash never leaves a
+        # truncated cache or a plain file without its .gz
+        with open(filename + '.tmp', 'wb') as f:
+            f.write(payload)
+
+        with gzip.open(filename + '.gz.tmp', 'wb', compresslevel=1) as f:
+            f.write(payload)
 
-        with gzip.open(filename + '.gz', 'wt', encoding='utf-8') as f:
-            json.dump(cache_data, f, ensure_ascii=False)
+        os.replace(filename + '.tmp', filename)
+        os.replace(filename + '.gz.tmp', filename + '.gz')
 
         file_size = os.path.getsize(filename) / (1024 * 1024)
         compressed_size = os.path.getsize(filename + '.gz') / (1024 * 1024)
@@ -310,6 +476,11 @@ class AdminDivisionFetcher:
 
 
 def main():
+    parser = argparse.ArgumentParser(description='Fetch Canadian administrative divisions from Wikidata')
+    parser.add_argument('--dump', metavar='PATH',
+                        help='Read from a local Wikidata JSON dump instead of the SPARQL endpoint')
+    args = parser.parse_args()
+
     fetcher = AdminDivisionFetcher()
 
     print("="*60)
@@ -317,7 +488,10 @@ def main():
     print("="*60)
 
     # Fetch all administrative divisions
-    divisions = fetcher.fetch_comprehensive()
+    if args.dump:
+        divisions = fetcher.fetch_from_dump(args.dump)
+    else:
+        divisions = fetcher.fetch_comprehensive()
 
     print(f"\n{'='*60}")
     print(f"Administrative divisions found: {len(divisions):,}")
@@ -330,16 +504,18 @@ def main():
     # Save
     fetcher.save_cache(all_places, 'wikidata_canada_with_admin.json')
 
-    # Statistics
-    with_wikipedia = sum(1 for p in all_places if p.get('wikipediaUrl'))
-    with_geonames = sum(1 for p in all_places if p.get('geonamesId'))
-    historical = sum(1 for p in all_places if p.get('dissolvedDate'))
+    # Statistics (single pass)
+    with_wikipedia = with_geonames = historical = 0
+    for p in all_places:
+        if p.get('wikipediaUrl'):
+            with_wikipedia += 1
+        if p.get('geonamesId'):
+            with_geonames += 1
+        if p.get('dissolvedDate'):
+            historical += 1
 
     # Count by type
-    admin_types = {}
-    for p in all_places:
-        if p.get('instanceOfLabel'):
-            admin_types[p['instanceOfLabel']] = admin_types.get(p['instanceOfLabel'], 0) + 1
+    admin_types = Counter(p['instanceOfLabel'] for p in all_places if p.get('instanceOfLabel'))
 
     print(f"\n{'='*60}")
     print("Final Statistics")
@@ -350,8 +526,7 @@ def main():
     print(f"  Historical (dissolved): {historical:,}")
 
     print(f"\nTop Administrative Division Types:")
-    sorted_types = sorted(admin_types.items(), key=lambda x: x[1], reverse=True)
-    for admin_type, count in sorted_types[:15]:
+    for admin_type, count in admin_types.most_common(15):
         if admin_type and any(term in admin_type.lower() for term in ['county', 'township', 'municipality', 'district', 'division']):
             print(f"  {admin_type}: {count:,}")
 
@@ -131,7 +131,7 @@ class CoordinateBasedFetcher:
           OPTIONAL {{
             ?wikipedia schema:about ?place .
             ?wikipedia schema:inLanguage "en" .
-            FILTER (SUBSTR(str(?wikipedia), 1, 25) = "https://en.wikipedia.org/")
+            FILTER (STRSTARTS(STR(?wikipedia), "https://en.wikipedia.org/"))
           }}
           OPTIONAL {{ ?place schema:description ?description . FILTER(LANG(?description) = "en") }}
 
@@ -181,7 +181,7 @@ class CoordinateBasedFetcher:
           # Must have English Wikipedia
           ?wikipedia schema:about ?place .
           ?wikipedia schema:inLanguage "en" .
-          FILTER (SUBSTR(str(?wikipedia), 1, 25) = "https://en.wikipedia.org/")
+          FILTER (STRSTARTS(STR(?wikipedia), "https://en.wikipedia.org/"))
 
           # Must have coordinates
           ?place wdt:P625 ?coords .
@@ -289,11 +289,14 @@ class CoordinateBasedFetcher:
             'places': places
         }
 
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(cache_data, f, indent=2, ensure_ascii=False)
+        # Serialize once, write the same bytes to both files
+        payload = json.dumps(cache_data, ensure_ascii=False).encode('utf-8')
 
-        with gzip.open(filename + '.gz', 'wt', encoding='utf-8') as f:
-            json.dump(cache_data, f, ensure_ascii=False)
+        with open(filename, 'wb') as f:
+            f.write(payload)
+
+        with gzip.open(filename + '.gz', 'wb', compresslevel=1) as f:
+            f.write(payload)
 
         file_size = os.path.getsize(filename) / (1024 * 1024)
         compressed_size = os.path.getsize(filename + '.gz') / (1024 * 1024)
@@ -93,7 +93,7 @@ class ComprehensiveWikidataFetcher:
           OPTIONAL {{
             ?wikipedia schema:about ?place .
             ?wikipedia schema:inLanguage "en" .
-            FILTER (SUBSTR(str(?wikipedia), 1, 25) = "https://en.wikipedia.org/")
+            FILTER (STRSTARTS(STR(?wikipedia), "https://en.wikipedia.org/"))
           }}
           OPTIONAL {{ ?place schema:description ?description . FILTER(LANG(?description) = "en") }}
 
@@ -136,7 +136,7 @@ class ComprehensiveWikidataFetcher:
           # Must have Wikipedia article
           ?wikipedia schema:about ?place .
           ?wikipedia schema:inLanguage "en" .
-          FILTER (SUBSTR(str(?wikipedia), 1, 25) = "https://en.wikipedia.org/")
+          FILTER (STRSTARTS(STR(?wikipedia), "https://en.wikipedia.org/"))
 
           # Must be a settlement
           ?place wdt:P31/wdt:P279* ?type .
@@ -240,11 +240,14 @@ class ComprehensiveWikidataFetcher:
             'places': places
         }
 
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(cache_data, f, indent=2, ensure_ascii=False)
+        # Serialize once, write the same bytes to both files
+        payload = json.dumps(cache_data, ensure_ascii=False).encode('utf-8')
 
-        with gzip.open(filename + '.gz', 'wt', encoding='utf-8') as f:
-            json.dump(cache_data, f, ensure_ascii=False)
+        with open(filename, 'wb') as f:
+            f.write(payload)
+
+        with gzip.open(filename + '.gz', 'wb', compresslevel=1) as f:
+            f.write(payload)
 
         import os
         file_size = os.path.getsize(filename) / (1024 * 1024)
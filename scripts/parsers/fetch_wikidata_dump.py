@@ -7,54 +7,123 @@ that can be reused without hitting the Wikidata API repeatedly.
 """
 
 import os
-import json
+import re
+import gzip
 import time
-from typing import Dict, List
-from SPARQLWrapper import SPARQLWrapper, JSON as SPARQL_JSON
+from typing import Dict, List, Tuple
+import ijson
+import orjson
+import requests
 from tqdm import tqdm
 
+SPARQL_ENDPOINT = "https://query.wikidata.org/sparql"
+
+# WKT literal as returned for P625, e.g. "Point(-75.69 45.42)" (lon lat)
+_COORD_RE = re.compile(r'Point\(([-+0-9.eE]+) ([-+0-9.eE]+)\)')
+
+RETRYABLE_HTTP_STATUSES = {429, 502, 503, 504}
+
+
+def fetch_bindings_with_backoff(session: requests.Session, query: str, timeout: float,
+                                max_attempts: int = 5, max_wait: float = 60.0) -> List[Dict]:
+    """
+    POST a SPARQL query and return its result bindings, retrying transient
+    failures with exponential backoff (2s, 4s, 8s, ... capped at `max_wait`).
+    HTTP 429 responses honour the Retry-After header.
+    """
+    for attempt in range(1, max_attempts + 1):
+        try:
+            with session.post(SPARQL_ENDPOINT, data={'query': query},
+                              timeout=timeout, stream=True) as response:
+                if (response.status_code not in RETRYABLE_HTTP_STATUSES
+                        or attempt == max_attempts):
+                    response.raise_for_status()
+                    # Decode bindings straight off the (gzip) stream
+                    response.raw.decode_content = True
+                    return list(ijson.items(response.raw, 'results.bindings.item'))
+
+                retry_after = response.headers.get('Retry-After')
+                wait = float(retry_after) if retry_after and retry_after.isdigit() \
+                    else min(2 ** attempt, max_wait)
+                error = f"HTTP {response.status_code}"
+
+        except (requests.ConnectionError, requests.Timeout,
+                requests.exceptions.ChunkedEncodingError, ijson.IncompleteJSONError) as e:
+            if attempt == max_attempts:
+                raise
+            wait = min(2 ** attempt, max_wait)
+            error = type(e).__name__
+
+        print(f"  ⚠ SPARQL {error}, retrying in {wait:.0f}s "
+              f"(attempt {attempt}/{max_attempts})")
+        time.sleep(wait)
+
 
 class WikidataCanadaDumper:
     """Fetch and cache all Canadian location data from Wikidata."""
 
     def __init__(self, cache_file: str = 'wikidata_canada_cache.json'):
         self.cache_file = cache_file
-        self.sparql = SPARQLWrapper("https://query.wikidata.org/sparql")
-        self.sparql.setReturnFormat(SPARQL_JSON)
-        self.sparql.setTimeout(300)
+        self.timeout = 300
         self.user_agent = "CanadianHistoricalResearch/1.0 (Historical NER Reconciliation)"
-        self.sparql.addCustomHttpHeader("User-Agent", self.user_agent)
 
-    def fetch_canadian_places_batch(self, offset: int = 0, limit: int = 10000) -> List[Dict]:
+        # Reuse one keep-alive connection across batches; urllib3
+        # decompresses gzip responses transparently
+        self.session = requests.Session()
+        self.session.headers.update({
+            'User-Agent': self.user_agent,
+            'Accept': 'application/sparql-results+json',
+            'Accept-Encoding': 'gzip',
+        })
+
+    def fetch_canadian_places_batch(self, after_uri: str = "",
+                                    limit: int = 10000) -> Tuple[List[Dict], str]:
         """
         Fetch a batch of Canadian places from Wikidata.
 
-        Uses pagination to avoid timeouts on large queries.
+        Uses keyset pagination (places sorted by URI, starting after
+        after_uri), which gives a stable order with no gaps or repeats
+        between pages, unlike OFFSET without ORDER BY. The page is taken over
+        distinct places in a subquery, and the optional facets are joined
+        outside it, so a place with several values for a facet is never
+        split across two pages.
+
+        Returns the parsed places and the last place URI in the batch.
         """
 
         query = f"""
         SELECT DISTINCT ?place ?placeLabel ?coords ?population
                ?geonamesId ?inception ?dissolved ?wikipedia
         WHERE {{
-          # Located in Canada
-          ?place wdt:P17 wd:Q16 .
+          {{
+            SELECT DISTINCT ?place WHERE {{
+              # Located in Canada
+              ?place wdt:P17 wd:Q16 .
+
+              # Must have coordinates (filters out abstract entities)
+              ?place wdt:P625 [] .
+
+              # Must be a geographic entity
+              ?place wdt:P31/wdt:P279* ?instanceOf .
+              VALUES ?instanceOf {{
+                wd:Q486972    # human settlement
+                wd:Q515       # city
+                wd:Q3957      # town
+                wd:Q532       # village
+                wd:Q5084      # hamlet
+                wd:Q1549591   # big city
+                wd:Q15063611  # ghost town
+                wd:Q1637706   # unincorporated community
+              }}
+
+              FILTER (STR(?place) > "{after_uri}")
+            }}
+            ORDER BY ?place
+            LIMIT {limit}
+          }}
 
-          # Must have coordinates (filters out abstract entities)
           ?place wdt:P625 ?coords .
 
-          # Must be a geographic entity
-          ?place wdt:P31/wdt:P279* ?instanceOf .
-          VALUES ?instanceOf {{
-            wd:Q486972    # human settlement
-            wd:Q515       # city
-            wd:Q3957      # town
-            wd:Q532       # village
-            wd:Q5084      # hamlet
-            wd:Q1549591   # big city
-            wd:Q15063611  # ghost town
-            wd:Q1637706   # unincorporated community
-          }}
-
           OPTIONAL {{ ?place wdt:P1082 ?population . }}
           OPTIONAL {{ ?place wdt:P1566 ?geonamesId . }}
           OPTIONAL {{ ?place wdt:P571 ?inception . }}
@@ -62,62 +131,62 @@ class WikidataCanadaDumper:
           OPTIONAL {{
             ?wikipedia schema:about ?place .
             ?wikipedia schema:inLanguage "en" .
-            FILTER (SUBSTR(str(?wikipedia), 1, 25) = "https://en.wikipedia.org/")
+            FILTER (STRSTARTS(STR(?wikipedia), "https://en.wikipedia.org/"))
           }}
 
           SERVICE wikibase:label {{
             bd:serviceParam wikibase:language "en,fr" .
           }}
         }}
-        LIMIT {limit}
-        OFFSET {offset}
+        ORDER BY ?place
         """
 
-        self.sparql.setQuery(query)
-
-        try:
-            results = self.sparql.query().convert()
-            bindings = results.get('results', {}).get('bindings', [])
+        # Transient failures are retried; anything else propagates rather
+        # than silently ending the pagination with a partial cache
+        bindings = fetch_bindings_with_backoff(self.session, query, self.timeout)
 
-            places = []
-            for b in bindings:
-                place = self._parse_binding(b)
-                if place:
-                    places.append(place)
+        places = []
+        last_uri = after_uri
+        for b in bindings:
+            last_uri = max(last_uri, b['place']['value'])
+            place = self._parse_binding(b)
+            if place:
+                places.append(place)
 
-            return places
-
-        except Exception as e:
-            print(f"Error fetching batch at offset {offset}: {e}")
-            return []
+        return places, last_uri
 
     def _parse_binding(self, binding: Dict) -> Dict:
         """Parse SPARQL binding into clean dictionary."""
 
         try:
-            place_uri = binding.get('place', {}).get('value', '')
-            qid = place_uri.split('/')[-1]
+            # Flatten {'var': {'type': ..., 'value': ...}} to {'var': value} once
+            values = {key: term['value'] for key, term in binding.items()}
+            get = values.get
 
-            coords_str = binding.get('coords', {}).get('value', '')
+            qid = get('place', '').rpartition('/')[2]
+
+            coords_str = get('coords')
             lat, lon = None, None
-            if coords_str:
+            coords = _COORD_RE.match(coords_str) if coords_str else None
+            if coords:
                 try:
-                    parts = coords_str.replace('Point(', '').replace(')', '').split()
-                    lon = float(parts[0])
-                    lat = float(parts[1])
-                except:
-                    pass
+                    lon, lat = map(float, coords.groups())
+                except ValueError:
+                    lat, lon = None, None
+
+            inception = get('inception')
+            dissolved = get('dissolved')
 
             return {
                 'qid': qid,
-                'name': binding.get('placeLabel', {}).get('value'),
+                'name': get('placeLabel'),
                 'latitude': lat,
                 'longitude': lon,
-                'population': binding.get('population', {}).get('value'),
-                'geonamesId': binding.get('geonamesId', {}).get('value'),
-                'inceptionDate': binding.get('inception', {}).get('value', '').split('T')[0] if binding.get('inception') else None,
-                'dissolvedDate': binding.get('dissolved', {}).get('value', '').split('T')[0] if binding.get('dissolved') else None,
-                'wikipediaUrl': binding.get('wikipedia', {}).get('value')
+                'population': get('population'),
+                'geonamesId': get('geonamesId'),
+                'inceptionDate': inception.partition('T')[0] if inception else None,
+                'dissolvedDate': dissolved.partition('T')[0] if dissolved else None,
+                'wikipediaUrl': get('wikipedia')
             }
 
         except Exception as e:
@@ -128,24 +197,24 @@ class WikidataCanadaDumper:
         """Fetch all Canadian places using pagination."""
 
         all_places = []
-        offset = 0
+        last_uri = ""
         batch_size = 5000  # Smaller batches to avoid timeouts
 
         print("Fetching Canadian places from Wikidata in batches...")
 
         with tqdm(desc="Fetching batches") as pbar:
             while True:
-                batch = self.fetch_canadian_places_batch(offset=offset, limit=batch_size)
+                batch, last_uri = self.fetch_canadian_places_batch(
+                    after_uri=last_uri, limit=batch_size)
 
                 if not batch:
                     break
 
                 all_places.extend(batch)
                 pbar.update(len(batch))
-                offset += batch_size
 
-                # If we got fewer results than limit, we're done
-                if len(batch) < batch_size:
+                # If the page held fewer places than limit, we're done
+                if len({place['qid'] for place in batch}) < batch_size:
                     break
 
                 # Be nice to Wikidata
@@ -166,14 +235,21 @@ class WikidataCanadaDumper:
             'places': places
         }
 
-        with open(self.cache_file, 'w', encoding='utf-8') as f:
-            json.dump(cache_data, f, indent=2, ensure_ascii=False)
+        # Serialize once, write the same bytes to both files
+        payload = orjson.dumps(cache_data)
+
+        # Write to temp files and rename, so a crash never leaves a
+        # truncated cache or a plain file without its .gz
+        with open(self.cache_file + '.tmp', 'wb') as f:
+            f.write(payload)
 
         # Also save compressed version
-        import gzip
         compressed_file = self.cache_file + '.gz'
-        with gzip.open(compressed_file, 'wt', encoding='utf-8') as f:
-            json.dump(cache_data, f, ensure_ascii=False)
+        with gzip.open(compressed_file + '.tmp', 'wb', compresslevel=1) as f:
+            f.write(payload)
+
+        os.replace(self.cache_file + '.tmp', self.cache_file)
+        os.replace(compressed_file + '.tmp', compressed_file)
 
         file_size = os.path.getsize(self.cache_file) / (1024 * 1024)
         compressed_size = os.path.getsize(compressed_file) / (1024 * 1024)
@@ -188,15 +264,14 @@ class WikidataCanadaDumper:
             # Try compressed version
             compressed_file = self.cache_file + '.gz'
             if os.path.exists(compressed_file):
-                import gzip
-                with gzip.open(compressed_file, 'rt', encoding='utf-8') as f:
-                    cache_data = json.load(f)
+                with gzip.open(compressed_file, 'rb') as f:
+                    cache_data = orjson.loads(f.read())
                 print(f"✓ Loaded {cache_data['metadata']['total_records']:,} places from cache (compressed)")
                 return cache_data['places']
             return None
 
-        with open(self.cache_file, 'r', encoding='utf-8') as f:
-            cache_data = json.load(f)
+        with open(self.cache_file, 'rb') as f:
+            cache_data = orjson.loads(f.read())
 
         print(f"✓ Loaded {cache_data['metadata']['total_records']:,} places from cache")
         print(f"  Fetch date: {cache_data['metadata']['fetch_date']}")
@@ -236,10 +311,17 @@ def main():
     print("="*60)
     print(f"Total places: {len(places):,}")
 
-    with_wikipedia = sum(1 for p in places if p.get('wikipediaUrl'))
-    with_geonames = sum(1 for p in places if p.get('geonamesId'))
-    with_population = sum(1 for p in places if p.get('population'))
-    historical = sum(1 for p in places if p.get('dissolvedDate'))
+    # Count everything in a single pass
+    with_wikipedia = with_geonames = with_population = historical = 0
+    for p in places:
+        if p.get('wikipediaUrl'):
+            with_wikipedia += 1
+        if p.get('geonamesId'):
+            with_geonames += 1
+        if p.get('population'):
+            with_population += 1
+        if p.get('dissolvedDate'):
+            historical += 1
 
     print(f"With Wikipedia: {with_wikipedia:,}")
     print(f"With GeoNames ID: {with_geonames:,}")
@@ -15,289 +15,542 @@ Historical Entity Types to Include:
 - Indigenous settlements and reserves
 """
 
-import json
+import argparse
 import gzip
+import hashlib
 import time
 import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from functools import lru_cache
 from typing import List, Dict, Set, Optional
-from SPARQLWrapper import SPARQLWrapper, JSON as SPARQL_JSON
+import ijson
+import orjson
+import requests
+from requests.adapters import HTTPAdapter
 from tqdm import tqdm
 from datetime import datetime
 
+SPARQL_ENDPOINT = "https://query.wikidata.org/sparql"
+
+# WKT literal as returned for P625: 'Point(<lon> <lat>)'
+_COORD_RE = re.compile(r'Point\(([-+0-9.eE]+) ([-+0-9.eE]+)\)')
+
+# Per-country cache files are named wikidata_<country code>.json.gz; plain
+# .json files from earlier runs are still read
+COUNTRY_CACHE_PREFIX = 'wikidata_'
+COUNTRY_CACHE_SUFFIX = '.json.gz'
+LEGACY_COUNTRY_CACHE_SUFFIX = '.json'
+
+# Shared keep-alive session so every country query reuses the TLS connection
+SESSION = requests.Session()
+SESSION.mount('https://', HTTPAdapter(pool_connections=8, pool_maxsize=16))
+
+
+def _qid_of(uri: Optional[str]) -> Optional[str]:
+    """Extract Q-ID from an entity URI (None for empty or non-URI values)."""
+    if not uri or '/' not in uri:
+        return None
+    return uri.rpartition('/')[2]
+
+
+def _date_part(value: Optional[str]) -> Optional[str]:
+    """Date portion of an xsd:dateTime literal ('1867-07-01T00:00:00Z' -> '1867-07-01')."""
+    return value.partition('T')[0] if value else None
+
+
+# Instance-of URIs come from a small fixed vocabulary, so memoize those
+_type_qid = lru_cache(maxsize=4096)(_qid_of)
+
+
+def _qnum(qid: str) -> int:
+    """
+    Numeric part of a Q-ID ('Q123' -> 123).
+
+    De-duplication sets hold these ints rather than the strings, which keeps
+    them several times smaller for millions of entities.
+    """
+    return int(qid[1:])
+
+
+class RateLimiter:
+    """Thread-safe gate that spaces calls to at most `rate` per second."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate
+        self.lock = threading.Lock()
+        self.next_slot = time.monotonic()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(self.next_slot, now)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+# Entity types a place must have to be picked up by the core query
+HISTORICAL_COLONIAL_TYPES = """
+        wd:Q486972    # human settlement
+        wd:Q515       # city
+        wd:Q3957      # town
+        wd:Q532       # village
+        wd:Q5084      # hamlet
+        wd:Q15063611  # ghost town
+        wd:Q1637706   # unincorporated community
+
+        # Colonial entities
+        wd:Q133156    # colony
+        wd:Q1750636   # colonial trading post
+        wd:Q1785071   # fort
+        wd:Q44613     # monastery/mission
+        wd:Q1620908   # British overseas territory
+        wd:Q202216    # French colonial empire entity
+        wd:Q1195098   # Spanish colonial entity
+        wd:Q174844    # Portuguese colonial entity
+
+        # Historical administrative
+        wd:Q82794     # geographic region
+        wd:Q1907114   # historical country
+        wd:Q1620908   # British overseas territory
+        wd:Q15284     # municipality (historical)
+        wd:Q1852859   # protectorate
+        wd:Q1145276   # dependent territory
+
+        # Indigenous settlements
+        wd:Q12223     # Indian reserve
+        wd:Q17326919  # Indigenous territory
+"""
+
+# Core per-country query, built once; __COUNTRY__ and __LIMIT__ are filled
+# in with str.replace per call
+CORE_QUERY_TEMPLATE = """
+        SELECT DISTINCT ?place ?placeLabel ?coords ?population ?geonamesId
+               ?inception ?dissolved ?abolished ?wikipedia ?description
+               ?instanceOf ?country
+        WHERE {
+          # Country filter
+          ?place wdt:P17 wd:__COUNTRY__ .
+
+          # Must be a relevant entity type
+          ?place wdt:P31 ?instanceOf .
+          VALUES ?instanceOf {
+""" + HISTORICAL_COLONIAL_TYPES + """          }
+
+          # Basic properties (other labels are resolved afterwards in bulk)
+          OPTIONAL { ?place rdfs:label ?placeLabel . FILTER(LANG(?placeLabel) = "en") }
+          OPTIONAL { ?place wdt:P625 ?coords . }
+          OPTIONAL { ?place wdt:P1082 ?population . }
+          OPTIONAL { ?place wdt:P1566 ?geonamesId . }
+          OPTIONAL { ?place wdt:P571 ?inception . }
+          OPTIONAL { ?place wdt:P576 ?dissolved . }
+          OPTIONAL { ?place wdt:P576 ?abolished . }
+
+          # Wikipedia and description
+          OPTIONAL {
+            ?wikipedia schema:about ?place .
+            ?wikipedia schema:inLanguage "en" .
+            FILTER (STRSTARTS(STR(?wikipedia), "https://en.wikipedia.org/"))
+          }
+          OPTIONAL { ?place schema:description ?description . FILTER(LANG(?description) = "en") }
+        }
+        LIMIT __LIMIT__
+        """
+
+# Detail facets fetched for batches of already-found places. Each query
+# returns at most one row per place.
+DETAIL_FACETS = {
+    # Alternate names - critical for NER matching
+    'names': """
+        SELECT ?place
+               (GROUP_CONCAT(DISTINCT ?altLabel; separator="|") AS ?altNames)
+               (GROUP_CONCAT(DISTINCT ?officialName; separator="|") AS ?officialNames)
+               (SAMPLE(?native) AS ?nativeLabel) (SAMPLE(?nick) AS ?nickname)
+        WHERE {{
+          VALUES ?place {{ {values} }}
+          OPTIONAL {{ ?place skos:altLabel ?altLabel . FILTER(LANG(?altLabel) = "en") }}
+          OPTIONAL {{ ?place wdt:P1448 ?officialName . }}
+          OPTIONAL {{ ?place wdt:P1705 ?native . }}
+          OPTIONAL {{ ?place wdt:P1449 ?nick . }}
+        }}
+        GROUP BY ?place
+    """,
+    'succession': """
+        SELECT ?place (SAMPLE(?p1365) AS ?replaces) (SAMPLE(?p1366) AS ?replacedBy)
+               (SAMPLE(?p155) AS ?follows) (SAMPLE(?p156) AS ?followedBy)
+        WHERE {{
+          VALUES ?place {{ {values} }}
+          OPTIONAL {{ ?place wdt:P1365 ?p1365 . }}
+          OPTIONAL {{ ?place wdt:P1366 ?p1366 . }}
+          OPTIONAL {{ ?place wdt:P155 ?p155 . }}
+          OPTIONAL {{ ?place wdt:P156 ?p156 . }}
+        }}
+        GROUP BY ?place
+    """,
+    'colonial': """
+        SELECT ?place (SAMPLE(?p112) AS ?foundedBy) (SAMPLE(?p127) AS ?ownedBy)
+               (SAMPLE(?p1376) AS ?capitalOf)
+        WHERE {{
+          VALUES ?place {{ {values} }}
+          OPTIONAL {{ ?place wdt:P112 ?p112 . }}
+          OPTIONAL {{ ?place wdt:P127 ?p127 . }}
+          OPTIONAL {{ ?place wdt:P1376 ?p1376 . }}
+        }}
+        GROUP BY ?place
+    """,
+    'identifiers': """
+        SELECT ?place (SAMPLE(?p227) AS ?gndId) (SAMPLE(?p214) AS ?viafId)
+               (SAMPLE(?p244) AS ?locId) (SAMPLE(?p1667) AS ?tgnId)
+               (SAMPLE(?p402) AS ?osmId) (SAMPLE(?p6766) AS ?wofId)
+        WHERE {{
+          VALUES ?place {{ {values} }}
+          OPTIONAL {{ ?place wdt:P227 ?p227 . }}
+          OPTIONAL {{ ?place wdt:P214 ?p214 . }}
+          OPTIONAL {{ ?place wdt:P244 ?p244 . }}
+          OPTIONAL {{ ?place wdt:P1667 ?p1667 . }}
+          OPTIONAL {{ ?place wdt:P402 ?p402 . }}
+          OPTIONAL {{ ?place wdt:P6766 ?p6766 . }}
+        }}
+        GROUP BY ?place
+    """,
+    'historic': """
+        SELECT ?place (SAMPLE(?p7959) AS ?historicCounty) (SAMPLE(?p856) AS ?officialWebsite)
+        WHERE {{
+          VALUES ?place {{ {values} }}
+          OPTIONAL {{ ?place wdt:P7959 ?p7959 . }}
+          OPTIONAL {{ ?place wdt:P856 ?p856 . }}
+        }}
+        GROUP BY ?place
+    """,
+}
+
+# Detail query variable -> (place field, kind)
+DETAIL_FIELDS = {
+    'altNames': ('alternateNames', 'list'),
+    'officialNames': ('officialNames', 'list'),
+    'nativeLabel': ('nativeLabel', 'value'),
+    'nickname': ('nickname', 'value'),
+    'replaces': ('replacesQid', 'qid'),
+    'replacedBy': ('replacedByQid', 'qid'),
+    'follows': ('followsQid', 'qid'),
+    'followedBy': ('followedByQid', 'qid'),
+    'foundedBy': ('foundedByQid', 'qid'),
+    'ownedBy': ('ownedByQid', 'qid'),
+    'capitalOf': ('capitalOfQid', 'qid'),
+    'gndId': ('gndId', 'value'),
+    'viafId': ('viafId', 'value'),
+    'locId': ('locId', 'value'),
+    'tgnId': ('tgnId', 'value'),
+    'osmId': ('osmId', 'value'),
+    'wofId': ('wofId', 'value'),
+    'historicCounty': ('historicCountyQid', 'qid'),
+    'officialWebsite': ('officialWebsite', 'value'),
+}
+
+# Linked-entity QID fields and the label field each one fills
+LABELLED_QID_FIELDS = {
+    'instanceOfQid': 'instanceOfLabel',
+    'foundedByQid': 'foundedByLabel',
+    'ownedByQid': 'ownedByLabel',
+    'capitalOfQid': 'capitalOfLabel',
+    'historicCountyQid': 'historicCountyLabel',
+}
+
+# Empty detail fields every parsed place starts with, built once rather than
+# per binding; list fields get their own fresh list
+_DETAIL_LIST_FIELDS = tuple(key for key, kind in DETAIL_FIELDS.values() if kind == 'list')
+_DETAIL_DEFAULTS = dict.fromkeys(
+    [key for key, kind in DETAIL_FIELDS.values() if kind != 'list']
+    + [label for label in LABELLED_QID_FIELDS.values() if label != 'instanceOfLabel']
+)
+
 
 class GlobalHistoricalWikidataFetcher:
     """Fetch global places with historical colonial context."""
 
-    def __init__(self, cache_dir: str = 'wikidata_cache'):
-        self.sparql = SPARQLWrapper("https://query.wikidata.org/sparql")
-        self.sparql.setReturnFormat(SPARQL_JSON)
-        self.sparql.setTimeout(180)  # Reduced to 3 minutes
+    def __init__(self, cache_dir: str = 'wikidata_cache', cache_expire_hours: float = 24):
         self.user_agent = "GlobalHistoricalKnowledgeGraph/1.0"
-        self.sparql.addCustomHttpHeader("User-Agent", self.user_agent)
+        self.timeout = 180  # Reduced to 3 minutes
+        self.headers = {
+            'User-Agent': self.user_agent,
+            'Accept': 'application/sparql-results+json',
+            'Accept-Encoding': 'gzip',
+            'Connection': 'keep-alive',
+        }
+        self.max_workers = 4  # WDQS allows a handful of parallel queries per client
+        self.rate_limiter = RateLimiter(5.0)  # Be nice to Wikidata (~5 req/s total)
 
         self.cache_dir = cache_dir
         os.makedirs(cache_dir, exist_ok=True)
 
-        self.all_qids: Set[str] = set()
+        # Raw SPARQL responses, keyed by query hash; delete the directory
+        # to invalidate
+        self.query_cache_dir = os.path.join(cache_dir, 'sparql')
+        os.makedirs(self.query_cache_dir, exist_ok=True)
+        self.cache_expire_seconds = cache_expire_hours * 3600
+
+        self.all_qids: Set[int] = set()  # Q-numbers, see _qnum
+
+    def _run_sparql(self, query: str) -> Dict:
+        """
+        POST a query over the shared session and return the JSON results.
+
+        Bindings are decoded straight off the response stream with ijson, so
+        the raw payload text is never held alongside the parsed bindings.
+        """
+        with SESSION.post(SPARQL_ENDPOINT, data={'query': query},
+                          headers=self.headers, timeout=self.timeout,
+                          stream=True) as response:
+            response.raise_for_status()
+            response.raw.decode_content = True  # Undo gzip transfer encoding
+            bindings = list(ijson.items(response.raw, 'results.bindings.item'))
+        return {'results': {'bindings': bindings}}
+
+    def _cached_query(self, query: str) -> Dict:
+        """
+        Run a query, reusing a response cached on disk within the expiry window.
+
+        Only cache misses count against the rate limiter.
+        """
+        key = hashlib.sha256(query.encode('utf-8')).hexdigest()
+        cache_path = os.path.join(self.query_cache_dir, f'{key}.json.gz')
 
-    def _parse_binding(self, binding: Dict) -> Optional[Dict]:
-        """Parse SPARQL binding with comprehensive properties."""
         try:
-            place_uri = binding.get('place', {}).get('value', '')
-            qid = place_uri.split('/')[-1]
+            if time.time() - os.path.getmtime(cache_path) < self.cache_expire_seconds:
+                with open(cache_path, 'rb') as f:
+                    return orjson.loads(gzip.decompress(f.read()))
+        except (OSError, EOFError, ValueError):
+            pass  # Missing, unreadable or truncated entry: fetch again
 
-            coords_str = binding.get('coords', {}).get('value', '')
-            lat, lon = None, None
-            if coords_str:
-                try:
-                    parts = coords_str.replace('Point(', '').replace(')', '').split()
-                    lon = float(parts[0])
-                    lat = float(parts[1])
-                except:
-                    pass
+        self.rate_limiter.wait()
+        results = self._run_sparql(query)
 
-            # Parse instance types
-            instance_uri = binding.get('instanceOf', {}).get('value', '')
-            instance_qid = instance_uri.split('/')[-1] if instance_uri else None
+        # Write to a temp file and rename so readers never see a partial entry
+        tmp_path = f'{cache_path}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(gzip.compress(orjson.dumps(results), compresslevel=1))
+        os.replace(tmp_path, cache_path)
 
-            # Parse alternate names (concatenated with |)
-            alt_names_str = binding.get('altNames', {}).get('value', '')
-            alt_names = [n.strip() for n in alt_names_str.split('|') if n.strip()] if alt_names_str else []
+        return results
 
-            official_names_str = binding.get('officialNames', {}).get('value', '')
-            official_names = [n.strip() for n in official_names_str.split('|') if n.strip()] if official_names_str else []
+    def _parse_binding(self, binding: Dict) -> Optional[Dict]:
+        """
+        Parse a core-query binding.
 
-            # Helper function to extract QID from URI
-            def extract_qid(uri_str):
-                if not uri_str:
-                    return None
-                return uri_str.split('/')[-1] if '/' in uri_str else None
+        Detail fields start empty and are filled in by fetch_details_batch.
+        """
+        try:
+            # One pass over the terms, then a single dict probe per field
+            values = {var: term['value'] for var, term in binding.items()}
+            get = values.get
+
+            lat, lon = None, None
+            coords = _COORD_RE.match(get('coords', ''))
+            if coords:
+                try:
+                    lon, lat = map(float, coords.groups())
+                except ValueError:
+                    pass
 
-            return {
-                'qid': qid,
-                'name': binding.get('placeLabel', {}).get('value'),
+            place = {
+                'qid': get('place', '').rpartition('/')[2],
+                'name': get('placeLabel'),
                 'latitude': lat,
                 'longitude': lon,
-                'population': binding.get('population', {}).get('value'),
-                'geonamesId': binding.get('geonamesId', {}).get('value'),
+                'population': get('population'),
+                'geonamesId': get('geonamesId'),
 
                 # Temporal data
-                'inceptionDate': binding.get('inception', {}).get('value', '').split('T')[0] if binding.get('inception') else None,
-                'dissolvedDate': binding.get('dissolved', {}).get('value', '').split('T')[0] if binding.get('dissolved') else None,
-                'abolishedDate': binding.get('abolished', {}).get('value', '').split('T')[0] if binding.get('abolished') else None,
+                'inceptionDate': _date_part(get('inception')),
+                'dissolvedDate': _date_part(get('dissolved')),
+                'abolishedDate': _date_part(get('abolished')),
 
                 # Context
-                'wikipediaUrl': binding.get('wikipedia', {}).get('value'),
-                'description': binding.get('description', {}).get('value'),
-                'instanceOfQid': instance_qid,
-                'instanceOfLabel': binding.get('instanceOfLabel', {}).get('value'),
-                'countryQid': binding.get('country', {}).get('value', '').split('/')[-1] if binding.get('country') else None,
-
-                # NEW: Alternate names
-                'alternateNames': alt_names,
-                'officialNames': official_names,
-                'nativeLabel': binding.get('nativeLabel', {}).get('value'),
-                'nickname': binding.get('nickname', {}).get('value'),
-
-                # NEW: Historical succession
-                'replacesQid': extract_qid(binding.get('replaces', {}).get('value')),
-                'replacedByQid': extract_qid(binding.get('replacedBy', {}).get('value')),
-                'followsQid': extract_qid(binding.get('follows', {}).get('value')),
-                'followedByQid': extract_qid(binding.get('followedBy', {}).get('value')),
-
-                # NEW: Colonial/founding context
-                'foundedByQid': extract_qid(binding.get('foundedBy', {}).get('value')),
-                'foundedByLabel': binding.get('foundedByLabel', {}).get('value'),
-                'ownedByQid': extract_qid(binding.get('ownedBy', {}).get('value')),
-                'ownedByLabel': binding.get('ownedByLabel', {}).get('value'),
-                'capitalOfQid': extract_qid(binding.get('capitalOf', {}).get('value')),
-                'capitalOfLabel': binding.get('capitalOfLabel', {}).get('value'),
-
-                # NEW: Cross-database identifiers
-                'gndId': binding.get('gndId', {}).get('value'),
-                'viafId': binding.get('viafId', {}).get('value'),
-                'locId': binding.get('locId', {}).get('value'),
-                'tgnId': binding.get('tgnId', {}).get('value'),
-                'osmId': binding.get('osmId', {}).get('value'),
-                'wofId': binding.get('wofId', {}).get('value'),
-
-                # NEW: Historic context
-                'historicCountyQid': extract_qid(binding.get('historicCounty', {}).get('value')),
-                'historicCountyLabel': binding.get('historicCountyLabel', {}).get('value'),
-                'officialWebsite': binding.get('officialWebsite', {}).get('value'),
+                'wikipediaUrl': get('wikipedia'),
+                'description': get('description'),
+                'instanceOfQid': _type_qid(get('instanceOf', '')),
+                'instanceOfLabel': None,  # Filled in by attach_labels
+                'countryQid': _qid_of(get('country')),
             }
+
+            # Detail facets (names, succession, colonial, identifiers, historic)
+            place.update(_DETAIL_DEFAULTS)
+            for key in _DETAIL_LIST_FIELDS:
+                place[key] = []  # Fresh list per place
+
+            return place
         except Exception as e:
             print(f"      Warning: Error parsing place: {e}")
             return None
 
-    def get_historical_colonial_types(self) -> str:
-        """Return SPARQL VALUES clause for historical colonial entity types."""
-        return """
-            wd:Q486972    # human settlement
-            wd:Q515       # city
-            wd:Q3957      # town
-            wd:Q532       # village
-            wd:Q5084      # hamlet
-            wd:Q15063611  # ghost town
-            wd:Q1637706   # unincorporated community
-
-            # Colonial entities
-            wd:Q133156    # colony
-            wd:Q1750636   # colonial trading post
-            wd:Q1785071   # fort
-            wd:Q44613     # monastery/mission
-            wd:Q1620908   # British overseas territory
-            wd:Q202216    # French colonial empire entity
-            wd:Q1195098   # Spanish colonial entity
-            wd:Q174844    # Portuguese colonial entity
-
-            # Historical administrative
-            wd:Q82794     # geographic region
-            wd:Q1907114   # historical country
-            wd:Q1620908   # British overseas territory
-            wd:Q15284     # municipality (historical)
-            wd:Q1852859   # protectorate
-            wd:Q1145276   # dependent territory
-
-            # Indigenous settlements
-            wd:Q12223     # Indian reserve
-            wd:Q17326919  # Indigenous territory
-        """
+    def _parse_detail_binding(self, binding: Dict) -> Dict:
+        """Parse a detail-query binding into the place fields it carries."""
+        details = {}
+        for var, term in binding.items():
+            if var not in DETAIL_FIELDS:
+                continue
+            key, kind = DETAIL_FIELDS[var]
+            value = term.get('value')
+            if kind == 'list':
+                # Concatenated with |
+                details[key] = [n.strip() for n in value.split('|') if n.strip()] if value else []
+            elif kind == 'qid':
+                details[key] = _qid_of(value)
+            else:
+                details[key] = value
+        return details
 
     def fetch_country_places(self, country_qid: str, country_name: str, limit: int = 5000) -> List[Dict]:
         """
         Fetch all historical and current places for a specific country with comprehensive properties.
 
-        Uses LIMIT to avoid timeouts on large countries.
+        Only the small core query runs here; names, identifiers and
+        historical context are fetched per facet by _cache_new_places once
+        places already seen in another country have been dropped. Uses LIMIT
+        on the core query to avoid timeouts on large countries.
         """
-        query = f"""
-        SELECT DISTINCT ?place ?placeLabel ?coords ?population ?geonamesId
-               ?inception ?dissolved ?abolished ?wikipedia ?description
-               ?instanceOf ?instanceOfLabel ?country
-
-               # Alternate names (aggregated)
-               (GROUP_CONCAT(DISTINCT ?altLabel; separator="|") AS ?altNames)
-               (GROUP_CONCAT(DISTINCT ?officialName; separator="|") AS ?officialNames)
-               ?nativeLabel ?nickname
-
-               # Historical succession
-               ?replaces ?replacedBy ?follows ?followedBy
+        query = (CORE_QUERY_TEMPLATE
+                 .replace('__COUNTRY__', country_qid)
+                 .replace('__LIMIT__', str(limit)))
 
-               # Colonial/founding context
-               ?foundedBy ?foundedByLabel ?ownedBy ?ownedByLabel
-               ?capitalOf ?capitalOfLabel
-
-               # Cross-database identifiers
-               ?gndId ?viafId ?locId ?tgnId ?osmId ?wofId
-
-               # Historic context
-               ?historicCounty ?historicCountyLabel ?officialWebsite
+        print(f"  Querying {country_name} ({country_qid})...")
+        try:
+            results = self._cached_query(query)
+            bindings = results.get('results', {}).get('bindings', [])
 
-        WHERE {{
-          # Country filter
-          ?place wdt:P17 wd:{country_qid} .
+            return [p for p in map(self._parse_binding, bindings) if p]
 
-          # Must be a relevant entity type
-          ?place wdt:P31 ?instanceOf .
-          VALUES ?instanceOf {{
-            {self.get_historical_colonial_types()}
-          }}
-
-          # Basic properties
-          OPTIONAL {{ ?place wdt:P625 ?coords . }}
-          OPTIONAL {{ ?place wdt:P1082 ?population . }}
-          OPTIONAL {{ ?place wdt:P1566 ?geonamesId . }}
-          OPTIONAL {{ ?place wdt:P571 ?inception . }}
-          OPTIONAL {{ ?place wdt:P576 ?dissolved . }}
-          OPTIONAL {{ ?place wdt:P576 ?abolished . }}
+        except Exception as e:
+            print(f"    Error querying {country_name}: {e}")
+            return []
 
-          # Wikipedia and description
-          OPTIONAL {{
-            ?wikipedia schema:about ?place .
-            ?wikipedia schema:inLanguage "en" .
-            FILTER (SUBSTR(str(?wikipedia), 1, 25) = "https://en.wikipedia.org/")
-          }}
-          OPTIONAL {{ ?place schema:description ?description . FILTER(LANG(?description) = "en") }}
+    def _keep_new(self, places: List[Dict]) -> List[Dict]:
+        """Drop places already fetched for another country."""
+        seen = self.all_qids
+        new_places = []
+        for place in places:
+            # add() then a size check is one hash probe instead of two
+            before = len(seen)
+            seen.add(_qnum(place['qid']))
+            if len(seen) != before:
+                new_places.append(place)
+        return new_places
+
+    def fetch_details_batch(self, qids: List[str], facet: str) -> Dict[str, Dict]:
+        """Fetch one detail facet for a batch of QIDs: {qid: {field: value}}."""
+        values = ' '.join(f'wd:{qid}' for qid in qids)
+
+        results = self._cached_query(DETAIL_FACETS[facet].format(values=values))
+
+        details = {}
+        for b in results.get('results', {}).get('bindings', []):
+            qid = b['place']['value'].rpartition('/')[2]
+            details[qid] = self._parse_detail_binding(b)
+        return details
+
+    def attach_details(self, places: List[Dict], batch_size: int = 200):
+        """Merge every detail facet into places; a failed batch leaves its fields empty."""
+        by_qid = {p['qid']: p for p in places}
+        qids = list(by_qid)
+
+        jobs = [(qids[i:i + batch_size], facet)
+                for facet in DETAIL_FACETS for i in range(0, len(qids), batch_size)]
+        if not jobs:
+            return
+
+        # One-deep prefetch: the next batch is already queued on the worker
+        # while this one is merged, so the connection never sits idle
+        with ThreadPoolExecutor(max_workers=1) as prefetch:
+            next_future = prefetch.submit(self.fetch_details_batch, *jobs[0])
+            for n, (_, facet) in enumerate(jobs):
+                future = next_future
+                if n + 1 < len(jobs):
+                    next_future = prefetch.submit(self.fetch_details_batch, *jobs[n + 1])
 
-          # Alternate names - critical for NER matching
-          OPTIONAL {{ ?place skos:altLabel ?altLabel . FILTER(LANG(?altLabel) = "en") }}
-          OPTIONAL {{ ?place wdt:P1448 ?officialName . }}
-          OPTIONAL {{ ?place wdt:P1705 ?nativeLabel . }}
-          OPTIONAL {{ ?place wdt:P1449 ?nickname . }}
-
-          # Historical succession
-          OPTIONAL {{ ?place wdt:P1365 ?replaces . }}
-          OPTIONAL {{ ?place wdt:P1366 ?replacedBy . }}
-          OPTIONAL {{ ?place wdt:P155 ?follows . }}
-          OPTIONAL {{ ?place wdt:P156 ?followedBy . }}
-
-          # Colonial/founding context
-          OPTIONAL {{ ?place wdt:P112 ?foundedBy . }}
-          OPTIONAL {{ ?place wdt:P127 ?ownedBy . }}
-          OPTIONAL {{ ?place wdt:P1376 ?capitalOf . }}
-
-          # Cross-database identifiers
-          OPTIONAL {{ ?place wdt:P227 ?gndId . }}
-          OPTIONAL {{ ?place wdt:P214 ?viafId . }}
-          OPTIONAL {{ ?place wdt:P244 ?locId . }}
-          OPTIONAL {{ ?place wdt:P1667 ?tgnId . }}
-          OPTIONAL {{ ?place wdt:P402 ?osmId . }}
-          OPTIONAL {{ ?place wdt:P6766 ?wofId . }}
-
-          # Historic context
-          OPTIONAL {{ ?place wdt:P7959 ?historicCounty . }}
-          OPTIONAL {{ ?place wdt:P856 ?officialWebsite . }}
-
-          SERVICE wikibase:label {{
-            bd:serviceParam wikibase:language "en" .
-          }}
-        }}
-        GROUP BY ?place ?placeLabel ?coords ?population ?geonamesId
-                 ?inception ?dissolved ?abolished ?wikipedia ?description
-                 ?instanceOf ?instanceOfLabel ?country
-                 ?nativeLabel ?nickname
-                 ?replaces ?replacedBy ?follows ?followedBy
-                 ?foundedBy ?foundedByLabel ?ownedBy ?ownedByLabel
-                 ?capitalOf ?capitalOfLabel
-                 ?gndId ?viafId ?locId ?tgnId ?osmId ?wofId
-                 ?historicCounty ?historicCountyLabel ?officialWebsite
-        LIMIT {limit}
-        """
+                try:
+                    details = future.result()
+                except Exception as e:
+                    print(f"      Warning: Error fetching {facet} details: {e}")
+                    continue
+
+                for qid, fields in details.items():
+                    by_qid[qid].update(fields)
+
+    def resolve_labels(self, qids: Set[str], batch_size: int = 500) -> Dict[str, str]:
+        """Look up English labels for QIDs, `batch_size` per request."""
+        qid_list = sorted(qids)
+        labels = {}
+
+        for i in range(0, len(qid_list), batch_size):
+            values = ' '.join(f'wd:{qid}' for qid in qid_list[i:i + batch_size])
+            query = f"""
+            SELECT ?x ?label WHERE {{
+              VALUES ?x {{ {values} }}
+              ?x rdfs:label ?label .
+              FILTER(LANG(?label) = "en")
+            }}
+            """
+            try:
+                results = self._cached_query(query)
+            except Exception as e:
+                # Missing labels fall back to QIDs; don't lose the places
+                print(f"      Warning: Error resolving labels: {e}")
+                continue
 
-        print(f"  Querying {country_name} ({country_qid})...")
-        self.sparql.setQuery(query)
+            for b in results.get('results', {}).get('bindings', []):
+                labels[b['x']['value'].rpartition('/')[2]] = b['label']['value']
 
-        try:
-            results = self.sparql.query().convert()
-            bindings = results.get('results', {}).get('bindings', [])
+        return labels
 
-            places = []
-            for b in bindings:
-                place = self._parse_binding(b)
-                if place and place['qid'] not in self.all_qids:
-                    places.append(place)
-                    self.all_qids.add(place['qid'])
+    def attach_labels(self, places: List[Dict]):
+        """Fill in place names and *Label fields for linked entities."""
+        qids = set()
+        for place in places:
+            for qid_key in LABELLED_QID_FIELDS:
+                if place.get(qid_key):
+                    qids.add(place[qid_key])
 
-            print(f"    Found {len(places):,} new places in {country_name}")
-            return places
+        labels = self.resolve_labels(qids) if qids else {}
 
-        except Exception as e:
-            print(f"    Error querying {country_name}: {e}")
-            return []
+        for place in places:
+            # Label service fell back to the QID when there was no label
+            if not place['name']:
+                place['name'] = place['qid']
+            for qid_key, label_key in LABELLED_QID_FIELDS.items():
+                qid = place.get(qid_key)
+                if qid:
+                    place[label_key] = labels.get(qid, qid)
 
     def get_cached_countries(self) -> Set[str]:
         """Get list of countries already cached."""
-        cached = set()
-        for filename in os.listdir(self.cache_dir):
-            if filename.startswith('wikidata_') and filename.endswith('.json'):
-                # Extract country code from filename like wikidata_US.json
-                country_code = filename.replace('wikidata_', '').replace('.json', '')
-                cached.add(country_code)
-        return cached
+        return set(self._country_cache_files())
+
+    def _country_cache_files(self) -> Dict[str, str]:
+        """Map country code -> path for each per-country cache file."""
+        prefix = COUNTRY_CACHE_PREFIX
+        files = {}
+        with os.scandir(self.cache_dir) as entries:
+            for entry in entries:
+                name = entry.name
+                if not name.startswith(prefix):
+                    continue
+                # Slice the code out of names like wikidata_US.json.gz
+                for suffix in (COUNTRY_CACHE_SUFFIX, LEGACY_COUNTRY_CACHE_SUFFIX):
+                    if name.endswith(suffix):
+                        code = name[len(prefix):-len(suffix)]
+                        # Prefer the compressed file if both exist
+                        if suffix == COUNTRY_CACHE_SUFFIX or code not in files:
+                            files[code] = entry.path
+                        break
+        return files
 
     def save_country_cache(self, country_code: str, places: List[Dict]):
         """Save country data to individual cache file."""
-        cache_file = os.path.join(self.cache_dir, f'wikidata_{country_code}.json')
+        cache_file = os.path.join(self.cache_dir,
+                                  f'{COUNTRY_CACHE_PREFIX}{country_code}{COUNTRY_CACHE_SUFFIX}')
 
         cache_data = {
             'metadata': {
@@ -310,8 +563,12 @@ class GlobalHistoricalWikidataFetcher:
             'places': places
         }
 
-        with open(cache_file, 'w', encoding='utf-8') as f:
-            json.dump(cache_data, f, indent=2, ensure_ascii=False)
+        # Compact JSON compressed in memory at gzip level 1 (fast, still ~5x
+        # smaller) and written in one call; temp file + rename so a
+        # half-written file never counts as cached on a resumed run
+        with open(cache_file + '.tmp', 'wb') as f:
+            f.write(gzip.compress(orjson.dumps(cache_data), compresslevel=1))
+        os.replace(cache_file + '.tmp', cache_file)
 
         print(f"    ✓ Cached to {cache_file}")
 
@@ -325,61 +582,94 @@ class GlobalHistoricalWikidataFetcher:
         """
         cached_countries = self.get_cached_countries()
 
-        for country_code, country_qid, country_name in countries:
+        pending = []
+        for country in countries:
             # Skip if already cached
-            if country_code in cached_countries:
-                print(f"  ✓ {country_name} already cached, skipping")
+            if country[0] in cached_countries:
+                print(f"  ✓ {country[2]} already cached, skipping")
                 continue
+            pending.append(country)
+
+        # Core queries are I/O-bound and run a few at once. Results are
+        # de-duplicated and cached on the main thread in submission order,
+        # so which country keeps a shared place does not depend on which
+        # query finishes first
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [(country, executor.submit(self.fetch_country_places,
+                                                 country[1], country[2], batch_limit))
+                       for country in pending]
+            for country, future in futures:
+                self._cache_new_places(country, future.result())
+
+    def _cache_new_places(self, country: tuple, places: List[Dict]):
+        """Keep one country's new places, fill in their details and cache them."""
+        country_code, _, country_name = country
+
+        places = self._keep_new(places)
+        self.attach_details(places)
+        self.attach_labels(places)
+        print(f"    Found {len(places):,} new places in {country_name}")
+
+        # Save to cache
+        if places:
+            self.save_country_cache(country_code, places)
+
+    def consolidate_caches(self, output_file: str, skip_uncompressed: bool = False):
+        """
+        Consolidate all country caches into single file.
 
-            # Fetch places
-            places = self.fetch_country_places(country_qid, country_name, limit=batch_limit)
-
-            # Save to cache
-            if places:
-                self.save_country_cache(country_code, places)
-
-            # Rate limiting - be nice to Wikidata
-            time.sleep(3)
-
-    def consolidate_caches(self, output_file: str):
-        """Consolidate all country caches into single file."""
+        Places are streamed from each country file and out one per line, so
+        neither a whole country file nor the combined list is held in memory.
+        Metadata is written after the places, once the totals are known.
+        The .gz copy is written in the same pass; with skip_uncompressed it
+        is the only output.
+        """
         print("\nConsolidating country caches...")
 
-        all_places = []
         all_qids = set()
-
-        for filename in sorted(os.listdir(self.cache_dir)):
-            if not filename.startswith('wikidata_') or not filename.endswith('.json'):
-                continue
-
-            filepath = os.path.join(self.cache_dir, filename)
-            with open(filepath, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-
-            for place in data['places']:
-                if place['qid'] not in all_qids:
-                    all_places.append(place)
-                    all_qids.add(place['qid'])
-
-        # Save consolidated file
-        consolidated = {
-            'metadata': {
+        countries_included = 0
+
+        with ExitStack() as stack:
+            outputs = [stack.enter_context(gzip.open(output_file + '.gz', 'wb', compresslevel=1))]
+            if not skip_uncompressed:
+                outputs.append(stack.enter_context(open(output_file, 'wb')))
+
+            def write(chunk: bytes):
+                for out in outputs:
+                    out.write(chunk)
+
+            write(b'{"places":[')
+
+            cache_files = self._country_cache_files()
+            for country_code in sorted(cache_files):
+                countries_included += 1
+                filepath = cache_files[country_code]
+                # Stream places out of each country file rather than loading it;
+                # use_float keeps coordinates serializable by orjson
+                opener = gzip.open if filepath.endswith('.gz') else open
+                with opener(filepath, 'rb') as cache:
+                    for place in ijson.items(cache, 'places.item', use_float=True):
+                        before = len(all_qids)
+                        all_qids.add(_qnum(place['qid']))
+                        if len(all_qids) != before:
+                            write(b',\n' if before else b'\n')
+                            write(orjson.dumps(place))
+
+            metadata = {
                 'fetch_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                'total_records': len(all_places),
+                'total_records': len(all_qids),
                 'source': 'Wikidata Query Service - Global Historical',
-                'countries_included': len([f for f in os.listdir(self.cache_dir) if f.startswith('wikidata_')])
-            },
-            'places': all_places
-        }
-
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(consolidated, f, indent=2, ensure_ascii=False)
-
-        with gzip.open(output_file + '.gz', 'wt', encoding='utf-8') as f:
-            json.dump(consolidated, f, ensure_ascii=False)
+                'countries_included': countries_included
+            }
+            write(b'\n],"metadata":')
+            write(orjson.dumps(metadata))
+            write(b'}\n')
 
-        print(f"✓ Consolidated {len(all_places):,} places from {len(all_qids)} unique entities")
-        print(f"✓ Saved to {output_file} and {output_file}.gz")
+        print(f"✓ Consolidated {len(all_qids):,} places from {countries_included} country caches")
+        if skip_uncompressed:
+            print(f"✓ Saved to {output_file}.gz")
+        else:
+            print(f"✓ Saved to {output_file} and {output_file}.gz")
 
 
 def get_colonial_priority_countries():
@@ -445,24 +735,33 @@ def get_colonial_priority_countries():
 
 def main():
     """Main execution."""
+    parser = argparse.ArgumentParser(description='Fetch global historical places from Wikidata')
+    parser.add_argument('--cache-expire-hours', type=float, default=24,
+                        help='Reuse cached SPARQL responses younger than this (default: 24)')
+    parser.add_argument('--skip-uncompressed', action='store_true',
+                        help='Write only the gzipped consolidated file')
+    args = parser.parse_args()
+
     print("="*60)
     print("Global Historical Wikidata Fetcher")
     print("="*60)
 
-    fetcher = GlobalHistoricalWikidataFetcher(cache_dir='wikidata_global_cache')
+    fetcher = GlobalHistoricalWikidataFetcher(cache_dir='wikidata_global_cache',
+                                              cache_expire_hours=args.cache_expire_hours)
 
     # Get priority countries
     countries = get_colonial_priority_countries()
 
     print(f"\nFetching data for {len(countries)} countries with colonial history")
-    print("This will take ~3 hours (3 seconds per country x 50 countries)")
+    print(f"Running up to {fetcher.max_workers} country queries at a time")
     print("\nCaching strategy: One file per country (resume-friendly)")
 
     # Fetch all priority countries
     fetcher.fetch_priority_countries(countries, batch_limit=10000)
 
     # Consolidate into single file
-    fetcher.consolidate_caches('wikidata_global_historical.json')
+    fetcher.consolidate_caches('wikidata_global_historical.json',
+                              skip_uncompressed=args.skip_uncompressed)
 
     print("\n✓ Global historical Wikidata fetch complete!")
     print("\nNext steps:")
@@ -15,41 +15,121 @@ This is separate from our coordinate-based LOCATED_IN inference.
 
 import os
 import json
-from typing import List, Dict, Set, Optional
-from SPARQLWrapper import SPARQLWrapper, JSON
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import List, Dict, Iterable, Iterator, Optional
+import ijson
+import requests
+from requests.adapters import HTTPAdapter
 from neo4j import GraphDatabase
 from tqdm import tqdm
 from dotenv import load_dotenv
 import time
+from datetime import datetime, timezone
 
 load_dotenv()
 
+SPARQL_ENDPOINT = "https://query.wikidata.org/sparql"
+
+# Shared keep-alive session so every batch reuses the TLS connection
+SESSION = requests.Session()
+SESSION.mount('https://', HTTPAdapter(pool_connections=8, pool_maxsize=16))
+
+# Prepared once; fetch_p131_batch only splices in the VALUES list
+P131_TEMPLATE = """
+SELECT ?place ?locatedIn
+WHERE {
+  VALUES ?place { __VALUES__ }
+  ?place wdt:P131 ?locatedIn .
+}
+"""
+
+
+def _chunked(iterable: Iterable[str], size: int) -> Iterator[List[str]]:
+    """Yield successive lists of up to `size` items from `iterable`."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class RateLimiter:
+    """Thread-safe gate that spaces calls to at most `rate` per second."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate
+        self.lock = threading.Lock()
+        self.next_slot = time.monotonic()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(self.next_slot, now)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
 
 class WikidataP131Fetcher:
     """Fetch P131 (located in) relationships from Wikidata."""
 
     def __init__(self, neo4j_uri: str, neo4j_user: str, neo4j_password: str):
         self.driver = GraphDatabase.driver(neo4j_uri, auth=(neo4j_user, neo4j_password))
-        self.sparql = SPARQLWrapper("https://query.wikidata.org/sparql")
-        self.sparql.setReturnFormat(JSON)
-        self.sparql.addCustomHttpHeader('User-Agent', 'CanadianLODProject/1.0')
+        self.max_workers = 4  # Wikidata allows a handful of parallel queries
+        self.rate_limiter = RateLimiter(5.0)  # Be nice to Wikidata (~5 req/s total)
+        self.timeout = 300
+        self.headers = {
+            'User-Agent': 'CanadianLODProject/1.0',
+            'Accept': 'application/sparql-results+json',
+            'Accept-Encoding': 'gzip',
+            'Connection': 'keep-alive',
+        }
 
     def close(self):
         self.driver.close()
 
-    def get_all_wikidata_ids(self) -> List[str]:
-        """Get all Wikidata IDs from Neo4j."""
+    def _run_sparql(self, query: str) -> Dict:
+        """
+        POST a query over the shared session and return the JSON results.
+
+        Bindings are decoded straight off the response stream with ijson, so
+        the raw payload text is never held alongside the parsed bindings.
+        """
+        with SESSION.post(SPARQL_ENDPOINT, data={'query': query},
+                          headers=self.headers, timeout=self.timeout,
+                          stream=True) as response:
+            response.raise_for_status()
+            response.raw.decode_content = True  # Undo gzip transfer encoding
+            bindings = list(ijson.items(response.raw, 'results.bindings.item'))
+        return {'results': {'bindings': bindings}}
+
+    def count_wikidata_ids(self) -> int:
+        """Count places with Wikidata IDs (for progress reporting)."""
         with self.driver.session() as session:
             result = session.run("""
                 MATCH (p:Place)
                 WHERE p.wikidataId IS NOT NULL
-                RETURN DISTINCT p.wikidataId AS wikidataId
-                ORDER BY p.wikidataId
+                RETURN count(DISTINCT p.wikidataId) AS total
             """)
-            wikidata_ids = [record['wikidataId'] for record in result]
+            total = result.single()['total']
+
+        print(f"Found {total:,} places with Wikidata IDs")
+        return total
 
-        print(f"Found {len(wikidata_ids):,} places with Wikidata IDs")
-        return wikidata_ids
+    def iter_all_wikidata_ids(self) -> Iterator[str]:
+        """Stream all Wikidata IDs from Neo4j as Bolt delivers them."""
+        with self.driver.session() as session:
+            result = session.run("""
+                MATCH (p:Place)
+                WHERE p.wikidataId IS NOT NULL
+                RETURN DISTINCT p.wikidataId AS wikidataId
+            """)
+            for record in result:
+                yield record['wikidataId']
 
     def fetch_p131_batch(self, qids: List[str]) -> Dict[str, List[str]]:
         """
@@ -59,33 +139,19 @@ class WikidataP131Fetcher:
 
         Note: Some places have multiple P131 values (e.g., overlapping jurisdictions).
         """
-        # Convert list to VALUES clause
-        qid_values = ' '.join([f'wd:{qid}' for qid in qids])
-
-        query = f"""
-        SELECT ?place ?locatedIn
-        WHERE {{
-          VALUES ?place {{ {qid_values} }}
-          ?place wdt:P131 ?locatedIn .
-
-          # Optional: only get Canadian places as parents
-          # (removes some noise from cross-border relationships)
-          OPTIONAL {{ ?locatedIn wdt:P17 ?country . }}
-          FILTER(!BOUND(?country) || ?country = wd:Q16)  # Canada or unspecified
-        }}
-        """
-
-        self.sparql.setQuery(query)
+        qid_values = ' '.join(f'wd:{qid}' for qid in qids)
+        query = P131_TEMPLATE.replace('__VALUES__', qid_values)
 
         try:
-            results = self.sparql.query().convert()
+            self.rate_limiter.wait()
+            results = self._run_sparql(query)
             bindings = results.get('results', {}).get('bindings', [])
 
             # Build dict
             p131_map = {}
             for b in bindings:
-                child = b['place']['value'].split('/')[-1]  # Extract Q123 from URI
-                parent = b['locatedIn']['value'].split('/')[-1]
+                child = b['place']['value'].rpartition('/')[2]  # Extract Q123 from URI
+                parent = b['locatedIn']['value'].rpartition('/')[2]
 
                 if child not in p131_map:
                     p131_map[child] = []
@@ -97,27 +163,37 @@ class WikidataP131Fetcher:
             print(f"  Error querying batch: {e}")
             return {}
 
-    def fetch_all_p131(self, wikidata_ids: List[str], batch_size: int = 100) -> Dict[str, List[str]]:
-        """Fetch all P131 relationships in batches."""
+    def fetch_all_p131(self, wikidata_ids: Iterable[str], total: int,
+                       batch_size: int = 500) -> Dict[str, List[str]]:
+        """
+        Fetch all P131 relationships in batches.
+
+        IDs are consumed lazily, with only a few batches queued ahead of the
+        workers. Parents that are not places in our database are kept here;
+        create_p131_relationships only links parents it can match.
+        """
         print(f"\nFetching P131 relationships in batches of {batch_size}...")
 
         all_p131 = {}
-        total_relationships = 0
-
-        for i in tqdm(range(0, len(wikidata_ids), batch_size), desc="Fetching P131"):
-            batch = wikidata_ids[i:i+batch_size]
-            p131_batch = self.fetch_p131_batch(batch)
-
-            all_p131.update(p131_batch)
-            total_relationships += sum(len(parents) for parents in p131_batch.values())
-
-            # Rate limiting
-            time.sleep(1)
-
+        max_pending = self.max_workers * 2
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor, \
+                tqdm(total=-(-total // batch_size), desc="Fetching P131") as progress:
+            pending = deque()
+            for batch in _chunked(wikidata_ids, batch_size):
+                if len(pending) >= max_pending:
+                    all_p131.update(pending.popleft().result())
+                    progress.update()
+                pending.append(executor.submit(self.fetch_p131_batch, batch))
+            while pending:
+                all_p131.update(pending.popleft().result())
+                progress.update()
+
+        total_relationships = sum(len(parents) for parents in all_p131.values())
         print(f"\n✓ Found {total_relationships:,} P131 relationships for {len(all_p131):,} places")
         return all_p131
 
-    def create_p131_relationships(self, p131_map: Dict[str, List[str]], batch_size: int = 1000):
+    def create_p131_relationships(self, p131_map: Dict[str, List[str]], batch_size: int = 10000):
         """
         Create ADMINISTRATIVELY_LOCATED_IN relationships in Neo4j.
 
@@ -135,29 +211,33 @@ class WikidataP131Fetcher:
 
         print(f"Total P131 relationships to create: {len(relationships):,}")
 
-        created = 0
-        skipped = 0
-
-        for i in tqdm(range(0, len(relationships), batch_size), desc="Creating relationships"):
-            batch = relationships[i:i+batch_size]
-
-            with self.driver.session() as session:
-                result = session.run("""
-                    UNWIND $rels AS rel
-                    MATCH (child:Place {wikidataId: rel.childQid})
-                    MATCH (parent:Place {wikidataId: rel.parentQid})
-                    MERGE (child)-[r:ADMINISTRATIVELY_LOCATED_IN]->(parent)
-                    SET r.source = 'wikidata_p131',
-                        r.fetchedDate = datetime()
-                    RETURN count(r) AS created
-                """, rels=batch)
-
-                created += result.single()['created']
-
-        skipped = len(relationships) - created
-
-        print(f"\n✓ Created {created:,} ADMINISTRATIVELY_LOCATED_IN relationships")
-        print(f"  Skipped: {skipped:,} (parent/child not in database)")
+        # APOC chunks the rows and commits each batch on its own. Batches
+        # run serially: parents are provinces and counties shared by
+        # thousands of children, and parallel batches would contend for
+        # their locks. The timestamp is computed once here rather than per row
+        fetched_at = datetime.now(timezone.utc).isoformat()
+        with self.driver.session() as session:
+            result = session.run("""
+                CALL apoc.periodic.iterate(
+                    'UNWIND $rels AS rel RETURN rel',
+                    'MATCH (child:Place {wikidataId: rel.childQid})
+                     MATCH (parent:Place {wikidataId: rel.parentQid})
+                     MERGE (child)-[r:ADMINISTRATIVELY_LOCATED_IN]->(parent)
+                     SET r.source = "wikidata_p131",
+                         r.fetchedDate = datetime($fetched_at)',
+                    {batchSize: $batchSize, parallel: false,
+                     params: {rels: $rels, fetched_at: $fetched_at}}
+                )
+                YIELD batches, failedOperations, errorMessages, updateStatistics
+                RETURN batches, failedOperations, errorMessages, updateStatistics
+            """, rels=relationships, fetched_at=fetched_at, batchSize=batch_size)
+            summary = result.single()
+
+        created = summary['updateStatistics'].get('relationshipsCreated', 0)
+        print(f"\n✓ Created {created:,} ADMINISTRATIVELY_LOCATED_IN relationships "
+              f"in {summary['batches']:,} batches")
+        if summary['failedOperations']:
+            print(f"  ✗ {summary['failedOperations']:,} failed: {summary['errorMessages']}")
 
     def print_statistics(self):
         """Print P131 relationship statistics."""
@@ -240,10 +320,11 @@ def main():
 
     try:
         # Get all Wikidata IDs from Neo4j
-        wikidata_ids = fetcher.get_all_wikidata_ids()
+        total = fetcher.count_wikidata_ids()
+        wikidata_ids = fetcher.iter_all_wikidata_ids()
 
         # Fetch P131 relationships from Wikidata
-        p131_map = fetcher.fetch_all_p131(wikidata_ids, batch_size=100)
+        p131_map = fetcher.fetch_all_p131(wikidata_ids, total, batch_size=500)
 
         # Save to JSON cache (for future reference)
         cache_file = 'wikidata_p131_relationships.json'
@@ -252,7 +333,7 @@ def main():
         print(f"\n✓ Cached P131 data to {cache_file}")
 
         # Create relationships in Neo4j
-        fetcher.create_p131_relationships(p131_map, batch_size=1000)
+        fetcher.create_p131_relationships(p131_map, batch_size=10000)
 
         # Print statistics
         fetcher.print_statistics()
@@ -202,7 +202,7 @@ class WikidataFullDumpFilter:
         # Extract alternate names (ALL languages and aliases)
         all_labels = self._extract_all_labels(entity)
         all_aliases = self._extract_all_aliases(entity)
-        alternate_names = list(set(all_labels + all_aliases))
+        alternate_names = list(dict.fromkeys(all_labels + all_aliases))
         alternate_names = [n for n in alternate_names if n != name]
 
         if alternate_names:
@@ -205,7 +205,7 @@ class WikidataDumpParser:
         all_aliases = self._extract_all_aliases(entity)
 
         # Combine and deduplicate
-        alternate_names = list(set(all_labels + all_aliases))
+        alternate_names = list(dict.fromkeys(all_labels + all_aliases))
         # Remove the primary name
         alternate_names = [n for n in alternate_names if n != name]
 
@@ -2,6 +2,7 @@
 """Quick analysis of US feature codes in allCountries.txt"""
 
 from collections import Counter
+import mmap
 import sys
 
 feature_counts = Counter()
@@ -9,21 +10,21 @@ us_total = 0
 
 print("Analyzing US feature codes...")
 
-with open('/home/jic823/CanadaNeo4j/allCountries.txt', 'r', encoding='utf-8') as f:
-    for i, line in enumerate(f):
-        if i % 1000000 == 0:
-            print(f"Processed {i:,} lines...", file=sys.stderr)
+# Feature codes and country codes are ASCII, so the scan stays in bytes and
+# only the top results are decoded for printing.
+with open('/home/jic823/CanadaNeo4j/allCountries.txt', 'rb') as f:
+    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for i, line in enumerate(iter(mm.readline, b'')):
+            if i % 1000000 == 0:
+                print(f"Processed {i:,} lines...", file=sys.stderr)
 
-        fields = line.strip().split('\t')
-        if len(fields) < 8:
-            continue
+            fields = line.split(b'\t', 9)
+            if len(fields) < 9:
+                continue
 
-        country = fields[8]  # country code
-        if country == 'US':
-            us_total += 1
-            feature_class = fields[6]
-            feature_code = fields[7]
-            feature_counts[f"{feature_class}.{feature_code}"] += 1
+            if fields[8] == b'US':  # country code
+                us_total += 1
+                feature_counts[fields[6] + b'.' + fields[7]] += 1
 
 print(f"\nTotal US records: {us_total:,}")
 print(f"\nTop 50 Feature Codes:")
@@ -31,4 +32,4 @@ print("="*60)
 
 for feature, count in feature_counts.most_common(50):
     pct = (count / us_total * 100) if us_total > 0 else 0
-    print(f"{feature:20s} {count:>10,}  ({pct:5.1f}%)")
+    print(f"{feature.decode('ascii'):20s} {count:>10,}  ({pct:5.1f}%)")
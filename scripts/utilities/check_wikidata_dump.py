@@ -7,10 +7,28 @@ Usage:
 """
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import sys
 import argparse
 import os
+import shutil
 from pathlib import Path
+from tqdm import tqdm
+
+# Copy buffer for streaming downloads (4 MiB keeps syscall count low)
+DOWNLOAD_CHUNK_SIZE = 4 * 1024 * 1024
+
+# Shared keep-alive session; retries flaky status/download endpoints with backoff
+SESSION = requests.Session()
+_adapter = HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=4,
+    max_retries=Retry(total=5, backoff_factor=1.0,
+                      status_forcelist=[429, 500, 502, 503, 504])
+)
+SESSION.mount('https://', _adapter)
+SESSION.mount('http://', _adapter)
 
 
 def check_dump_status(dump_id: str):
@@ -23,7 +41,7 @@ def check_dump_status(dump_id: str):
     print()
 
     try:
-        response = requests.get(url)
+        response = SESSION.get(url)
         response.raise_for_status()
         data = response.json()
 
@@ -88,28 +106,17 @@ def download_dump(url: str, output_file: str):
     print(f"\nDownloading to {output_file}...")
 
     try:
-        response = requests.get(url, stream=True)
+        response = SESSION.get(url, stream=True)
         response.raise_for_status()
 
         total_size = int(response.headers.get('content-length', 0))
 
         # Download with progress
-        with open(output_file, 'wb') as f:
-            downloaded = 0
-            chunk_size = 8192
-
-            for chunk in response.iter_content(chunk_size=chunk_size):
-                if chunk:
-                    f.write(chunk)
-                    downloaded += len(chunk)
-
-                    # Print progress every 100 MB
-                    if downloaded % (100 * 1024 * 1024) < chunk_size:
-                        if total_size > 0:
-                            percent = (downloaded / total_size) * 100
-                            print(f"  Downloaded: {downloaded / 1_000_000:.1f} MB ({percent:.1f}%)")
-                        else:
-                            print(f"  Downloaded: {downloaded / 1_000_000:.1f} MB")
+        response.raw.decode_content = True
+        with tqdm.wrapattr(response.raw, 'read', total=total_size or None,
+                           desc="Downloading") as raw:
+            with open(output_file, 'wb') as f:
+                shutil.copyfileobj(raw, f, length=DOWNLOAD_CHUNK_SIZE)
 
         print(f"\n✓ Download complete: {output_file}")
         print(f"  Size: {os.path.getsize(output_file) / 1_000_000:.1f} MB")
@@ -2,15 +2,126 @@
 """
 Import exported database into Neo4j on Nibi.
 Loads places, admin divisions, and countries from JSON export.
+
+Places and admin divisions are loaded server-side with APOC when it can read
+the export files (apoc.import.file.enabled=true, plus
+apoc.import.file.use_neo4j_config=false if they live outside the import
+directory); otherwise they are sent from Python in batches.
 """
 
-import json
 import gzip
 import os
+import shutil
+import signal
+import subprocess
+from contextlib import contextmanager
+from itertools import islice
+import orjson
 from neo4j import GraphDatabase
+from neo4j.exceptions import ClientError
+from neo4j.spatial import WGS84Point
 from tqdm import tqdm
 import sys
 
+# Node creation for one JSON record bound as `row`; shared by the APOC
+# server-side load and the batched fallback
+ADMIN_CREATE = """
+    CREATE (a:AdminDivision {
+        geonameId: row.geonameId,
+        name: row.name,
+        countryCode: row.countryCode,
+        admin1Code: row.admin1Code,
+        admin2Code: row.admin2Code,
+        admin3Code: row.admin3Code,
+        featureCode: row.featureCode
+    })
+"""
+
+_PLACE_CREATE_TEMPLATE = """
+    CREATE (p:Place {
+        geonameId: row.geonameId,
+        name: row.name,
+        latitude: row.latitude,
+        longitude: row.longitude,
+        location: __LOCATION__,
+        countryCode: row.countryCode,
+        admin1Code: row.admin1Code,
+        admin2Code: row.admin2Code,
+        admin3Code: row.admin3Code,
+        admin4Code: row.admin4Code,
+        featureClass: row.featureClass,
+        featureCode: row.featureCode,
+        population: row.population,
+        elevation: row.elevation,
+        timezone: row.timezone
+    })
+"""
+
+PLACE_CREATE = _PLACE_CREATE_TEMPLATE.replace(
+    '__LOCATION__', 'point({latitude: row.latitude, longitude: row.longitude})')
+
+# Python-side loads send the location as a Bolt point, so Neo4j stores it
+# without evaluating point() per row
+PLACE_CREATE_WITH_LOCATION = _PLACE_CREATE_TEMPLATE.replace('__LOCATION__', 'row.location')
+
+
+# Server errors meaning APOC can't read the export at all, as opposed to a
+# failure partway through a load that has already committed batches
+APOC_UNAVAILABLE_MARKERS = (
+    'apoc.import.file',  # file import disabled / outside the import directory
+    'FileNotFoundException',
+    'NoSuchFileException',
+    "Can't read url",
+    'Cannot open file',
+)
+
+
+def apoc_unavailable(error):
+    """True if `error` means the server-side load could not start."""
+    if error.code == 'Neo.ClientError.Procedure.ProcedureNotFound':
+        return True
+    message = error.message or ''
+    return any(marker in message for marker in APOC_UNAVAILABLE_MARKERS)
+
+
+def decode_place(line):
+    """Decode one place record and attach its location as a WGS-84 point."""
+    place = orjson.loads(line)
+    latitude, longitude = place.get('latitude'), place.get('longitude')
+    if latitude is not None and longitude is not None:
+        place['location'] = WGS84Point((longitude, latitude))
+    else:
+        place['location'] = None
+    return place
+
+@contextmanager
+def open_gzip_lines(filepath):
+    """
+    Yield (lines, tell) for a gzip file: its decompressed lines (bytes) and a
+    function returning how many compressed bytes have been read so far.
+
+    pigz is used when installed so inflation runs on another core alongside
+    parsing; otherwise the stdlib gzip module decompresses in-process.
+    """
+    with open(filepath, 'rb', buffering=0) as raw:
+        def tell():
+            return os.lseek(raw.fileno(), 0, os.SEEK_CUR)
+
+        pigz = shutil.which('pigz')
+        if not pigz:
+            with gzip.GzipFile(fileobj=raw) as f:
+                yield f, tell
+            return
+
+        # pigz reads from our open file, so its offset tracks pigz's progress
+        proc = subprocess.Popen([pigz, '-dc'], stdin=raw, stdout=subprocess.PIPE)
+        try:
+            yield proc.stdout, tell
+        finally:
+            proc.stdout.close()
+            if proc.wait() not in (0, -signal.SIGPIPE):
+                raise RuntimeError(f"pigz exited with status {proc.returncode} for {filepath}")
+
 class Neo4jImporter:
     def __init__(self, uri=None, user=None, password=None):
         # Use environment variables if not provided
@@ -20,6 +131,8 @@ class Neo4jImporter:
         print(f"Connecting to {uri}...")
         self.driver = GraphDatabase.driver(uri, auth=(user, password))
         self.batch_size = 10000
+        # Batches committed together by the Python fallback loader
+        self.batches_per_transaction = 5
 
     def close(self):
         self.driver.close()
@@ -77,8 +190,8 @@ class Neo4jImporter:
         """Load Country nodes."""
         print(f"\nLoading countries from {filepath}...")
 
-        with gzip.open(filepath, 'rt', encoding='utf-8') as f:
-            countries = json.load(f)
+        with gzip.open(filepath, 'rb') as f:
+            countries = orjson.loads(f.read())
 
         with self.driver.session() as session:
             session.run("""
@@ -92,136 +205,123 @@ class Neo4jImporter:
         print(f"✓ Loaded {len(countries)} countries")
 
     def load_admin_divisions(self, filepath):
-        """Load AdminDivision nodes in batches."""
+        """Load AdminDivision nodes."""
         print(f"\nLoading admin divisions from {filepath}...")
-
-        # Count lines
-        print("  Counting admin divisions...")
-        with gzip.open(filepath, 'rt', encoding='utf-8') as f:
-            total = sum(1 for _ in f)
-
-        batch = []
-        loaded = 0
-
-        with gzip.open(filepath, 'rt', encoding='utf-8') as f:
-            pbar = tqdm(total=total, desc="Admin divisions", unit="nodes")
-
-            for line in f:
-                data = json.loads(line)
-                batch.append(data)
-
-                if len(batch) >= self.batch_size:
-                    self._load_admin_batch(batch)
-                    loaded += len(batch)
-                    pbar.update(len(batch))
-                    batch = []
-
-            # Load remaining
-            if batch:
-                self._load_admin_batch(batch)
-                loaded += len(batch)
-                pbar.update(len(batch))
-
-            pbar.close()
-
+        loaded = self._load_json_lines(filepath, ADMIN_CREATE, "Admin divisions")
         print(f"✓ Loaded {loaded:,} admin divisions")
 
-    def _load_admin_batch(self, batch):
-        """Load a batch of admin divisions."""
-        with self.driver.session() as session:
-            session.run("""
-                UNWIND $batch AS admin
-                CREATE (a:AdminDivision {
-                    geonameId: admin.geonameId,
-                    name: admin.name,
-                    countryCode: admin.countryCode,
-                    admin1Code: admin.admin1Code,
-                    admin2Code: admin.admin2Code,
-                    admin3Code: admin.admin3Code,
-                    featureCode: admin.featureCode
-                })
-            """, batch=batch)
-
     def load_places(self, filepath):
-        """Load Place nodes in batches."""
+        """Load Place nodes."""
         print(f"\nLoading places from {filepath}...")
+        loaded = self._load_json_lines(filepath, PLACE_CREATE, "Places",
+                                       fallback=(PLACE_CREATE_WITH_LOCATION, decode_place))
+        print(f"✓ Loaded {loaded:,} places")
 
-        # Count lines
-        print("  Counting places...")
-        with gzip.open(filepath, 'rt', encoding='utf-8') as f:
-            total = sum(1 for _ in f)
-
-        batch = []
+    def _load_json_lines(self, filepath, create, desc, fallback=None):
+        """
+        Run `create` (which sees each record as `row`) over a gzipped JSON-lines file.
+
+        The file is normally read, batched and committed inside Neo4j by
+        apoc.periodic.iterate. If APOC cannot read the file (plugin missing or
+        file import disabled), records are parsed here and sent in batches;
+        `fallback` can supply a (create, decoder) pair for that path. Any other
+        error may come after batches have committed, so it is raised rather
+        than reloading rows that already exist.
+        """
+        try:
+            return self._periodic_load(filepath, create)
+        except ClientError as e:
+            if not apoc_unavailable(e):
+                raise
+            print(f"  ⚠ Server-side load unavailable, loading from Python: {str(e)[:100]}")
+
+        create, decoder = fallback or (create, orjson.loads)
+        query = "UNWIND $batch AS row " + create
         loaded = 0
 
-        with gzip.open(filepath, 'rt', encoding='utf-8') as f:
-            pbar = tqdm(total=total, desc="Places", unit="nodes")
-
-            for line in f:
-                data = json.loads(line)
-                batch.append(data)
+        def write_batches(tx, batches):
+            for batch in batches:
+                tx.run(query, batch=batch).consume()
+
+        # Lines stay as bytes; orjson decodes the UTF-8 itself. Progress is
+        # measured in compressed bytes read, so no counting pass is needed.
+        # Several batches share one transaction to cut down on commits.
+        with open_gzip_lines(filepath) as (f, tell), \
+                self.driver.session() as session:
+            pbar = tqdm(total=os.path.getsize(filepath), desc=desc,
+                        unit="B", unit_scale=True, mininterval=0.5)
+
+            batches = self._stream_batches(f, decoder)
+            while True:
+                group = list(islice(batches, self.batches_per_transaction))
+                if not group:
+                    break
+                session.execute_write(write_batches, group)
+                loaded += sum(len(batch) for batch in group)
+                pbar.update(tell() - pbar.n)
 
-                if len(batch) >= self.batch_size:
-                    self._load_place_batch(batch)
-                    loaded += len(batch)
-                    pbar.update(len(batch))
-                    batch = []
+            pbar.close()
 
-            # Load remaining
-            if batch:
-                self._load_place_batch(batch)
-                loaded += len(batch)
-                pbar.update(len(batch))
+        return loaded
 
-            pbar.close()
+    def _stream_batches(self, lines, decoder):
+        """Yield lists of up to batch_size decoded records from `lines`."""
+        records = map(decoder, lines)
+        while True:
+            batch = list(islice(records, self.batch_size))
+            if not batch:
+                return
+            yield batch
 
-        print(f"✓ Loaded {loaded:,} places")
+    def _periodic_load(self, filepath, create):
+        """Stream a gzipped JSON-lines file through apoc.periodic.iterate; returns rows committed."""
+        url = filepath if '://' in filepath else 'file://' + os.path.abspath(filepath)
 
-    def _load_place_batch(self, batch):
-        """Load a batch of places."""
         with self.driver.session() as session:
-            session.run("""
-                UNWIND $batch AS place
-                CREATE (p:Place {
-                    geonameId: place.geonameId,
-                    name: place.name,
-                    latitude: place.latitude,
-                    longitude: place.longitude,
-                    location: point({latitude: place.latitude, longitude: place.longitude}),
-                    countryCode: place.countryCode,
-                    admin1Code: place.admin1Code,
-                    admin2Code: place.admin2Code,
-                    admin3Code: place.admin3Code,
-                    admin4Code: place.admin4Code,
-                    featureClass: place.featureClass,
-                    featureCode: place.featureCode,
-                    population: place.population,
-                    elevation: place.elevation,
-                    timezone: place.timezone
-                })
-            """, batch=batch)
+            result = session.run("""
+                CALL apoc.periodic.iterate(
+                    'CALL apoc.load.json($url, "", {compression: "GZIP"}) YIELD value RETURN value',
+                    $action,
+                    {batchSize: $batchSize, parallel: true, concurrency: 8,
+                     params: {url: $url}}
+                )
+                YIELD batches, committedOperations, failedOperations, errorMessages
+                RETURN batches, committedOperations, failedOperations, errorMessages
+            """, url=url, action="WITH value AS row " + create, batchSize=self.batch_size)
+            summary = result.single()
+
+        if summary['failedOperations']:
+            raise RuntimeError(f"{summary['failedOperations']:,} rows failed to load from "
+                               f"{filepath}: {summary['errorMessages']}")
+
+        return summary['committedOperations']
 
     def create_country_relationships(self):
         """Create Place -> Country relationships in batches."""
         print("\nCreating Place -> Country relationships...")
 
         with self.driver.session() as session:
-            # Use CALL {} IN TRANSACTIONS for batched relationship creation
+            # Each batch commits on its own; Country.code is unique, so the
+            # per-place lookup is an index seek. Batches run serially: every
+            # one attaches relationships to the same few Country nodes, and
+            # parallel batches would contend for their locks.
             result = session.run("""
-                CALL {
-                    MATCH (p:Place)
-                    WHERE NOT EXISTS((p)-[:LOCATED_IN_COUNTRY]->())
-                    WITH p LIMIT 50000
-                    MATCH (c:Country)
-                    WHERE p.countryCode = c.code
-                    CREATE (p)-[:LOCATED_IN_COUNTRY]->(c)
-                    RETURN count(*) as batch_count
-                } IN TRANSACTIONS OF 50000 ROWS
-                RETURN sum(batch_count) as total_count
+                CALL apoc.periodic.iterate(
+                    'MATCH (p:Place) WHERE p.countryCode IS NOT NULL RETURN p',
+                    'MATCH (c:Country {code: p.countryCode})
+                     MERGE (p)-[:LOCATED_IN_COUNTRY]->(c)',
+                    {batchSize: 50000, parallel: false}
+                )
+                YIELD batches, committedOperations, failedOperations, errorMessages
+                RETURN batches, committedOperations, failedOperations, errorMessages
             """)
+            summary = result.single()
+
+        if summary['failedOperations']:
+            print(f"  ✗ {summary['failedOperations']:,} places failed: {summary['errorMessages']}")
 
-            count = result.single()["total_count"]
-            print(f"✓ Created {count:,} LOCATED_IN_COUNTRY relationships")
+        print(f"✓ Linked {summary['committedOperations']:,} places to their countries "
+              f"in {summary['batches']:,} batches")
 
     def verify_import(self):
         """Verify the import completed successfully."""
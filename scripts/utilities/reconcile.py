@@ -56,7 +56,7 @@ class NERReconciler:
                    p.latitude AS latitude,
                    p.longitude AS longitude,
                    p.wikipediaUrl AS wikipedia,
-                   p.alternateNames AS alternateNames,
+                   coalesce(p.alternateNames, p.wikidataAlternateNames) AS alternateNames,
                    1.0 AS confidence
             ORDER BY p.population DESC NULLS LAST
             LIMIT 20
@@ -130,7 +130,8 @@ class NERReconciler:
             query = """
             MATCH (p:Place)
             WHERE p.latitude IS NOT NULL AND p.longitude IS NOT NULL
-              AND (p.name = $name OR $name IN p.alternateNames)
+              AND (p.name = $name OR $name IN p.alternateNames
+                   OR $name IN p.wikidataAlternateNames)
             WITH p,
                  point.distance(
                    point({latitude: p.latitude, longitude: p.longitude}),
@@ -173,7 +174,8 @@ class NERReconciler:
             # Note: This requires admin division names to be populated
             query = """
             MATCH (p:Place)-[:LOCATED_IN_ADMIN1]->(a:AdminDivision)
-            WHERE (p.name = $cityName OR $cityName IN p.alternateNames)
+            WHERE (p.name = $cityName OR $cityName IN p.alternateNames
+                   OR $cityName IN p.wikidataAlternateNames)
               AND p.countryCode = $countryCode
               AND (a.name = $adminName OR a.code CONTAINS $adminName)
             RETURN p.geonameId AS geonameId,